@@ -1,6 +1,25 @@
 #!/usr/bin/env bash
 
 cd src
+
+# Background loops run from the app image, in their own containers
+case "$CONTAINER_TYPE" in
+  USER_ACTIVITY_FLUSHER) BACKGROUND_COMMAND=flush_user_activity ;;
+  USSD_SESSION_PERSISTER) BACKGROUND_COMMAND=persist_ussd_sessions ;;
+  SEARCH_INDEXER) BACKGROUND_COMMAND=refresh_search_index ;;
+esac
+
+if [ -n "$BACKGROUND_COMMAND" ]; then
+  if [ "$CONTAINER_MODE" = 'TEST' ]; then
+    echo pass
+    exit 0
+  fi
+
+  # Give the APP container time to upgrade the database
+  sleep 10
+  echo "Starting $BACKGROUND_COMMAND"
+  exec python manage.py $BACKGROUND_COMMAND
+fi
 echo upgrading database
 python manage.py db upgrade
 
@@ -1,8 +1,10 @@
 from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
-from flask_script import Command
+from flask_script import Command, Option
 import sys
 import os
+import datetime
+from time import sleep
 
 parent_dir = os.path.abspath(os.path.join(os.getcwd(), ".."))
 sys.path.append(parent_dir)
@@ -30,6 +32,82 @@ class UpdateData(Command):
             create_float_wallet(app)
 
 
+class RefreshSearchIndex(Command):
+    """
+    Keeps the search index up to date with user writes that bypass the ORM, such as bulk updates.
+    Each pass only refreshes users updated since shortly before the previous pass started.
+    """
+
+    option_list = (
+        Option('--interval', '-i', dest='interval', type=int, default=60),
+    )
+
+    def run(self, interval):
+        from server.models.search import refresh_search_index
+
+        # Overlap passes a little, to pick up writes from transactions that were still open at the last pass
+        margin = datetime.timedelta(seconds=interval)
+        updated_after = None
+
+        with app.app_context():
+            while True:
+                pass_start = datetime.datetime.utcnow()
+                try:
+                    refresh_search_index(updated_after=updated_after)
+                    updated_after = pass_start - margin
+                except Exception as e:
+                    # updated_after is left alone, so the next pass covers this one's users too
+                    print(e)
+                    db.session.rollback()
+                sleep(interval)
+
+
+class FlushUserActivity(Command):
+    """
+    Writes the last seen times and ip addresses buffered by authenticated requests to the database.
+    """
+
+    option_list = (
+        Option('--interval', '-i', dest='interval', type=int, default=30),
+    )
+
+    def run(self, interval):
+        from server.utils.user_activity import flush_user_activity
+
+        with app.app_context():
+            while True:
+                try:
+                    flush_user_activity()
+                except Exception as e:
+                    # Activity that failed to flush is lost, but the loop has to keep draining the buffers
+                    print(e)
+                    db.session.rollback()
+                sleep(interval)
+
+
+class PersistUssdSessions(Command):
+    """
+    Writes USSD sessions that have completed or been left idle from the session store to the database.
+    """
+
+    option_list = (
+        Option('--interval', '-i', dest='interval', type=int, default=30),
+    )
+
+    def run(self, interval):
+        from server.utils.ussd.session_store import persist_ussd_sessions
+
+        with app.app_context():
+            while True:
+                try:
+                    persist_ussd_sessions()
+                except Exception as e:
+                    # Sessions stay queued in the store until they're written, so they're retried next pass
+                    print(e)
+                    db.session.rollback()
+                sleep(interval)
+
+
 app = create_app()
 manager = Manager(app)
 
@@ -39,6 +117,10 @@ manager.add_command('db', MigrateCommand)
 
 manager.add_command('update_data', UpdateData())
 
+manager.add_command('refresh_search_index', RefreshSearchIndex())
+manager.add_command('flush_user_activity', FlushUserActivity())
+manager.add_command('persist_ussd_sessions', PersistUssdSessions())
+
 
 if __name__ == '__main__':
     manager.run()
@@ -26,8 +26,6 @@ target_metadata = db.Model.metadata
 
 # Tables to ignore when running 'manage.py db migrate' are defined here
 def include_object(object, name, type_, reflected, compare_to):
-    if type_ == 'table' and name in ('search_view'):
-        return False
     return True
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,56 @@
+"""Add daily transfer limit rollups
+
+Revision ID: 3c9e7f21a4d6
+Revises: e140854b62d2
+Create Date: 2026-10-18 19:12:44.518207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e7f21a4d6'
+down_revision = 'e140854b62d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transfer_limit_rollup',
+    sa.Column('sender_user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('transfer_type', sa.String(), nullable=False),
+    sa.Column('transfer_subtype', sa.String(), nullable=False),
+    sa.Column('exclude_from_limit_calcs', sa.Boolean(), nullable=False),
+    sa.Column('total_amount_wei', sa.Numeric(precision=27), nullable=False),
+    sa.Column('transfer_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['sender_user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('sender_user_id', 'day', 'transfer_type', 'transfer_subtype', 'exclude_from_limit_calcs')
+    )
+
+    op.execute("""
+        INSERT INTO transfer_limit_rollup
+            (sender_user_id, day, transfer_type, transfer_subtype, exclude_from_limit_calcs,
+             total_amount_wei, transfer_count)
+        SELECT sender_user_id,
+               created::date,
+               coalesce(transfer_type::text, ''),
+               coalesce(transfer_subtype::text, ''),
+               exclude_from_limit_calcs IS NOT FALSE,
+               coalesce(sum(coalesce(_transfer_amount_wei, 0)), 0),
+               count(id)
+        FROM credit_transfer
+        WHERE sender_user_id IS NOT NULL
+          AND created IS NOT NULL
+          AND transfer_status != 'REJECTED'
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+    op.create_index('ix_credit_transfer_sender_user_id_created', 'credit_transfer',
+                    ['sender_user_id', 'created'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_credit_transfer_sender_user_id_created', table_name='credit_transfer')
+    op.drop_table('transfer_limit_rollup')
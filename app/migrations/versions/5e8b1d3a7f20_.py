@@ -0,0 +1,66 @@
+"""Add daily transfer stats rollups
+
+Revision ID: 5e8b1d3a7f20
+Revises: 7a2d94c1e5b3
+Create Date: 2026-10-18 20:21:07.331870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b1d3a7f20'
+down_revision = '7a2d94c1e5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transfer_stats_rollup',
+    sa.Column('organisation_id', sa.Integer(), nullable=False),
+    sa.Column('token_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('transfer_type', sa.String(), nullable=False),
+    sa.Column('transfer_subtype', sa.String(), nullable=False),
+    sa.Column('transfer_status', sa.String(), nullable=False),
+    sa.Column('transfer_use', sa.String(), nullable=False),
+    sa.Column('sender_user_id', sa.Integer(), nullable=False),
+    sa.Column('sender_transfer_account_id', sa.Integer(), nullable=False),
+    sa.Column('total_amount_wei', sa.Numeric(precision=27), nullable=False),
+    sa.Column('transfer_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('organisation_id', 'token_id', 'day', 'transfer_type', 'transfer_subtype',
+                            'transfer_status', 'transfer_use', 'sender_user_id', 'sender_transfer_account_id')
+    )
+    op.create_index(op.f('ix_transfer_stats_rollup_organisation_id'), 'transfer_stats_rollup',
+                    ['organisation_id'], unique=False)
+
+    # Empty transfer uses are stored as '', the same as record_transfer_stats does
+    op.execute("""
+        INSERT INTO transfer_stats_rollup
+            (organisation_id, token_id, day, transfer_type, transfer_subtype, transfer_status, transfer_use,
+             sender_user_id, sender_transfer_account_id, total_amount_wei, transfer_count)
+        SELECT o.organisation_id,
+               coalesce(t.token_id, 0),
+               t.created::date,
+               coalesce(t.transfer_type::text, ''),
+               coalesce(t.transfer_subtype::text, ''),
+               t.transfer_status::text,
+               CASE WHEN t.transfer_use IS NULL OR t.transfer_use::jsonb IN ('null', '[]', '{}', '""') THEN ''
+                    ELSE t.transfer_use::jsonb::text END,
+               coalesce(t.sender_user_id, 0),
+               coalesce(t.sender_transfer_account_id, 0),
+               coalesce(sum(coalesce(t._transfer_amount_wei, 0)), 0),
+               count(t.id)
+        FROM credit_transfer t
+        JOIN organisation_association_table o ON o.credit_transfer_id = t.id
+        WHERE o.organisation_id IS NOT NULL
+          AND t.created IS NOT NULL
+          AND t.transfer_status IN ('COMPLETE', 'REJECTED')
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+    """)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_transfer_stats_rollup_organisation_id'), table_name='transfer_stats_rollup')
+    op.drop_table('transfer_stats_rollup')
@@ -0,0 +1,133 @@
+"""Replace search_view materialized view with an incrementally maintained search_index table
+
+Revision ID: 7a2d94c1e5b3
+Revises: 3c9e7f21a4d6
+Create Date: 2026-10-18 19:48:31.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2d94c1e5b3'
+down_revision = '3c9e7f21a4d6'
+branch_labels = None
+depends_on = None
+
+tsv_columns = [
+    'tsv_email', 'tsv_phone', 'tsv_first_name', 'tsv_last_name', 'tsv_public_serial_number',
+    'tsv_primary_blockchain_address', 'tsv_default_transfer_account_id', 'tsv_location'
+]
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    op.create_table('search_index',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('_phone', sa.String(), nullable=True),
+    sa.Column('first_name', sa.String(), nullable=True),
+    sa.Column('last_name', sa.String(), nullable=True),
+    sa.Column('_public_serial_number', sa.String(), nullable=True),
+    sa.Column('_location', sa.String(), nullable=True),
+    sa.Column('primary_blockchain_address', sa.String(), nullable=True),
+    sa.Column('default_transfer_account_id', sa.Integer(), nullable=True),
+    *[sa.Column(column, postgresql.TSVECTOR(), nullable=True) for column in tsv_columns],
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    for column in tsv_columns:
+        op.create_index(f'ix_search_index_{column}', 'search_index', [column], postgresql_using='gin')
+
+    conn.execute(sa.sql.text('''
+        INSERT INTO search_index (
+            id, email, _phone, first_name, last_name, _public_serial_number, _location,
+            primary_blockchain_address, default_transfer_account_id,
+            tsv_email, tsv_phone, tsv_first_name, tsv_last_name, tsv_public_serial_number,
+            tsv_location, tsv_primary_blockchain_address, tsv_default_transfer_account_id
+        )
+        SELECT
+            u.id,
+            u.email,
+            u._phone,
+            u.first_name,
+            u.last_name,
+            u._public_serial_number,
+            u._location,
+            u.primary_blockchain_address,
+            u.default_transfer_account_id,
+            to_tsvector(u.email),
+            to_tsvector(u._phone),
+            to_tsvector(u.first_name),
+            to_tsvector(u.last_name),
+            to_tsvector(u._public_serial_number),
+            to_tsvector(u._location),
+            to_tsvector(u.primary_blockchain_address),
+            to_tsvector(CAST (u.default_transfer_account_id AS VARCHAR(10)))
+        FROM "user" u
+    '''))
+
+    # The index is now maintained by the app, so the full refresh on every user write is no longer needed
+    conn.execute(sa.sql.text('''DROP TRIGGER IF EXISTS search_trigger ON "user"'''))
+    conn.execute(sa.sql.text('DROP FUNCTION IF EXISTS trig_refresh_search_view()'))
+    conn.execute(sa.sql.text('DROP MATERIALIZED VIEW IF EXISTS search_view'))
+
+
+def downgrade():
+    conn = op.get_bind()
+
+    conn.execute(sa.sql.text('''
+        CREATE MATERIALIZED VIEW search_view AS (
+            SELECT
+                u.id,
+                u.email,
+                u._phone,
+                u.first_name,
+                u.last_name,
+                u._public_serial_number,
+                u._location,
+                u.primary_blockchain_address,
+                u.default_transfer_account_id,
+                to_tsvector(u.email) AS tsv_email,
+                to_tsvector(u._phone) AS tsv_phone,
+                to_tsvector(u.first_name) AS tsv_first_name,
+                to_tsvector(u.last_name) AS tsv_last_name,
+                to_tsvector(u._public_serial_number) AS tsv_public_serial_number,
+                to_tsvector(u._location) AS tsv_location,
+                to_tsvector(u.primary_blockchain_address) AS tsv_primary_blockchain_address,
+                to_tsvector(CAST (u.default_transfer_account_id AS VARCHAR(10))) AS tsv_default_transfer_account_id
+            FROM "user" u
+        );
+    '''))
+
+    op.create_index(op.f('ix_search_view_id'), 'search_view', ['id'], unique=True)
+    op.create_index(op.f('ix_tsv_email'), 'search_view', ['tsv_email'], postgresql_using='gin')
+    op.create_index(op.f('ix_tsv_phone'), 'search_view', ['tsv_phone'], postgresql_using='gin')
+    op.create_index(op.f('ix_tsv_firstname'), 'search_view', ['tsv_first_name'], postgresql_using='gin')
+    op.create_index(op.f('ix_tsv_lastname'), 'search_view', ['tsv_last_name'], postgresql_using='gin')
+    op.create_index(op.f('_public_serial_number'), 'search_view', ['tsv_public_serial_number'], postgresql_using='gin')
+    op.create_index(op.f('_location'), 'search_view', ['tsv_location'], postgresql_using='gin')
+    op.create_index(op.f('primary_blockchain_address'), 'search_view', ['tsv_primary_blockchain_address'], postgresql_using='gin')
+    op.create_index(op.f('default_transfer_account_id'), 'search_view', ['tsv_default_transfer_account_id'], postgresql_using='gin')
+
+    conn.execute(sa.sql.text('''
+        CREATE OR REPLACE FUNCTION trig_refresh_search_view() RETURNS trigger AS
+        $$
+        BEGIN
+            REFRESH MATERIALIZED VIEW CONCURRENTLY search_view;
+            RETURN NULL;
+        END;
+        $$
+        LANGUAGE plpgsql ;
+    '''))
+
+    conn.execute(sa.sql.text('''
+            CREATE TRIGGER search_trigger AFTER TRUNCATE OR INSERT OR DELETE OR UPDATE
+            ON "user" FOR EACH STATEMENT
+            EXECUTE PROCEDURE trig_refresh_search_view()
+        '''))
+
+    op.drop_table('search_index')
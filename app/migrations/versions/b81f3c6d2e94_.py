@@ -0,0 +1,108 @@
+"""Split transfer stats rollups into daily totals and per sender totals, with one transfer use encoding
+
+Revision ID: b81f3c6d2e94
+Revises: 5e8b1d3a7f20
+Create Date: 2026-10-18 21:04:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f3c6d2e94'
+down_revision = '5e8b1d3a7f20'
+branch_labels = None
+depends_on = None
+
+# Rollups were backfilled with postgres' encoding of transfer uses, but added to with json.dumps'
+TRANSFER_USE = "CASE WHEN transfer_use = '' THEN '' ELSE transfer_use::jsonb::text END"
+
+
+def upgrade():
+    op.create_table('sender_transfer_stats_rollup',
+    sa.Column('organisation_id', sa.Integer(), nullable=False),
+    sa.Column('token_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('transfer_type', sa.String(), nullable=False),
+    sa.Column('transfer_subtype', sa.String(), nullable=False),
+    sa.Column('transfer_use', sa.String(), nullable=False),
+    sa.Column('sender_user_id', sa.Integer(), nullable=False),
+    sa.Column('sender_transfer_account_id', sa.Integer(), nullable=False),
+    sa.Column('total_amount_wei', sa.Numeric(precision=27), nullable=False),
+    sa.Column('transfer_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('organisation_id', 'token_id', 'day', 'transfer_type', 'transfer_subtype',
+                            'transfer_use', 'sender_user_id', 'sender_transfer_account_id')
+    )
+    op.create_index(op.f('ix_sender_transfer_stats_rollup_organisation_id'), 'sender_transfer_stats_rollup',
+                    ['organisation_id'], unique=False)
+
+    op.execute(f"""
+        INSERT INTO sender_transfer_stats_rollup
+            (organisation_id, token_id, day, transfer_type, transfer_subtype, transfer_use,
+             sender_user_id, sender_transfer_account_id, total_amount_wei, transfer_count)
+        SELECT organisation_id, token_id, day, transfer_type, transfer_subtype, {TRANSFER_USE},
+               sender_user_id, sender_transfer_account_id, sum(total_amount_wei), sum(transfer_count)
+        FROM transfer_stats_rollup
+        WHERE transfer_status = 'COMPLETE'
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+    """)
+
+    op.execute(f"""
+        CREATE TEMPORARY TABLE daily_transfer_stats AS
+        SELECT organisation_id, token_id, day, transfer_type, transfer_subtype, transfer_status,
+               {TRANSFER_USE} AS transfer_use, sum(total_amount_wei) AS total_amount_wei,
+               sum(transfer_count) AS transfer_count
+        FROM transfer_stats_rollup
+        GROUP BY 1, 2, 3, 4, 5, 6, 7
+    """)
+    op.execute('TRUNCATE transfer_stats_rollup')
+
+    op.drop_constraint('transfer_stats_rollup_pkey', 'transfer_stats_rollup', type_='primary')
+    op.drop_column('transfer_stats_rollup', 'sender_transfer_account_id')
+    op.drop_column('transfer_stats_rollup', 'sender_user_id')
+    op.create_primary_key('transfer_stats_rollup_pkey', 'transfer_stats_rollup',
+                          ['organisation_id', 'token_id', 'day', 'transfer_type', 'transfer_subtype',
+                           'transfer_status', 'transfer_use'])
+
+    op.execute('INSERT INTO transfer_stats_rollup SELECT * FROM daily_transfer_stats')
+    op.execute('DROP TABLE daily_transfer_stats')
+
+
+def downgrade():
+    # Per sender totals of rejected transfers aren't kept, so they're rebuilt from the transfers themselves
+    op.execute('TRUNCATE transfer_stats_rollup')
+
+    op.drop_constraint('transfer_stats_rollup_pkey', 'transfer_stats_rollup', type_='primary')
+    op.add_column('transfer_stats_rollup', sa.Column('sender_user_id', sa.Integer(), nullable=False))
+    op.add_column('transfer_stats_rollup', sa.Column('sender_transfer_account_id', sa.Integer(), nullable=False))
+    op.create_primary_key('transfer_stats_rollup_pkey', 'transfer_stats_rollup',
+                          ['organisation_id', 'token_id', 'day', 'transfer_type', 'transfer_subtype',
+                           'transfer_status', 'transfer_use', 'sender_user_id', 'sender_transfer_account_id'])
+
+    op.execute("""
+        INSERT INTO transfer_stats_rollup
+            (organisation_id, token_id, day, transfer_type, transfer_subtype, transfer_status, transfer_use,
+             sender_user_id, sender_transfer_account_id, total_amount_wei, transfer_count)
+        SELECT o.organisation_id,
+               coalesce(t.token_id, 0),
+               t.created::date,
+               coalesce(t.transfer_type::text, ''),
+               coalesce(t.transfer_subtype::text, ''),
+               t.transfer_status::text,
+               CASE WHEN t.transfer_use IS NULL OR t.transfer_use::jsonb IN ('null', '[]', '{}', '""') THEN ''
+                    ELSE t.transfer_use::jsonb::text END,
+               coalesce(t.sender_user_id, 0),
+               coalesce(t.sender_transfer_account_id, 0),
+               coalesce(sum(coalesce(t._transfer_amount_wei, 0)), 0),
+               count(t.id)
+        FROM credit_transfer t
+        JOIN organisation_association_table o ON o.credit_transfer_id = t.id
+        WHERE o.organisation_id IS NOT NULL
+          AND t.created IS NOT NULL
+          AND t.transfer_status IN ('COMPLETE', 'REJECTED')
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+    """)
+
+    op.drop_index(op.f('ix_sender_transfer_stats_rollup_organisation_id'), table_name='sender_transfer_stats_rollup')
+    op.drop_table('sender_transfer_stats_rollup')
@@ -30,11 +30,9 @@ class RefreshTokenAPI(MethodView):
 
             auth_token = g.user.encode_auth_token()
 
+            # The last_seen TS for this user is recorded by requires_auth
             response_object = create_user_response_object(g.user, auth_token, 'Token refreshed successfully.')
 
-            # Update the last_seen TS for this user
-            g.user.update_last_seen_ts()
-
             return make_response(jsonify(response_object)), 200
 
         except Exception as e:
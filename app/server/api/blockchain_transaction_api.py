@@ -45,8 +45,9 @@ class BlockchainTransactionRPC(MethodView):
         if call == 'DEDUPLICATE':
             min_task_id = post_data.get('min_task_id')
             max_task_id = post_data.get('max_task_id')
+            dry_run = post_data.get('dry_run', False)
 
-            res = bt.deduplicate(min_task_id, max_task_id)
+            res = bt.deduplicate(min_task_id, max_task_id, dry_run)
 
             response_object = {
                 'message': 'De-duplicating tasks',
@@ -55,6 +56,16 @@ class BlockchainTransactionRPC(MethodView):
 
             return make_response(jsonify(response_object)), 200
 
+        if call == 'TOPUP_WALLETS_METRICS':
+            res = bt.get_topup_wallets_metrics()
+
+            response_object = {
+                'message': 'Last wallet topup run',
+                'data': res
+            }
+
+            return make_response(jsonify(response_object)), 200
+
         response_object = {
             'message': 'Call not recognised',
         }
@@ -7,24 +7,29 @@ import sentry_sdk
 import base64
 from server import db
 from server.models.token import Token
-from server.models.utils import paginate_query
+from server.models.utils import paginate_query_with_cursor
 from server.models.credit_transfer import CreditTransfer
 from server.models.blockchain_address import BlockchainAddress
 from server.schemas import credit_transfers_schema, credit_transfer_schema, view_credit_transfers_schema
 from server.utils.auth import requires_auth
 from server.utils import pusher
 from server.utils.access_control import AccessControl
-from server.utils.credit_transfer import find_user_with_transfer_account_from_identifiers
+from server.utils.credit_transfer import find_user_with_transfer_account_from_identifiers, find_users_with_transfer_accounts
 from server.utils.transfer_enums import TransferTypeEnum, TransferSubTypeEnum
 from server.utils.credit_transfer import (
     make_payment_transfer,
     make_target_balance_transfer,
     make_blockchain_transfer)
 from server.utils.metrics import calculate_transfer_stats
+from server.utils.bulk_transfer import (
+    BulkTransferJob,
+    BULK_TRANSFER_TYPES,
+    run_bulk_transfer_job,
+    submit_bulk_transfer_job)
 
 from server.utils.transfer_filter import TRANSFER_FILTERS, process_transfer_filters
 
-from server.exceptions import NoTransferAccountError, UserNotFoundError, InsufficientBalanceError, AccountNotApprovedError, \
+from server.exceptions import InsufficientBalanceError, AccountNotApprovedError, \
     InvalidTargetBalanceError, BlockchainError
 
 credit_transfer_blueprint = Blueprint('credit_transfer', __name__)
@@ -35,7 +40,8 @@ class CreditTransferAPI(MethodView):
     def get(self, credit_transfer_id):
         transfer_account_ids = request.args.get('transfer_account_ids')
         transfer_type = request.args.get('transfer_type', 'ALL')
-        get_transfer_stats = False
+        # Stats are a full pass over the rollups and a balance call, so only made when asked for
+        get_transfer_stats = request.args.get('get_stats', 'false').lower() == 'true'
 
         transfer_list = None
 
@@ -100,15 +106,17 @@ class CreditTransferAPI(MethodView):
                         or_(CreditTransfer.recipient_transfer_account_id.in_(parsed_transfer_account_ids),
                             CreditTransfer.sender_transfer_account_id.in_(parsed_transfer_account_ids)))
 
-            transfers, total_items, total_pages = paginate_query(query, CreditTransfer)
+            query = query.options(*CreditTransfer.list_query_options())
 
-            #
-            # if get_transfer_stats:
-            #     transfer_stats = calculate_transfer_stats(total_time_series=True)
-            # else:
-            #     transfer_stats = None
+            transfers, total_items, total_pages, next_cursor = paginate_query_with_cursor(query, CreditTransfer)
 
-            transfer_stats = {'total_distributed': '15300.0000000000000000', 'total_spent': 0, 'total_exchanged': 0, 'has_transferred_count': 0, 'zero_balance_count': 0, 'total_beneficiaries': 3, 'total_users': 3, 'master_wallet_balance': 0, 'daily_transaction_volume': [{'date': '2020-04-29T07:05:01.771621', 'volume': 0}], 'daily_disbursement_volume': [{'date': '2020-04-29T00:00:00', 'volume': ('300.0000000000000000')}, {'date': '2020-04-28T00:00:00', 'volume': '15000.0000000000000000'}], 'transfer_use_breakdown': [], 'last_day_volume': {'date': '2020-04-29T07:05:01.771617', 'volume': 0}, 'filter_active': False}
+            # Held until the transfers are dumped, so the schema finds them in the identity map
+            authorising_users = CreditTransfer.preload_authorising_users(transfers)
+
+            if get_transfer_stats:
+                transfer_stats = calculate_transfer_stats(total_time_series=True)
+            else:
+                transfer_stats = None
 
             if AccessControl.has_sufficient_tier(g.user.roles, 'ADMIN', 'admin'):
                 transfer_list = credit_transfers_schema.dump(transfers).data
@@ -120,6 +128,7 @@ class CreditTransferAPI(MethodView):
                 'message': 'Successfully Loaded.',
                 'items': total_items,
                 'pages': total_pages,
+                'next_cursor': next_cursor,
                 'data': {
                     'credit_transfers': transfer_list,
                     'transfer_stats': transfer_stats
@@ -236,16 +245,12 @@ class CreditTransferAPI(MethodView):
                 return make_response(jsonify(response_object)), 400
 
             transfer_user_list = []
-            for transfer_account_id in recipient_transfer_accounts_ids:
-                try:
-                    individual_sender_user = None
-                    individual_recipient_user = find_user_with_transfer_account_from_identifiers(
-                        None, None, transfer_account_id)
-
-                    transfer_user_list.append((individual_sender_user, individual_recipient_user))
-
-                except (NoTransferAccountError, UserNotFoundError) as e:
-                    response_list.append({'status': 400, 'message': str(e)})
+            for _, individual_recipient_user, error in find_users_with_transfer_accounts(
+                    recipient_transfer_accounts_ids):
+                if error:
+                    response_list.append({'status': 400, 'message': error})
+                else:
+                    transfer_user_list.append((None, individual_recipient_user))
 
         else:
             try:
@@ -323,7 +328,8 @@ class CreditTransferAPI(MethodView):
                         transfer_subtype=TransferSubTypeEnum.DISBURSEMENT,
                         automatically_resolve_complete=auto_resolve,
                         queue=queue,
-                        enable_pusher=not is_bulk
+                        enable_pusher=not is_bulk,
+                        batch_blockchain_payload=is_bulk
                     )
 
                 elif transfer_type == 'BALANCE':
@@ -370,6 +376,9 @@ class CreditTransferAPI(MethodView):
 
                     return make_response(jsonify(response_object)), 201
 
+        if is_bulk and transfer_type == 'DISBURSEMENT' and auto_resolve:
+            CreditTransfer.send_blockchain_payloads_to_worker_in_batches(credit_transfers, queue=queue)
+
         db.session.flush()
 
         if is_bulk:
@@ -387,6 +396,132 @@ class CreditTransferAPI(MethodView):
         return make_response(jsonify(response_object)), 201
 
 
+class BulkTransferJobAPI(MethodView):
+
+    def _get_job_status(self, job_id):
+        job_status = BulkTransferJob(job_id).get_status()
+
+        if job_status is None or job_status['organisation_id'] != getattr(g.active_organisation, 'id', None):
+            return None
+
+        return job_status
+
+    @requires_auth(allowed_roles={'ADMIN': 'any'})
+    def get(self, job_id):
+        job_status = self._get_job_status(job_id)
+
+        if job_status is None:
+            response_object = {
+                'message': 'Bulk transfer job not found'
+            }
+            return make_response(jsonify(response_object)), 404
+
+        response_object = {
+            'message': 'Bulk transfer job {}'.format(job_status['status'].lower()),
+            'data': {
+                'bulk_transfer_job': job_status
+            }
+        }
+
+        return make_response(jsonify(response_object)), 200
+
+    @requires_auth(allowed_roles={'ADMIN': 'admin'})
+    def post(self, job_id):
+        """
+        Like a bulk CreditTransferAPI.post, but made in the background: returns a job id straight away,
+        whose progress and per recipient errors can be read from the GET endpoint.
+        """
+        post_data = request.get_json()
+
+        transfer_type = post_data.get('transfer_type')
+        transfer_amount = abs(round(float(post_data.get('transfer_amount') or 0), 6))
+        token_id = post_data.get('token_id')
+        target_balance = post_data.get('target_balance')
+        recipient_transfer_accounts_ids = post_data.get('recipient_transfer_accounts_ids')
+
+        if transfer_type not in BULK_TRANSFER_TYPES:
+            response_object = {
+                'message': 'Bulk transfer must be either disbursement or balance',
+            }
+            return make_response(jsonify(response_object)), 400
+
+        if transfer_amount <= 0 and not target_balance:
+            response_object = {
+                'message': 'Transfer amount must be positive',
+            }
+            return make_response(jsonify(response_object)), 400
+
+        if not recipient_transfer_accounts_ids:
+            response_object = {
+                'message': 'Must provide recipient_transfer_accounts_ids',
+            }
+            return make_response(jsonify(response_object)), 400
+
+        if token_id:
+            token = Token.query.get(token_id)
+            if not token:
+                response_object = {
+                    'message': 'Token not found'
+                }
+                return make_response(jsonify(response_object)), 404
+        elif g.active_organisation is None:
+            response_object = {
+                'message': 'Must provide token_id'
+            }
+            return make_response(jsonify(response_object)), 400
+        else:
+            token = g.active_organisation.token
+
+        job = submit_bulk_transfer_job(
+            transfer_type,
+            recipient_transfer_accounts_ids,
+            token,
+            transfer_amount=transfer_amount,
+            target_balance=target_balance,
+            automatically_resolve_complete=AccessControl.has_sufficient_tier(g.user.roles, 'ADMIN', 'superadmin')
+        )
+
+        response_object = {
+            'message': 'Bulk transfer job submitted',
+            'data': {
+                'bulk_transfer_job': job.get_status()
+            }
+        }
+
+        return make_response(jsonify(response_object)), 202
+
+    @requires_auth(allowed_roles={'ADMIN': 'admin'})
+    def put(self, job_id):
+        """
+        Resumes a job that failed or stopped, from the recipient after the last chunk it transferred to
+        """
+        job_status = self._get_job_status(job_id)
+
+        if job_status is None:
+            response_object = {
+                'message': 'Bulk transfer job not found'
+            }
+            return make_response(jsonify(response_object)), 404
+
+        if not BulkTransferJob.can_resume(job_status):
+            response_object = {
+                'message': 'Bulk transfer job is {}'.format(job_status['status'].lower())
+            }
+            return make_response(jsonify(response_object)), 400
+
+        job = BulkTransferJob(job_id)
+        job.resume(run_bulk_transfer_job)
+
+        response_object = {
+            'message': 'Bulk transfer job resumed',
+            'data': {
+                'bulk_transfer_job': job.get_status()
+            }
+        }
+
+        return make_response(jsonify(response_object)), 202
+
+
 class ConfirmWithdrawalAPI(MethodView):
 
     @requires_auth(allowed_roles={'ADMIN': 'admin'})
@@ -473,17 +608,6 @@ class CreditTransferStatsApi(MethodView):
         filters = process_transfer_filters(encoded_filters)
         transfer_stats = calculate_transfer_stats(total_time_series=True, start_date=start_date, end_date=end_date, user_filter=filters)
 
-        transfer_stats = {'total_distributed': '15300.0000000000000000', 'total_spent': 0, 'total_exchanged': 0,
-                          'has_transferred_count': 0, 'zero_balance_count': 0, 'total_beneficiaries': 3,
-                          'total_users': 3, 'master_wallet_balance': 0,
-                          'daily_transaction_volume': [{'date': '2020-04-29T07:05:01.771621', 'volume': 0}],
-                          'daily_disbursement_volume': [
-                              {'date': '2020-04-29T00:00:00', 'volume': ('300.0000000000000000')},
-                              {'date': '2020-04-28T00:00:00', 'volume': '15000.0000000000000000'}],
-                          'transfer_use_breakdown': [],
-                          'last_day_volume': {'date': '2020-04-29T07:05:01.771617', 'volume': 0},
-                          'filter_active': False}
-
         response_object = {
             'status': 'success',
             'message': 'Successfully Loaded.',
@@ -520,6 +644,19 @@ credit_transfer_blueprint.add_url_rule(
     methods=['GET', 'PUT']
 )
 
+credit_transfer_blueprint.add_url_rule(
+    '/credit_transfer/bulk/',
+    view_func=BulkTransferJobAPI.as_view('bulk_transfer_job_view'),
+    methods=['POST'],
+    defaults={'job_id': None}
+)
+
+credit_transfer_blueprint.add_url_rule(
+    '/credit_transfer/bulk/<string:job_id>/',
+    view_func=BulkTransferJobAPI.as_view('single_bulk_transfer_job_view'),
+    methods=['GET', 'PUT']
+)
+
 credit_transfer_blueprint.add_url_rule(
     '/credit_transfer/internal/',
     view_func=InternalCreditTransferAPI.as_view('internal_credit_transfer_view'),
@@ -4,9 +4,13 @@ from openpyxl import load_workbook
 import pandas as pd
 
 from server.constants import ALLOWED_SPREADSHEET_EXTENSIONS, SPREADSHEET_UPLOAD_REQUESTED_ATTRIBUTES
-from server import db
 from server.utils.auth import requires_auth
-from server.utils import user as UserUtils
+from server.utils.user_import import (
+    UserImportJob,
+    import_user_rows,
+    rows_from_dataset,
+    run_user_import_job,
+    submit_user_import_job)
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -50,54 +54,121 @@ class SpreadsheetUploadAPI(MethodView):
 
 class DatasetAPI(MethodView):
 
-    def add_diagnostic(self, diagnostic):
-        print(diagnostic)
-        self.diagnostics.append(diagnostic)
-
     @requires_auth(allowed_roles={'ADMIN': 'admin'})
     def post(self):
         # get the post data
         post_data = request.get_json()
 
-        is_vendor = post_data.get('isVendor', False)
+        rows = rows_from_dataset(
+            post_data.get('data'), post_data.get('headerPositions'), is_vendor=post_data.get('isVendor', False)
+        )
 
-        header_postions = post_data.get('headerPositions')
+        diagnostics = []
 
-        self.diagnostics = []
+        for i in range(0, len(rows), UserImportJob.chunk_size):
+            chunk_diagnostics = import_user_rows(
+                rows[i:i + UserImportJob.chunk_size], organisation=g.active_organisation
+            )
+            diagnostics.extend((diagnostic['message'], diagnostic['status']) for diagnostic in chunk_diagnostics)
 
-        for datarow in post_data.get('data'):
+        response_object = {
+            'status': 'success',
+            'message': 'Successfully Saved.',
+            'diagnostics': diagnostics
+        }
 
+        return make_response(jsonify(response_object)), 201
 
-            attribute_dict = {}
 
-            contains_anything = False
-            for key, header_label in header_postions.items():
+class UserImportJobAPI(MethodView):
 
-                attribute = datarow.get(key)
+    def _get_job_status(self, job_id):
+        job_status = UserImportJob(job_id).get_status()
 
-                if attribute:
-                    contains_anything = True
-                    attribute_dict[header_label] = attribute
+        if job_status is None or job_status['organisation_id'] != getattr(g.active_organisation, 'id', None):
+            return None
 
-            if contains_anything:
-                item_response_object, response_code = UserUtils.proccess_create_or_modify_user_request(attribute_dict,
-                                                                                                       force_dict_keys_lowercase=True,
-                                                                                                       allow_existing_user_modify=True)
+        return job_status
 
-                self.diagnostics.append((item_response_object.get('message'), response_code))
+    @requires_auth(allowed_roles={'ADMIN': 'admin'})
+    def get(self, job_id):
+        job_status = self._get_job_status(job_id)
 
-                if response_code == 200:
-                    db.session.commit()
-                else:
-                    db.session.flush()
+        if job_status is None:
+            response_object = {
+                'message': 'User import job not found'
+            }
+            return make_response(jsonify(response_object)), 404
 
         response_object = {
-            'status': 'success',
-            'message': 'Successfully Saved.',
-            'diagnostics': self.diagnostics
+            'message': 'User import job {}'.format(job_status['status'].lower()),
+            'data': {
+                'user_import_job': job_status
+            }
         }
 
-        return make_response(jsonify(response_object)), 201
+        return make_response(jsonify(response_object)), 200
+
+    @requires_auth(allowed_roles={'ADMIN': 'admin'})
+    def post(self, job_id):
+        """
+        Like DatasetAPI.post, but imported in the background: returns a job id straight away, whose progress and
+        per row diagnostics can be read from the GET endpoint.
+        """
+        post_data = request.get_json()
+
+        rows = rows_from_dataset(
+            post_data.get('data') or [], post_data.get('headerPositions') or {},
+            is_vendor=post_data.get('isVendor', False)
+        )
+
+        if not rows:
+            response_object = {
+                'message': 'No rows to import'
+            }
+            return make_response(jsonify(response_object)), 400
+
+        job = submit_user_import_job(rows)
+
+        response_object = {
+            'message': 'User import job submitted',
+            'data': {
+                'user_import_job': job.get_status()
+            }
+        }
+
+        return make_response(jsonify(response_object)), 202
+
+    @requires_auth(allowed_roles={'ADMIN': 'admin'})
+    def put(self, job_id):
+        """
+        Resumes a job that failed or stopped, from the row after the last chunk it imported
+        """
+        job_status = self._get_job_status(job_id)
+
+        if job_status is None:
+            response_object = {
+                'message': 'User import job not found'
+            }
+            return make_response(jsonify(response_object)), 404
+
+        if not UserImportJob.can_resume(job_status):
+            response_object = {
+                'message': 'User import job is {}'.format(job_status['status'].lower())
+            }
+            return make_response(jsonify(response_object)), 400
+
+        job = UserImportJob(job_id)
+        job.resume(run_user_import_job)
+
+        response_object = {
+            'message': 'User import job resumed',
+            'data': {
+                'user_import_job': job.get_status()
+            }
+        }
+
+        return make_response(jsonify(response_object)), 202
 
 
 # add Rules for API Endpoints
@@ -111,4 +182,17 @@ dataset_blueprint.add_url_rule(
     '/dataset/',
     view_func=DatasetAPI.as_view('dataset_view'),
     methods=['POST', 'GET']
+)
+
+dataset_blueprint.add_url_rule(
+    '/dataset/import/',
+    view_func=UserImportJobAPI.as_view('user_import_job_view'),
+    methods=['POST'],
+    defaults={'job_id': None}
+)
+
+dataset_blueprint.add_url_rule(
+    '/dataset/import/<string:job_id>/',
+    view_func=UserImportJobAPI.as_view('single_user_import_job_view'),
+    methods=['GET', 'PUT']
 )
\ No newline at end of file
@@ -16,7 +16,7 @@ from server.utils.transfer_filter import process_transfer_filters
 from server.schemas import transfer_accounts_schema, credit_transfers_schema
 from server.models.utils import paginate_query
 from server.utils.metrics import apply_filters
-from server.models.search import SearchView
+from server.models.search import SearchIndex
 from server.models.transfer_account import TransferAccount
 from server.models.credit_transfer import CreditTransfer
 from server.models.user import User
@@ -137,6 +137,7 @@ class SearchAPI(MethodView):
                 else:
                     final_query = final_query.order_by(order(sort_by))
 
+                final_query = final_query.options(*TransferAccount.summary_query_options())
                 transfer_accounts, total_items, total_pages = paginate_query(final_query, TransferAccount)
                 result = transfer_accounts_schema.dump(transfer_accounts)
                 data = { 'transfer_accounts': result.data }
@@ -150,29 +151,32 @@ class SearchAPI(MethodView):
                 else:
                     final_query = final_query.order_by(order(sort_by))
 
+                final_query = final_query.options(*CreditTransfer.list_query_options())
                 credit_transfers, total_items, total_pages = paginate_query(final_query, CreditTransfer)
+                # Held until the transfers are dumped, so the schema finds them in the identity map
+                authorising_users = CreditTransfer.preload_authorising_users(credit_transfers)
                 result = credit_transfers_schema.dump(credit_transfers)
                 data = { 'credit_transfers': result.data }
 
         else:
             # First get users who match search string
             user_search_result = db.session.query(
-                db.distinct(SearchView.id),
-                SearchView,
+                db.distinct(SearchIndex.id),
+                SearchIndex,
                 # This ugly (but functional) multi-tscolumn ranking is a modified from Ben Smithgall's blog post
                 # https://www.codeforamerica.org/blog/2015/07/02/multi-table-full-text-search-with-postgres-flask-and-sqlalchemy/
                 db.func.max(db.func.full_text.ts_rank(
-                    db.func.setweight(db.func.coalesce(SearchView.tsv_email, ''), 'D')\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_phone, ''), 'A'))\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_first_name, ''), 'B'))\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_last_name, ''), 'B'))\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_public_serial_number, ''), 'A'))\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_primary_blockchain_address, ''), 'A'))\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_location, ''), 'C'))\
-                        .concat(db.func.setweight(db.func.coalesce(SearchView.tsv_default_transfer_account_id, ''), 'A')),
+                    db.func.setweight(db.func.coalesce(SearchIndex.tsv_email, ''), 'D')\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_phone, ''), 'A'))\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_first_name, ''), 'B'))\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_last_name, ''), 'B'))\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_public_serial_number, ''), 'A'))\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_primary_blockchain_address, ''), 'A'))\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_location, ''), 'C'))\
+                        .concat(db.func.setweight(db.func.coalesce(SearchIndex.tsv_default_transfer_account_id, ''), 'A')),
                         db.func.to_tsquery(tsquery, postgresql_regconfig='english')))\
                 .label('rank'))\
-                .group_by(SearchView)\
+                .group_by(SearchIndex)\
                 .subquery()
 
             # Then use those results to join aginst TransferAccount or CreditTransfer
@@ -190,6 +194,7 @@ class SearchAPI(MethodView):
                 else:
                     final_query = final_query.order_by(order(sort_by))
 
+                final_query = final_query.options(*TransferAccount.summary_query_options())
                 transfer_accounts, total_items, total_pages = paginate_query(final_query, TransferAccount)
                 result = transfer_accounts_schema.dump(transfer_accounts)
                 data = { 'transfer_accounts': result.data }
@@ -217,7 +222,10 @@ class SearchAPI(MethodView):
                     final_query = final_query.order_by(order(recipient_search_result.c.rank + sender_search_result.c.rank))
                 else:
                     final_query = final_query.order_by(order(sort_by))
+                final_query = final_query.options(*CreditTransfer.list_query_options())
                 credit_transfers, total_items, total_pages = paginate_query(final_query, CreditTransfer)
+                # Held until the transfers are dumped, so the schema finds them in the identity map
+                authorising_users = CreditTransfer.preload_authorising_users(credit_transfers)
                 result = credit_transfers_schema.dump(credit_transfers)
                 data = { 'credit_transfers': result.data }
 
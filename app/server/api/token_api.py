@@ -5,7 +5,7 @@ from server import db, bt
 from server.utils.misc import get_parsed_arg_list
 from server.utils.auth import requires_auth
 from server.models.token import Token, TokenType
-from server.models.exchange import ExchangeContract
+from server.models.exchange import Exchange, ExchangeContract
 from server.schemas import token_schema, tokens_schema
 
 token_blueprint = Blueprint('token', __name__)
@@ -26,7 +26,10 @@ class TokenAPI(MethodView):
 
         exchange_pair_tokens = Token.query.filter(func.lower(Token.symbol).in_(exchange_pairs)).all()
 
-        tokens_schema.context = {'exchange_pairs': exchange_pair_tokens}
+        tokens_schema.context = {
+            'exchange_pairs': exchange_pair_tokens,
+            'exchange_rates': Exchange.get_exchange_rates(tokens, exchange_pair_tokens) if exchange_pair_tokens else {}
+        }
 
         response_object = {
             'message': 'success',
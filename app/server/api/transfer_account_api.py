@@ -6,7 +6,7 @@ import orjson
 from sqlalchemy.orm import lazyload
 
 from server import db
-from server.models.utils import paginate_query
+from server.models.utils import paginate_query_with_cursor
 from server.models.transfer_account import TransferAccount, TransferAccountType
 from server.schemas import transfer_accounts_schema, transfer_account_schema, \
     view_transfer_account_schema, view_transfer_accounts_schema
@@ -57,7 +57,10 @@ class TransferAccountAPI(MethodView):
                 # Filter Contract, Float and Organisation Transfer Accounts
                 transfer_accounts_query = (base_query.filter(TransferAccount.account_type == TransferAccountType.USER))
 
-            transfer_accounts, total_items, total_pages = paginate_query(transfer_accounts_query, TransferAccount)
+            transfer_accounts_query = transfer_accounts_query.options(*TransferAccount.summary_query_options())
+
+            transfer_accounts, total_items, total_pages, next_cursor = paginate_query_with_cursor(
+                transfer_accounts_query, TransferAccount)
 
             if transfer_accounts is None:
                 response_object = {
@@ -75,6 +78,7 @@ class TransferAccountAPI(MethodView):
                 'message': 'Successfully Loaded.',
                 'items': total_items,
                 'pages': total_pages,
+                'next_cursor': next_cursor,
                 'query_time': datetime.datetime.utcnow(),
                 'data': {'transfer_accounts': result.data}
             }
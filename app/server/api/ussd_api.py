@@ -10,6 +10,7 @@ from server.models.ussd import UssdMenu
 from server.utils.user import get_user_by_phone, create_user_without_transfer_account
 from server.utils.ussd.kenya_ussd_processor import KenyaUssdProcessor
 from server.utils.ussd.ussd import menu_display_text_in_lang, create_or_update_session
+from server.utils.ussd.session_store import ussd_session_store
 
 ussd_blueprint = Blueprint('ussd', __name__)
 
@@ -54,6 +55,9 @@ class ProcessKenyaUssd(MethodView):
             latest_input = user_input.split('*')[-1]
             if None in [user, session_id]:
                 user_without_transfer_account = create_user_without_transfer_account(phone_number)
+                # Sessions aren't rows any more, so the user has to be added and given an id itself
+                db.session.add(user_without_transfer_account)
+                db.session.flush()
                 current_menu = UssdMenu.find_by_name('initial_language_selection')
                 ussd_session = create_or_update_session(session_id=session_id,
                                                         user=user_without_transfer_account,
@@ -61,17 +65,23 @@ class ProcessKenyaUssd(MethodView):
                                                         service_code=service_code,
                                                         current_menu=current_menu)
                 text = KenyaUssdProcessor.custom_display_text(current_menu, ussd_session)
+                ussd_session_store.save(ussd_session, completed=text.startswith('END'))
             else:
-                current_menu = KenyaUssdProcessor.process_request(session_id, latest_input, user)
-                ussd_session = create_or_update_session(session_id, user, current_menu, user_input, service_code)
+                ussd_session = ussd_session_store.get(session_id)
+                current_menu = KenyaUssdProcessor.process_request(ussd_session, latest_input, user)
+                ussd_session = create_or_update_session(
+                    session_id, user, current_menu, user_input, service_code, session=ussd_session)
                 text = KenyaUssdProcessor.custom_display_text(current_menu, ussd_session)
 
                 if "CON" not in text and "END" not in text:
-                    raise Exception("no menu found. text={}, user={}, menu={}, session={}".format(text, user.id, current_menu.name, ussd_session.id))
+                    raise Exception("no menu found. text={}, user={}, menu={}, session={}".format(text, user.id, current_menu.name, session_id))
 
                 if len(text) > 164:
                     print(f"Warning, text has length {len(text)}, display may be truncated")
 
+                # Saved after the display text, which can add to the session's data
+                ussd_session_store.save(ussd_session, completed=text.startswith('END'))
+
                 db.session.commit()
 
         else:
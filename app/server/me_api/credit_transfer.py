@@ -16,7 +16,7 @@ from server.models.user import User
 from server.models.transfer_card import TransferCard
 from server.models.transfer_account import TransferAccount
 from server.models.credit_transfer import CreditTransfer
-from server.models.utils import paginate_query
+from server.models.utils import paginate_query_with_cursor
 from server.schemas import me_credit_transfers_schema, me_credit_transfer_schema
 from server.utils.auth import requires_auth, show_all
 from server.utils.access_control import AccessControl
@@ -49,7 +49,7 @@ class MeCreditTransferAPI(MethodView):
                 or_(CreditTransfer.recipient_user_id == user.id,
                     CreditTransfer.sender_user_id == user.id))
 
-        transfers, total_items, total_pages = paginate_query(transfers_query, CreditTransfer)
+        transfers, total_items, total_pages, next_cursor = paginate_query_with_cursor(transfers_query, CreditTransfer)
 
         transfer_list = me_credit_transfers_schema.dump(transfers).data
 
@@ -57,6 +57,7 @@ class MeCreditTransferAPI(MethodView):
             'message': 'Successfully Loaded.',
             'items': total_items,
             'pages': total_pages,
+            'next_cursor': next_cursor,
             'data': {
                 'credit_transfers': transfer_list,
             }
@@ -1,8 +1,29 @@
 import datetime
+import hashlib
 
-from server import db
+from sqlalchemy import event
+
+from server import db, red
 from server.models.utils import ModelBase
 
+# Blacklisted tokens are mirrored into this redis sorted set as token hashes, scored by when they can be dropped.
+# It also holds LOADED_MEMBER once existing blacklisted tokens have been copied in from the database, so that losing
+# the set (such as on a redis flush) means it gets loaded again rather than letting tokens through.
+BLACKLIST_KEY = 'BlacklistToken-Hashes'
+LOADED_MEMBER = 'loaded'
+
+# Auth tokens are valid for at most this long (see User.encode_auth_token), so a blacklisted token doesn't need to be
+# remembered for any longer than this after it was blacklisted
+BLACKLIST_RETENTION = datetime.timedelta(days=7)
+
+
+def _token_hash(auth_token):
+    return hashlib.sha256(str(auth_token).encode()).hexdigest()
+
+
+def _drop_after(blacklisted_on):
+    return (blacklisted_on + BLACKLIST_RETENTION).timestamp()
+
 
 class BlacklistToken(ModelBase):
     """
@@ -15,12 +36,33 @@ class BlacklistToken(ModelBase):
 
     @staticmethod
     def check_blacklist(auth_token):
-        # check whether auth token has been blacklisted
-        res = BlacklistToken.query.filter_by(token=str(auth_token)).first()
-        if res:
+        # check whether auth token has been blacklisted, from redis rather than the database
+        pipe = red.pipeline()
+        pipe.zscore(BLACKLIST_KEY, _token_hash(auth_token))
+        pipe.zscore(BLACKLIST_KEY, LOADED_MEMBER)
+        token_score, loaded_score = pipe.execute()
+
+        if token_score is not None:
             return True
-        else:
-            return False
+
+        if loaded_score is None:
+            BlacklistToken.load_blacklist_cache()
+            return red.zscore(BLACKLIST_KEY, _token_hash(auth_token)) is not None
+
+        return False
+
+    @staticmethod
+    def load_blacklist_cache():
+        now = datetime.datetime.now()
+
+        blacklisted = BlacklistToken.query.filter(
+            BlacklistToken.blacklisted_on > now - BLACKLIST_RETENTION
+        ).with_entities(BlacklistToken.token, BlacklistToken.blacklisted_on).all()
+
+        mapping = {_token_hash(token): _drop_after(blacklisted_on) for token, blacklisted_on in blacklisted}
+        mapping[LOADED_MEMBER] = float('inf')
+
+        red.zadd(BLACKLIST_KEY, mapping)
 
     def __init__(self, token):
         self.token = token
@@ -28,3 +70,11 @@ class BlacklistToken(ModelBase):
 
     def __repr__(self):
         return '<id: token: {}'.format(self.token)
+
+
+@event.listens_for(BlacklistToken, 'after_insert')
+def add_to_blacklist_cache(mapper, connection, target):
+    pipe = red.pipeline()
+    pipe.zadd(BLACKLIST_KEY, {_token_hash(target.token): _drop_after(target.blacklisted_on)})
+    pipe.zremrangebyscore(BLACKLIST_KEY, '-inf', datetime.datetime.now().timestamp())
+    pipe.execute()
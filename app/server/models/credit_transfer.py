@@ -5,12 +5,14 @@ from sqlalchemy.dialects.postgresql import JSON, JSONB
 from flask import current_app
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy import Index
-from sqlalchemy.sql import func
+from sqlalchemy.orm import joinedload, selectinload
 
 from server import db, bt
 from server.models.utils import BlockchainTaskableBase, ManyOrgBase
 from server.models.token import Token
 from server.models.transfer_account import TransferAccount
+from server.models.user import User
+from server.models.transfer_stats_rollup import record_transfer_stats
 
 from server.exceptions import (
     NoTransferAccountError,
@@ -60,7 +62,8 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
 
     fiat_ramp = db.relationship('FiatRamp', backref='credit_transfer', lazy=True, uselist=False)
 
-    __table_args__ = (Index('updated_index', "updated"), )
+    __table_args__ = (Index('updated_index', "updated"),
+                      Index('ix_credit_transfer_sender_user_id_created', "sender_user_id", "created"))
 
     from_exchange = db.relationship('Exchange', backref='from_transfer', lazy=True, uselist=False,
                                      foreign_keys='Exchange.from_transfer_id')
@@ -77,13 +80,50 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
     def transfer_amount(self, val):
         self._transfer_amount_wei = val * int(1e16)
 
-    def send_blockchain_payload_to_worker(self, is_retry=False, queue='high-priority'):
+    @staticmethod
+    def list_query_options():
+        """
+        Loader options for listing transfers with credit_transfers_schema. Everything the schema dumps is loaded
+        with the page itself, rather than lazily for each transfer.
+        """
+        sender_transfer_account = joinedload(CreditTransfer.sender_transfer_account)
+        recipient_transfer_account = joinedload(CreditTransfer.recipient_transfer_account)
+        return [
+            joinedload(CreditTransfer.token),
+            joinedload(CreditTransfer.sender_user).load_only('first_name', 'last_name'),
+            joinedload(CreditTransfer.sender_user).lazyload(User.custom_attributes),
+            joinedload(CreditTransfer.recipient_user).load_only('first_name', 'last_name'),
+            joinedload(CreditTransfer.recipient_user).lazyload(User.custom_attributes),
+            sender_transfer_account.joinedload(TransferAccount.token),
+            sender_transfer_account.lazyload(TransferAccount.users),
+            recipient_transfer_account.joinedload(TransferAccount.token),
+            # For the recipient's location
+            recipient_transfer_account.joinedload(TransferAccount.users).load_only('lat', 'lng'),
+            recipient_transfer_account.joinedload(TransferAccount.users).lazyload(User.custom_attributes),
+            joinedload(CreditTransfer.from_exchange),
+            selectinload(CreditTransfer.attached_images)
+        ]
+
+    @staticmethod
+    def preload_authorising_users(credit_transfers):
+        """
+        Loads the authorising users of many transfers in one query, so that looking each one up by id (as
+        CreditTransferSchema does) is answered from the session's identity map.
+        The identity map only holds weak references, so keep the returned users until the transfers are dumped.
+        """
+        authorising_user_ids = {t.authorising_user_id for t in credit_transfers if t.authorising_user_id is not None}
+        if not authorising_user_ids:
+            return []
+
+        return User.query.filter(User.id.in_(authorising_user_ids)).all()
+
+    def _blockchain_payload(self):
         sender_approval = self.sender_transfer_account.get_or_create_system_transfer_approval()
 
         recipient_approval = self.recipient_transfer_account.get_or_create_system_transfer_approval()
-        self.blockchain_task_uuid = bt.make_token_transfer(
+
+        return dict(
             signing_address=self.sender_transfer_account.organisation.system_blockchain_address,
-            token=self.token,
             from_address=self.sender_transfer_account.blockchain_address,
             to_address=self.recipient_transfer_account.blockchain_address,
             amount=self.transfer_amount,
@@ -92,11 +132,41 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
                         [
                             sender_approval.eth_send_task_uuid, sender_approval.approval_task_uuid,
                             recipient_approval.eth_send_task_uuid, recipient_approval.approval_task_uuid
-                        ])),
-            queue=queue
+                        ]))
         )
 
-    def resolve_as_completed(self, existing_blockchain_txn=None, queue='high-priority'):
+    def send_blockchain_payload_to_worker(self, is_retry=False, queue='high-priority'):
+        self.blockchain_task_uuid = bt.make_token_transfer(
+            token=self.token,
+            queue=queue,
+            **self._blockchain_payload()
+        )
+
+    @staticmethod
+    def send_blockchain_payloads_to_worker_in_batches(credit_transfers, queue='high-priority'):
+        """
+        Sends the blockchain payloads for many transfers at once, batched by signing wallet and token,
+        so the worker can send and check each batch as a single unit.
+        Each transfer still gets its own blockchain task uuid.
+        """
+        transfers_by_signer_and_token = {}
+        for transfer in credit_transfers:
+            payload = transfer._blockchain_payload()
+            key = (payload.pop('signing_address'), transfer.token)
+            transfers_by_signer_and_token.setdefault(key, []).append((transfer, payload))
+
+        for (signing_address, token), transfers_and_payloads in transfers_by_signer_and_token.items():
+            task_uuids = bt.make_token_transfers_batch(
+                signing_address=signing_address,
+                token=token,
+                transfers=[payload for _, payload in transfers_and_payloads],
+                queue=queue
+            )
+
+            for (transfer, _), task_uuid in zip(transfers_and_payloads, task_uuids):
+                transfer.blockchain_task_uuid = task_uuid
+
+    def resolve_as_completed(self, existing_blockchain_txn=None, queue='high-priority', batch_blockchain_payload=False):
         if self.transfer_status not in [None, TransferStatusEnum.PENDING]:
             raise Exception(f'Transfer resolve function called multiple times for transaciton {self.id}')
         self.check_sender_transfer_limits()
@@ -111,7 +181,10 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
 
         if self.fiat_ramp and self.transfer_type in [TransferTypeEnum.DEPOSIT, TransferTypeEnum.WITHDRAWAL]:
             self.fiat_ramp.resolve_as_completed()
-        if not existing_blockchain_txn:
+        record_transfer_stats(self)
+
+        # Batched payloads are sent by the caller once every transfer in the batch is resolved
+        if not existing_blockchain_txn and not batch_blockchain_payload:
             self.send_blockchain_payload_to_worker(queue=queue)
 
     def resolve_as_rejected(self, message=None):
@@ -127,6 +200,8 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
         if message:
             self.resolution_message = message
 
+        record_transfer_stats(self)
+
     def get_transfer_limits(self):
         import server.utils.transfer_limits
 
@@ -146,10 +221,7 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
 
             if limit.transfer_count is not None:
                 # GE Limits
-                transaction_count = limit.apply_all_filters(
-                    self,
-                    db.session.query(func.count(CreditTransfer.id).label('count'))
-                ).execution_options(show_all=True).first().count
+                _, transaction_count = limit.rolling_totals(self)
 
                 if (transaction_count or 0) > limit.transfer_count:
                     message = 'Account Limit "{}" reached. Allowed {} transaction per {} days'\
@@ -182,10 +254,7 @@ class CreditTransfer(ManyOrgBase, BlockchainTaskableBase):
             if limit.total_amount is not None:
                 # Sempo Compliance Account Limits
 
-                transaction_volume = limit.apply_all_filters(
-                    self,
-                    db.session.query(func.sum(CreditTransfer.transfer_amount).label('total'))
-                ).execution_options(show_all=True).first().total or 0
+                transaction_volume, _ = limit.rolling_totals(self)
 
                 if transaction_volume > limit.total_amount:
                     # Don't include the current transaction when reporting amount available
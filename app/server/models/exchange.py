@@ -1,7 +1,7 @@
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm.attributes import flag_modified
 
-from functools import partial
+import math
 from flask import current_app
 
 from server import db, bt
@@ -17,7 +17,12 @@ from server.models.utils import (
 )
 
 from server.utils.transfer_account import find_transfer_accounts_with_matching_token
-from server.utils.root_solver import find_monotonic_increasing_bounds, false_position_method
+from server.utils.exchange import (
+    CurveSnapshot,
+    bonding_curve_reserve_required_for_tokens,
+    bonding_curve_tokens_required_for_reserve,
+    bonding_curve_token1_required_for_token2
+)
 from server.exceptions import InsufficientBalanceError, SubexchangeNotFound
 
 
@@ -156,6 +161,65 @@ class Exchange(BlockchainTaskableBase):
 
         return to_amount/from_amount
 
+    @staticmethod
+    def get_exchange_rates(from_tokens, to_tokens):
+        """
+        Batch version of get_exchange_rate, for every pair of a from token and a different to token.
+        The curve state of each exchange contract's tokens is fetched in one go, and all of its pairs quoted together.
+        :param from_tokens: list of tokens to convert from
+        :param to_tokens: list of tokens to convert to
+        :return: dict of (from_token_id, to_token_id) to rate, leaving out pairs that can't be exchanged
+        """
+        rates = {}
+
+        # Later contracts take precedence, as in _find_exchange_contract
+        for exchange_contract in reversed(ExchangeContract.query.all()):
+            reserve_token = exchange_contract.reserve_token
+
+            network_tokens = [reserve_token]
+            for token in exchange_contract.exchangeable_tokens:
+                try:
+                    exchange_contract.get_subexchange_details(token.address)
+                except SubexchangeNotFound:
+                    continue
+                if token != reserve_token:
+                    network_tokens.append(token)
+
+            pairs = [
+                (from_token, to_token) for from_token in from_tokens for to_token in to_tokens
+                if from_token != to_token
+                and from_token in network_tokens and to_token in network_tokens
+                and (from_token.id, to_token.id) not in rates
+            ]
+
+            if not pairs:
+                continue
+
+            used_tokens = {token for pair in pairs for token in pair}
+            curve_tokens = [token for token in network_tokens[1:] if token in used_tokens]
+            curve_states = bt.get_exchange_curve_states(exchange_contract, curve_tokens) if curve_tokens else []
+
+            # Index 0 is the reserve token
+            token_indices = {token: i for i, token in enumerate([reserve_token] + curve_tokens)}
+            snapshot = CurveSnapshot(
+                supplies=[None] + [state[0] for state in curve_states],
+                reserves=[None] + [state[1] for state in curve_states],
+                reserve_ratios_ppm=[None] + [state[2] for state in curve_states],
+                is_reserve=[True] + [False] * len(curve_tokens)
+            )
+
+            from_amount = 1
+            to_amounts = snapshot.quote(
+                [token_indices[from_token] for from_token, _ in pairs],
+                [token_indices[to_token] for _, to_token in pairs],
+                [from_token.system_amount_to_token(from_amount) for from_token, _ in pairs]
+            )
+
+            for (from_token, to_token), to_amount in zip(pairs, to_amounts):
+                rates[(from_token.id, to_token.id)] = to_token.token_amount_to_system(round(to_amount)) / from_amount
+
+        return rates
+
     def exchange_from_amount(
             self, user, from_token, to_token, from_amount, calculated_to_amount=None, prior_task_uuids=None
     ):
@@ -276,30 +340,43 @@ class Exchange(BlockchainTaskableBase):
 
         return exchange_contract
 
-    def _get_conversion_function(self, exchange_contract, from_token, to_token):
-        return partial(
-            bt.get_conversion_amount,
-            exchange_contract.blockchain_address,
-            from_token,
-            to_token,
-            exchange_contract.reserve_token
-        )
-
     def _estimate_from_amount(self, from_token, to_token, to_desired_amount):
-        max_error = 3e-15
+        """
+        Solves for the amount of from_token needed to receive to_desired_amount of to_token.
+        The curve state is fetched once, and the bonding curve inverted directly from it,
+        rather than searching for the root with a conversion lookup per step
+        """
 
         exchange_contract = self._find_exchange_contract(from_token, to_token)
-        conversion_func = self._get_conversion_function(exchange_contract, from_token, to_token)
+        reserve_token = exchange_contract.reserve_token
+
+        raw_to_amount = to_token.system_amount_to_token(to_desired_amount)
+
+        if from_token != reserve_token and to_token != reserve_token:
+            ((from_token_supply,
+              from_subexchange_reserve,
+              from_subexchange_reserve_ratio_ppm),
+             (to_token_supply,
+              to_subexchange_reserve,
+              to_subexchange_reserve_ratio_ppm)) = bt.get_exchange_curve_states(exchange_contract, [from_token, to_token])
 
-        def root_func(x):
-            return conversion_func(x) - to_desired_amount
+            raw_from_amount = bonding_curve_token1_required_for_token2(from_token_supply, to_token_supply,
+                                                                       from_subexchange_reserve, to_subexchange_reserve,
+                                                                       from_subexchange_reserve_ratio_ppm,
+                                                                       to_subexchange_reserve_ratio_ppm,
+                                                                       raw_to_amount)
+
+        elif to_token == reserve_token:
+            (from_state,) = bt.get_exchange_curve_states(exchange_contract, [from_token])
+
+            raw_from_amount = bonding_curve_tokens_required_for_reserve(*from_state, raw_to_amount)
+
+        else:
+            (to_state,) = bt.get_exchange_curve_states(exchange_contract, [to_token])
 
-        x_lower, y_lower, x_upper, y_upper = find_monotonic_increasing_bounds(root_func, to_desired_amount)
+            raw_from_amount = bonding_curve_reserve_required_for_tokens(*to_state, raw_to_amount)
 
-        new_x, new_y = false_position_method(
-            root_func,
-            x_lower, y_lower,
-            x_upper, y_upper,
-            max_error, max_iterations=6)
+        # Round up, so rounding never leaves the user short of the amount they asked for
+        from_amount = from_token.token_amount_to_system(math.ceil(raw_from_amount))
 
-        return new_x, new_y + to_desired_amount
+        return from_amount, to_desired_amount
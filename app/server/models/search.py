@@ -1,16 +1,83 @@
-from server import db
+from sqlalchemy import event, text
 from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Session, attributes
 from sqlalchemy.sql.functions import GenericFunction
 
-# Note: this represents a matrerialized view.
-# Changes here will NOT automatically turn into database migrations
-class SearchView(db.Model):
-    __tablename__ = 'search_view'
-    id = db.Column(db.String, primary_key=True)
+from server import db
+from server.models.user import User
+
+# User columns that are copied into the search index
+SEARCH_INDEX_USER_COLUMNS = [
+    'email', '_phone', 'first_name', 'last_name', '_public_serial_number',
+    '_location', 'primary_blockchain_address', 'default_transfer_account_id'
+]
+
+# Builds search index rows from users, exactly as the search_view materialized view used to
+SEARCH_INDEX_UPSERT = '''
+    INSERT INTO search_index (
+        id, email, _phone, first_name, last_name, _public_serial_number, _location,
+        primary_blockchain_address, default_transfer_account_id,
+        tsv_email, tsv_phone, tsv_first_name, tsv_last_name, tsv_public_serial_number,
+        tsv_location, tsv_primary_blockchain_address, tsv_default_transfer_account_id
+    )
+    SELECT
+        u.id,
+        u.email,
+        u._phone,
+        u.first_name,
+        u.last_name,
+        u._public_serial_number,
+        u._location,
+        u.primary_blockchain_address,
+        u.default_transfer_account_id,
+        to_tsvector(u.email),
+        to_tsvector(u._phone),
+        to_tsvector(u.first_name),
+        to_tsvector(u.last_name),
+        to_tsvector(u._public_serial_number),
+        to_tsvector(u._location),
+        to_tsvector(u.primary_blockchain_address),
+        to_tsvector(CAST (u.default_transfer_account_id AS VARCHAR(10)))
+    FROM "user" u
+    WHERE {user_filter}
+    ON CONFLICT (id) DO UPDATE SET
+        email = EXCLUDED.email,
+        _phone = EXCLUDED._phone,
+        first_name = EXCLUDED.first_name,
+        last_name = EXCLUDED.last_name,
+        _public_serial_number = EXCLUDED._public_serial_number,
+        _location = EXCLUDED._location,
+        primary_blockchain_address = EXCLUDED.primary_blockchain_address,
+        default_transfer_account_id = EXCLUDED.default_transfer_account_id,
+        tsv_email = EXCLUDED.tsv_email,
+        tsv_phone = EXCLUDED.tsv_phone,
+        tsv_first_name = EXCLUDED.tsv_first_name,
+        tsv_last_name = EXCLUDED.tsv_last_name,
+        tsv_public_serial_number = EXCLUDED.tsv_public_serial_number,
+        tsv_location = EXCLUDED.tsv_location,
+        tsv_primary_blockchain_address = EXCLUDED.tsv_primary_blockchain_address,
+        tsv_default_transfer_account_id = EXCLUDED.tsv_default_transfer_account_id
+'''
+
+
+class SearchIndex(db.Model):
+    """
+    One row of full text search vectors per user. Replaces the search_view materialized view, which had to be
+    refreshed in full on every change to the user table.
+    Rows are kept up to date as users are flushed (see update_search_index), and writes that bypass the ORM are
+    picked up by refresh_search_index.
+    """
+    __tablename__ = 'search_index'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
     email = db.Column(db.String)
     _phone = db.Column(db.String)
     first_name = db.Column(db.String)
     last_name = db.Column(db.String)
+    _public_serial_number = db.Column(db.String)
+    _location = db.Column(db.String)
+    primary_blockchain_address = db.Column(db.String)
+    default_transfer_account_id = db.Column(db.Integer)
     tsv_email = db.Column(TSVECTOR)
     tsv_phone = db.Column(TSVECTOR)
     tsv_first_name = db.Column(TSVECTOR)
@@ -19,7 +86,80 @@ class SearchView(db.Model):
     tsv_primary_blockchain_address = db.Column(TSVECTOR)
     tsv_default_transfer_account_id = db.Column(TSVECTOR)
     tsv_location = db.Column(TSVECTOR)
-    default_transfer_account_id = db.Column(db.Integer)
+
+    __table_args__ = tuple(
+        db.Index(f'ix_search_index_{column}', column, postgresql_using='gin')
+        for column in ['tsv_email', 'tsv_phone', 'tsv_first_name', 'tsv_last_name', 'tsv_public_serial_number',
+                       'tsv_primary_blockchain_address', 'tsv_default_transfer_account_id', 'tsv_location']
+    )
+
+
+def upsert_search_index_rows(connection, user_ids):
+    if not user_ids:
+        return
+
+    connection.execute(
+        text(SEARCH_INDEX_UPSERT.format(user_filter='u.id = ANY(:user_ids)')),
+        user_ids=list(user_ids)
+    )
+
+
+def refresh_search_index(updated_after=None):
+    """
+    Brings the search index up to date with writes to the user table that didn't go through the ORM, such as
+    bulk updates. Run periodically, so those writes are searchable within one interval.
+    :param updated_after: only refresh users updated after this time. Refreshes every user when None
+    """
+    connection = db.session.connection()
+
+    if updated_after is None:
+        connection.execute(text(SEARCH_INDEX_UPSERT.format(user_filter='TRUE')))
+    else:
+        connection.execute(
+            text(SEARCH_INDEX_UPSERT.format(user_filter='u.updated > :updated_after')),
+            updated_after=updated_after
+        )
+
+    connection.execute(text('DELETE FROM search_index s WHERE NOT EXISTS (SELECT 1 FROM "user" u WHERE u.id = s.id)'))
+
+    db.session.commit()
+
+
+@event.listens_for(Session, 'after_flush')
+def update_search_index(session, flush_context):
+    """
+    Updates the search index rows of users whose searchable columns changed in this flush.
+    Only the changed rows are touched, so the cost of a write doesn't grow with the number of users.
+    """
+    changed_user_ids = set()
+    deleted_user_ids = set()
+
+    for instance in session.new:
+        if isinstance(instance, User):
+            changed_user_ids.add(instance.id)
+
+    for instance in session.dirty:
+        if isinstance(instance, User) and any(
+                attributes.get_history(instance, column).has_changes() for column in SEARCH_INDEX_USER_COLUMNS):
+            changed_user_ids.add(instance.id)
+
+    for instance in session.deleted:
+        if isinstance(instance, User):
+            deleted_user_ids.add(instance.id)
+
+    if not (changed_user_ids or deleted_user_ids):
+        return
+
+    connection = session.connection()
+
+    upsert_search_index_rows(connection, changed_user_ids - deleted_user_ids)
+
+    if deleted_user_ids:
+        connection.execute(
+            text('DELETE FROM search_index WHERE id = ANY(:user_ids)'),
+            user_ids=list(deleted_user_ids)
+        )
+
 
 class TSRank(GenericFunction):
     package = 'full_text'
@@ -2,6 +2,7 @@ from typing import Optional, Union
 from decimal import Decimal
 import datetime, enum
 from sqlalchemy.sql import func
+from sqlalchemy.orm import joinedload
 from flask import current_app, g
 from sqlalchemy.ext.hybrid import hybrid_property
 from server import db, bt
@@ -159,6 +160,23 @@ class TransferAccount(OneOrgBase, ModelBase, SoftDelete):
     def primary_user_id(self):
         return self.primary_user.id
 
+    @staticmethod
+    def summary_query_options():
+        """
+        Loader options for listing transfer accounts with the list schemas. Users, their custom attributes and the
+        token are eagerly loaded with only the columns those schemas dump, and transfer history isn't loaded at all.
+        Fetch a transfer account's history separately, from the paginated credit transfer list.
+        """
+        users = joinedload(TransferAccount.users)
+        return [
+            users.load_only(
+                'first_name', 'last_name', 'is_disabled', '_held_roles', 'lat', 'lng', '_location', '_phone',
+                '_public_serial_number', 'default_transfer_account_id', 'created'
+            ),
+            users.joinedload(User.custom_attributes).load_only('name', 'value'),
+            joinedload(TransferAccount.token).load_only('symbol')
+        ]
+
     # rounded balance
     @hybrid_property
     def rounded_account_balance(self):
@@ -188,7 +206,7 @@ class TransferAccount(OneOrgBase, ModelBase, SoftDelete):
                 return approval
         return None
 
-    def approve_and_disburse(self, initial_disbursement=None):
+    def approve_and_disburse(self, initial_disbursement=None, batch_blockchain_payload=False):
         from server.utils.access_control import AccessControl
 
         active_org = getattr(g, 'active_organisation', self.primary_user.default_organisation)
@@ -204,7 +222,8 @@ class TransferAccount(OneOrgBase, ModelBase, SoftDelete):
             # so first check that no credit transfer have already been received
             if len(self.credit_receives) < 1:
                 # make initial disbursement
-                disbursement = self._make_initial_disbursement(initial_disbursement, auto_resolve)
+                disbursement = self._make_initial_disbursement(
+                    initial_disbursement, auto_resolve, batch_blockchain_payload=batch_blockchain_payload)
                 return disbursement
 
             elif len(self.credit_receives) == 1:
@@ -215,7 +234,7 @@ class TransferAccount(OneOrgBase, ModelBase, SoftDelete):
                     disbursement.resolve_as_completed()
                     return disbursement
 
-    def _make_initial_disbursement(self, initial_disbursement, auto_resolve=False):
+    def _make_initial_disbursement(self, initial_disbursement, auto_resolve=False, batch_blockchain_payload=False):
         from server.utils.credit_transfer import make_payment_transfer
 
         active_org = getattr(g, 'active_organisation', Organisation.master_organisation())
@@ -232,7 +251,8 @@ class TransferAccount(OneOrgBase, ModelBase, SoftDelete):
         disbursement = make_payment_transfer(
             initial_disbursement, token=self.token, send_user=sender, receive_user=self.primary_user,
             transfer_subtype=TransferSubTypeEnum.DISBURSEMENT, is_ghost_transfer=False, require_sender_approved=False,
-            require_recipient_approved=False, automatically_resolve_complete=auto_resolve)
+            require_recipient_approved=False, automatically_resolve_complete=auto_resolve,
+            batch_blockchain_payload=batch_blockchain_payload)
 
         return disbursement
 
@@ -0,0 +1,133 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from server import db
+from server.models.credit_transfer import CreditTransfer
+from server.utils.transfer_enums import TransferStatusEnum
+
+ROLLUP_ATTRIBUTES = [
+    'sender_user_id', 'created', 'transfer_type', 'transfer_subtype',
+    'transfer_status', 'exclude_from_limit_calcs', '_transfer_amount_wei'
+]
+
+
+class TransferLimitRollup(db.Model):
+    """
+    Daily totals of each user's sent transfers by type and subtype, used for rolling transfer limit checks.
+    Rejected transfers aren't counted. Kept up to date as transfers are flushed (see update_transfer_limit_rollups).
+    """
+    __tablename__ = 'transfer_limit_rollup'
+
+    sender_user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    transfer_type = db.Column(db.String, primary_key=True)
+    # Empty rather than null for transfers without a subtype, so that every row has a complete key
+    transfer_subtype = db.Column(db.String, primary_key=True)
+    # Matches the 'exclude_from_limit_calcs == False' filter, so null counts as excluded
+    exclude_from_limit_calcs = db.Column(db.Boolean, primary_key=True)
+
+    total_amount_wei = db.Column(db.Numeric(27), default=0, nullable=False)
+    transfer_count = db.Column(db.Integer, default=0, nullable=False)
+
+    sender_user = db.relationship('User', viewonly=True)
+
+
+def _rollup_contribution(values):
+    """
+    :param values: dict of a transfer's ROLLUP_ATTRIBUTES
+    :return: tuple of (rollup key, amount_wei), or None if the transfer doesn't count towards limits
+    """
+    if values['sender_user_id'] is None or values['created'] is None:
+        return None
+
+    # Same as not_rejected_filter, which also leaves out a null status
+    if values['transfer_status'] in [None, TransferStatusEnum.REJECTED]:
+        return None
+
+    key = (
+        values['sender_user_id'],
+        values['created'].date(),
+        values['transfer_type'].value if values['transfer_type'] else '',
+        values['transfer_subtype'].value if values['transfer_subtype'] else '',
+        values['exclude_from_limit_calcs'] is not False
+    )
+
+    return key, int(values['_transfer_amount_wei'] or 0)
+
+
+def _current_and_previous_values(transfer):
+    state = inspect(transfer)
+
+    current = {}
+    previous = {}
+    for attribute in ROLLUP_ATTRIBUTES:
+        history = state.attrs[attribute].history
+        current[attribute] = getattr(transfer, attribute)
+        previous[attribute] = history.deleted[0] if history.deleted else current[attribute]
+
+    return current, previous
+
+
+@event.listens_for(Session, 'after_flush')
+def update_transfer_limit_rollups(session, flush_context):
+    """
+    Applies the change each flushed transfer makes to its sender's daily rollup, as a single upsert per rollup row.
+    Attribute history still holds the pre-flush values here, so the previous contribution can be taken back out.
+    """
+    deltas = {}
+
+    def add_delta(contribution, sign):
+        if contribution is None:
+            return
+        key, amount_wei = contribution
+        amount_delta, count_delta = deltas.get(key, (0, 0))
+        deltas[key] = (amount_delta + sign * amount_wei, count_delta + sign)
+
+    for instance in session.new:
+        if isinstance(instance, CreditTransfer):
+            current, _ = _current_and_previous_values(instance)
+            add_delta(_rollup_contribution(current), 1)
+
+    for instance in session.dirty:
+        if isinstance(instance, CreditTransfer) and session.is_modified(instance):
+            current, previous = _current_and_previous_values(instance)
+            add_delta(_rollup_contribution(previous), -1)
+            add_delta(_rollup_contribution(current), 1)
+
+    for instance in session.deleted:
+        if isinstance(instance, CreditTransfer):
+            _, previous = _current_and_previous_values(instance)
+            add_delta(_rollup_contribution(previous), -1)
+
+    rows = [
+        dict(
+            sender_user_id=key[0],
+            day=key[1],
+            transfer_type=key[2],
+            transfer_subtype=key[3],
+            exclude_from_limit_calcs=key[4],
+            total_amount_wei=amount_delta,
+            transfer_count=count_delta
+        )
+        for key, (amount_delta, count_delta) in deltas.items()
+        if amount_delta != 0 or count_delta != 0
+    ]
+
+    if not rows:
+        return
+
+    table = TransferLimitRollup.__table__
+
+    # Sorted so that concurrent flushes lock the same rows in the same order
+    for row in sorted(rows, key=lambda r: (r['sender_user_id'], r['day'], r['transfer_type'],
+                                          r['transfer_subtype'], r['exclude_from_limit_calcs'])):
+        statement = insert(table).values(**row)
+        statement = statement.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key.columns],
+            set_=dict(
+                total_amount_wei=table.c.total_amount_wei + statement.excluded.total_amount_wei,
+                transfer_count=table.c.transfer_count + statement.excluded.transfer_count
+            )
+        )
+        session.connection().execute(statement)
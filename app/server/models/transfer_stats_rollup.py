@@ -0,0 +1,142 @@
+import json
+
+from sqlalchemy import event, cast, literal, String, Text
+from sqlalchemy.dialects.postgresql import insert, JSONB
+from sqlalchemy.orm import Session
+
+from server import db
+from server.utils.transfer_enums import TransferStatusEnum
+
+PENDING_STATS_KEY = 'transfer_stats_rollup_pending'
+
+
+class TransferStatsRollup(db.Model):
+    """
+    Daily totals of resolved transfers, used to answer dashboard transfer stats without aggregating every transfer.
+    A transfer counts once towards each of its organisations.
+    Rows are added to as transfers are resolved (see record_transfer_stats).
+    """
+    __tablename__ = 'transfer_stats_rollup'
+
+    organisation_id = db.Column(db.Integer, primary_key=True, index=True)
+    token_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    transfer_type = db.Column(db.String, primary_key=True)
+    # Empty rather than null for missing values, so that every row has a complete key
+    transfer_subtype = db.Column(db.String, primary_key=True)
+    transfer_status = db.Column(db.String, primary_key=True)
+    # Postgres' text form of the use's JSON, so that matching uses are grouped together
+    transfer_use = db.Column(db.String, primary_key=True)
+
+    total_amount_wei = db.Column(db.Numeric(27), default=0, nullable=False)
+    transfer_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class SenderTransferStatsRollup(db.Model):
+    """
+    Daily totals of completed transfers for each sender, for the stats that count senders, and for stats with
+    user, transfer account or custom attribute filters, which are applied by joining on the sender.
+    Much larger than TransferStatsRollup, so only used where the sender is needed.
+    """
+    __tablename__ = 'sender_transfer_stats_rollup'
+
+    organisation_id = db.Column(db.Integer, primary_key=True, index=True)
+    token_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    transfer_type = db.Column(db.String, primary_key=True)
+    transfer_subtype = db.Column(db.String, primary_key=True)
+    transfer_use = db.Column(db.String, primary_key=True)
+    # Zero rather than null for transfers without a sending user or transfer account
+    sender_user_id = db.Column(db.Integer, primary_key=True)
+    sender_transfer_account_id = db.Column(db.Integer, primary_key=True)
+
+    total_amount_wei = db.Column(db.Numeric(27), default=0, nullable=False)
+    transfer_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+def record_transfer_stats(transfer):
+    """
+    Queues a resolved transfer to be added to the stats rollups when the session is next flushed, which is when
+    any ids it's missing will have been assigned.
+    """
+    db.session.info.setdefault(PENDING_STATS_KEY, []).append(transfer)
+
+
+def _rollup_rows(transfer):
+    """
+    :return: list of (rollup table, row) tuples that the transfer adds to
+    """
+    if transfer.created is None or transfer.transfer_status is None:
+        return []
+
+    rows = []
+    for organisation in transfer.organisations:
+        row = dict(
+            organisation_id=organisation.id,
+            token_id=transfer.token_id or 0,
+            day=transfer.created.date(),
+            transfer_type=transfer.transfer_type.value if transfer.transfer_type else '',
+            transfer_subtype=transfer.transfer_subtype.value if transfer.transfer_subtype else '',
+            transfer_use=json.dumps(transfer.transfer_use) if transfer.transfer_use else '',
+            total_amount_wei=int(transfer._transfer_amount_wei or 0),
+            transfer_count=1
+        )
+
+        rows.append((TransferStatsRollup.__table__, dict(row, transfer_status=transfer.transfer_status.value)))
+
+        if transfer.transfer_status == TransferStatusEnum.COMPLETE:
+            rows.append((SenderTransferStatsRollup.__table__, dict(
+                row,
+                sender_user_id=transfer.sender_user_id or 0,
+                sender_transfer_account_id=transfer.sender_transfer_account_id or 0
+            )))
+
+    return rows
+
+
+def _encode_transfer_use(transfer_use):
+    # Encoded by postgres rather than json.dumps, the same as the rollups were backfilled with
+    if not transfer_use:
+        return transfer_use
+    return cast(cast(literal(transfer_use, String), JSONB), Text)
+
+
+@event.listens_for(Session, 'after_flush')
+def update_transfer_stats_rollups(session, flush_context):
+    pending = session.info.pop(PENDING_STATS_KEY, [])
+
+    # Transfers that haven't been added to the session yet wait for a later flush
+    unflushed = [transfer for transfer in pending if transfer.id is None]
+    if unflushed:
+        session.info[PENDING_STATS_KEY] = unflushed
+
+    totals = {}
+    for transfer in pending:
+        if transfer.id is None:
+            continue
+        for table, row in _rollup_rows(transfer):
+            key = (table.name, *(v for k, v in sorted(row.items()) if k not in ['total_amount_wei', 'transfer_count']))
+            if key in totals:
+                totals[key][1]['total_amount_wei'] += row['total_amount_wei']
+                totals[key][1]['transfer_count'] += row['transfer_count']
+            else:
+                totals[key] = (table, row)
+
+    # Sorted so that concurrent flushes lock the same rows in the same order
+    for key in sorted(totals.keys()):
+        table, row = totals[key]
+        statement = insert(table).values(**dict(row, transfer_use=_encode_transfer_use(row['transfer_use'])))
+        statement = statement.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key.columns],
+            set_=dict(
+                total_amount_wei=table.c.total_amount_wei + statement.excluded.total_amount_wei,
+                transfer_count=table.c.transfer_count + statement.excluded.transfer_count
+            )
+        )
+        session.connection().execute(statement)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_pending_transfer_stats(session, previous_transaction):
+    # Resolutions that were rolled back never happened
+    session.info.pop(PENDING_STATS_KEY, None)
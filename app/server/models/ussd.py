@@ -1,10 +1,21 @@
+import time
+
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.orm import Session, make_transient_to_detached
 from sqlalchemy.orm.attributes import flag_modified
 import sentry_sdk
 
-from server import db
+from server import db, red
 from server.models.utils import ModelBase
 
+# Bumped whenever a menu changes, so that every process reloads its menu cache
+MENU_VERSION_KEY = 'UssdMenu-Version'
+
+# Menus added without going through the app don't bump MENU_VERSION_KEY, so asking for a menu that isn't cached
+# reloads the cache, but no more often than this many seconds, so that unknown names don't each cost a reload
+MENU_MISS_RELOAD_INTERVAL = 60
+
 
 class UssdMenu(ModelBase):
     __tablename__ = 'ussd_menu'
@@ -27,21 +38,115 @@ class UssdMenu(ModelBase):
 
     @staticmethod
     def find_by_name(name: str) -> "UssdMenu":
-        menus = UssdMenu.query.filter_by(name=name)
-        if menus.count() == 0:
+        menu = ussd_menu_cache.get(name=name)
+        if menu is None:
             sentry_sdk.capture_message("No USSD Menu with name {}".format(name))
             # should handle case if no invalid_request menu?
-            return UssdMenu.query.filter_by(name='exit_invalid_request').first()
+            return ussd_menu_cache.get(name='exit_invalid_request')
         else:
-            return menus.first()
+            return menu
 
     def parent(self):
-        return UssdMenu.query.filter_by(id=self.parent_id).first()
+        return ussd_menu_cache.get(id=self.parent_id)
 
     def __repr__(self):
         return f"<UssdMenu {self.id}: {self.name} - {self.description}>"
 
 
+class UssdMenuCache(object):
+    """
+    Process level cache of every USSD menu, so that USSD hops don't have to query for the menus they show.
+    Menus are kept as detached copies, and merged into the session they're asked for from without a query.
+    The cache is reloaded when MENU_VERSION_KEY has moved on, and when a menu it doesn't have is asked for, at most
+    once every MENU_MISS_RELOAD_INTERVAL.
+    """
+
+    def _load(self, version):
+        by_name = {}
+        by_id = {}
+        for menu in db.session.query(UssdMenu).all():
+            # Copies, so that the cache never holds on to or changes instances in the loading session
+            copy = UssdMenu(
+                id=menu.id, name=menu.name, description=menu.description, parent_id=menu.parent_id,
+                display_key=menu.display_key, authorising_user_id=menu.authorising_user_id,
+                created=menu.created, updated=menu.updated
+            )
+            make_transient_to_detached(copy)
+            by_name[copy.name] = copy
+            by_id[copy.id] = copy
+
+        self.by_name = by_name
+        self.by_id = by_id
+        self.version = version
+        self.loaded_at = time.time()
+        self.loaded = True
+
+    def get(self, name=None, id=None):
+        """
+        :return: the menu with the given name or id, in the current session, or None if there isn't one
+        """
+        version = red.get(MENU_VERSION_KEY)
+        if not self.loaded or version != self.version:
+            self._load(version)
+
+        menu = self.by_name.get(name) if name is not None else self.by_id.get(id)
+        if (
+                menu is None
+                and (name is not None or id is not None)
+                and time.time() - self.loaded_at > MENU_MISS_RELOAD_INTERVAL
+        ):
+            # Perhaps it's new
+            self._load(version)
+            menu = self.by_name.get(name) if name is not None else self.by_id.get(id)
+
+        if menu is None:
+            return None
+
+        return db.session.merge(menu, load=False)
+
+    def clear(self):
+        self.by_name = {}
+        self.by_id = {}
+        self.version = None
+        self.loaded_at = None
+        self.loaded = False
+
+    def __init__(self):
+        self.clear()
+
+
+ussd_menu_cache = UssdMenuCache()
+
+PENDING_MENU_CHANGE_KEY = 'ussd_menu_changed'
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_ussd_menu_changes(session, flush_context):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(instance, UssdMenu) for instance in changed):
+        session.info[PENDING_MENU_CHANGE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_ussd_menu_changes(session):
+    if session.info.pop(PENDING_MENU_CHANGE_KEY, False):
+        red.incr(MENU_VERSION_KEY)
+        ussd_menu_cache.clear()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_ussd_menu_changes(session, previous_transaction):
+    # The cache may have been loaded with the flushed changes, which never happened
+    if session.info.pop(PENDING_MENU_CHANGE_KEY, False):
+        ussd_menu_cache.clear()
+
+
+@event.listens_for(UssdMenu.__table__, 'after_create')
+def clear_ussd_menu_cache(target, connection, **kw):
+    # Any cached menus are from a table that no longer exists
+    ussd_menu_cache.clear()
+
+
 class UssdSession(ModelBase):
     __tablename__ = 'ussd_session'
 
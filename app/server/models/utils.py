@@ -1,15 +1,17 @@
 from contextlib import contextmanager
-from flask import g, request
+from flask import g, request, abort, make_response, jsonify
+import base64
 import datetime
+import json
 from dateutil import parser
 
 from sqlalchemy import event, inspect
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Query
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 
-import server
+import config
 from server import db, bt
 from server.exceptions import OrganisationNotProvidedException, ResourceAlreadyDeletedError
 
@@ -40,7 +42,7 @@ def get_authorising_user_id():
         return None
 
 
-def paginate_query(query, queried_object=None, order_override=None):
+def paginate_query(query, queried_object=None, order_override=None, default_per_page=None):
     """
     Paginates an sqlalchemy query, gracefully managing missing queries.
     Default ordering is to show most recently created first.
@@ -49,12 +51,13 @@ def paginate_query(query, queried_object=None, order_override=None):
     :param query: base query
     :param queried_object: underlying object being queried. Required to sort most recent
     :param order_override: override option for the sort parameter.
+    :param default_per_page: page size when per_page isn't supplied, rather than showing all results
     :returns: tuple of (item list, total number of items, total number of pages)
     """
 
     updated_after = request.args.get('updated_after')
     page = request.args.get('page')
-    per_page = request.args.get('per_page')
+    per_page = request.args.get('per_page', default_per_page)
 
     if updated_after:
         parsed_time = parser.isoparse(updated_after)
@@ -72,12 +75,12 @@ def paginate_query(query, queried_object=None, order_override=None):
         return items, len(items), 1
 
     if page is None:
-        per_page = int(per_page)
+        per_page = min(int(per_page), config.MAX_PAGE_SIZE)
         paginated = query.paginate(0, per_page, error_out=False)
 
         return paginated.items, paginated.total, paginated.pages
 
-    per_page = int(per_page)
+    per_page = min(int(per_page), config.MAX_PAGE_SIZE)
     page = int(page)
 
     paginated = query.paginate(page, per_page, error_out=False)
@@ -85,6 +88,103 @@ def paginate_query(query, queried_object=None, order_override=None):
     return paginated.items, paginated.total, paginated.pages
 
 
+def encode_pagination_cursor(after_id):
+    return base64.urlsafe_b64encode(json.dumps({'after_id': after_id}).encode()).decode()
+
+
+def _abort_bad_pagination_arg(message):
+    # Pagination is read part way through a handler, so stop it with the same json 400 the handlers return
+    abort(make_response(jsonify({'message': message}), 400))
+
+
+def decode_pagination_cursor(cursor):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['after_id'])
+    except (ValueError, KeyError, TypeError):
+        _abort_bad_pagination_arg('Invalid cursor')
+
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        _abort_bad_pagination_arg(f'Invalid {name}: must be an integer')
+
+
+def is_keyset_pagination_request():
+    return any(request.args.get(arg) is not None for arg in ['cursor', 'after_id', 'before_id'])
+
+
+def keyset_paginate_query(query, queried_object):
+    """
+    Paginates an sqlalchemy query by id rather than by offset, so deep pages cost the same as the first.
+    Results are most recently created first. The page following an item is selected with 'cursor' (as returned
+    for the previous page) or 'after_id', and the page preceding it with 'before_id'.
+    Page size is 'per_page', which is capped at MAX_PAGE_SIZE.
+
+    :param query: base query
+    :param queried_object: underlying object being queried
+    :returns: tuple of (item list, cursor of the next page, or None if this is the last page)
+    """
+
+    updated_after = request.args.get('updated_after')
+    cursor = request.args.get('cursor')
+    after_id = _int_arg('after_id')
+    before_id = _int_arg('before_id')
+    per_page = min(_int_arg('per_page', 20), config.MAX_PAGE_SIZE)
+
+    if per_page < 1:
+        _abort_bad_pagination_arg('Invalid per_page: must be at least 1')
+
+    if updated_after:
+        parsed_time = parser.isoparse(updated_after)
+        query = query.filter(queried_object.updated > parsed_time)
+
+    if cursor:
+        after_id = decode_pagination_cursor(cursor)
+
+    if after_id is not None:
+        query = query.filter(queried_object.id < after_id).order_by(queried_object.id.desc())
+    elif before_id is not None:
+        # Walk backwards from before_id, then flip the page back to most recent first
+        query = query.filter(queried_object.id > before_id).order_by(queried_object.id.asc())
+    else:
+        query = query.order_by(queried_object.id.desc())
+
+    # Fetch one extra item to find out whether there's another page, without counting
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if after_id is None and before_id is not None:
+        items.reverse()
+        # before_id itself follows this page
+        has_more = True
+
+    next_cursor = encode_pagination_cursor(items[-1].id) if items and has_more else None
+
+    return items, next_cursor
+
+
+def paginate_query_with_cursor(query, queried_object):
+    """
+    Paginates with keyset_paginate_query when the request asks for it, and paginate_query otherwise.
+    Keyset pages aren't counted, so their total items and pages are None.
+    Either way, at most MAX_PAGE_SIZE items are returned when per_page isn't supplied.
+
+    :returns: tuple of (item list, total number of items, total number of pages, cursor of the next page)
+    """
+    if is_keyset_pagination_request():
+        items, next_cursor = keyset_paginate_query(query, queried_object)
+        return items, None, None, next_cursor
+
+    items, total_items, total_pages = paginate_query(query, queried_object, default_per_page=config.MAX_PAGE_SIZE)
+    return items, total_items, total_pages, None
+
+
 @contextmanager
 def no_expire():
     s = db.session()
@@ -93,6 +193,72 @@ def no_expire():
     s.expire_on_commit = True
 
 
+class _EntityCriteria(object):
+    """
+    What the before_compile filter has to add for one mapped class, worked out once when the class is mapped rather
+    than on every query compile.
+    """
+
+    def soft_delete_criterion(self, entity):
+        return entity.deleted == None
+
+    def organisation_criterion(self, entity, active_organisation_id):
+        if self.many_org:
+            if active_organisation_id is None:
+                # Only public objects are visible without an active organisation
+                return entity.is_public == True
+
+            # An uncorrelated IN on the association table, rather than organisations.any(), which is a correlated
+            # EXISTS through the organisation table that postgres has to run for every row when it's under an OR
+            return or_(
+                getattr(entity, self.id_key).in_(
+                    select([self.association_column]).where(
+                        self.association_organisation_column == active_organisation_id)
+                ),
+                entity.is_public == True,
+            )
+
+        return or_(
+            entity.organisation_id == active_organisation_id,
+            entity.is_public == True,
+        )
+
+    def __init__(self, mapper):
+        cls = mapper.class_
+
+        self.soft_delete = issubclass(cls, SoftDelete)
+        self.many_org = issubclass(cls, ManyOrgBase)
+        self.one_org = issubclass(cls, OneOrgBase)
+
+        if self.many_org:
+            organisations = mapper.relationships['organisations']
+            (id_column, self.association_column), = organisations.synchronize_pairs
+            (_, self.association_organisation_column), = organisations.secondary_synchronize_pairs
+            self.id_key = mapper.get_property_by_column(id_column).key
+
+
+# Mapped class -> _EntityCriteria, for the classes that before_compile filters
+_entity_criteria = {}
+
+
+@event.listens_for(db.Model, 'mapper_configured', propagate=True)
+def _precompute_entity_criteria(mapper, cls):
+    criteria = _EntityCriteria(mapper)
+    if criteria.soft_delete or criteria.many_org or criteria.one_org:
+        _entity_criteria[cls] = criteria
+
+
+def _get_entity_criteria(entity):
+    criteria = _entity_criteria.get(entity)
+    if criteria is None and not isinstance(entity, type):
+        # Aliases aren't cached, since they're usually made per query
+        mapper = getattr(inspect(entity), 'mapper', None)
+        if mapper is not None:
+            criteria = _entity_criteria.get(mapper.class_)
+
+    return criteria
+
+
 @event.listens_for(Query, "before_compile", retval=True)
 def before_compile(query):
     """A query compilation rule that will add limiting criteria for every
@@ -107,48 +273,33 @@ def before_compile(query):
         entity = ent['entity']
         if entity is None:
             continue
-        insp = inspect(ent['entity'])
-        mapper = getattr(insp, 'mapper', None)
-
-        if mapper:
-            # if subclass SoftDelete exists and not show_deleted, return non-deleted items, else show deleted
-            if issubclass(mapper.class_, SoftDelete) and not show_deleted:
-                query = query.enable_assertions(False).filter(ent['entity'].deleted == None)
-
-            if show_all and not show_deleted:
-                return query
-
-            # if the subclass OrgBase exists, then filter by organisations - else, return default query
-            if issubclass(mapper.class_, ManyOrgBase) or issubclass(mapper.class_, OneOrgBase):
-
-                try:
-                    # member_organisations = getattr(g, "member_organisations", [])
-                    active_organisation = getattr(g, "active_organisation", None)
-                    active_organisation_id = getattr(active_organisation, "id", None)
-                    member_organisation_ids = [active_organisation_id] if active_organisation_id else []
-
-                    if issubclass(mapper.class_, ManyOrgBase):
-                        # filters many-to-many
-                        query = query.enable_assertions(False).filter(or_(
-                            ent['entity'].organisations.any(
-                                server.models.organisation.Organisation.id.in_(member_organisation_ids)),
-                            ent['entity'].is_public == True,
-                        ))
-                    else:
-                        query = query.enable_assertions(False).filter(or_(
-                            ent['entity'].organisation_id == active_organisation_id,
-                            ent['entity'].is_public == True,
-                        ))
-
-                except AttributeError:
-                    raise
-
-                except TypeError:
-                    raise OrganisationNotProvidedException('Must provide organisation ID or specify SHOW_ALL flag')
-
-            elif issubclass(mapper.class_, OneOrgBase):
-                # must filter directly on query
-                raise OrganisationNotProvidedException('{} has a custom org base. Must filter directly on query'.format(ent['entity']))
+
+        criteria = _get_entity_criteria(entity)
+        if criteria is None:
+            continue
+
+        # if subclass SoftDelete exists and not show_deleted, return non-deleted items, else show deleted
+        if criteria.soft_delete and not show_deleted:
+            query = query.enable_assertions(False).filter(criteria.soft_delete_criterion(entity))
+
+        if show_all and not show_deleted:
+            return query
+
+        # if the subclass OrgBase exists, then filter by organisations - else, return default query
+        if criteria.many_org or criteria.one_org:
+
+            try:
+                active_organisation = getattr(g, "active_organisation", None)
+                active_organisation_id = getattr(active_organisation, "id", None)
+
+                query = query.enable_assertions(False).filter(
+                    criteria.organisation_criterion(entity, active_organisation_id))
+
+            except AttributeError:
+                raise
+
+            except TypeError:
+                raise OrganisationNotProvidedException('Must provide organisation ID or specify SHOW_ALL flag')
 
     return query
 
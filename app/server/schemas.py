@@ -126,8 +126,17 @@ class TokenSchema(SchemaBase):
 
     def get_exchange_rates(self, obj):
         rates = {}
+
+        # Rates for every pair can be worked out in one go beforehand, with Exchange.get_exchange_rates
+        exchange_rates = self.context.get('exchange_rates')
+
         for to_token in self.context.get('exchange_pairs', []):
             if to_token != obj:
+                if exchange_rates is not None:
+                    if (obj.id, to_token.id) in exchange_rates:
+                        rates[to_token.symbol] = exchange_rates[(obj.id, to_token.id)]
+                    continue
+
                 try:
                     rate = Exchange.get_exchange_rate(obj, to_token)
                     rates[to_token.symbol] = rate
@@ -180,7 +189,7 @@ class CreditTransferSchema(Schema):
     sender_transfer_account    = fields.Nested("server.schemas.TransferAccountSchema", only=("id", "balance", "token", "blockchain_address"))
     recipient_transfer_account = fields.Nested("server.schemas.TransferAccountSchema", only=("id", "balance", "token", "blockchain_address"))
 
-    from_exchange_to_transfer_id = fields.Function(lambda obj: obj.from_exchange.to_transfer.id)
+    from_exchange_to_transfer_id = fields.Function(lambda obj: obj.from_exchange.to_transfer_id)
 
     attached_images         = fields.Nested(UploadedResourceSchema, many=True)
 
@@ -194,6 +203,7 @@ class CreditTransferSchema(Schema):
         if authorising_user_id is None:
             return None
 
+        # Answered from the identity map when the page's authorising users were preloaded
         authorising_user = User.query.get(obj.authorising_user_id)
         if authorising_user is None:
             return None
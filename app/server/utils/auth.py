@@ -7,9 +7,10 @@ from server.models.currency_conversion import CurrencyConversion
 from server.models.transfer_account import TransferAccount
 from server.models.transfer_usage import TransferUsage
 from server.models.user import User
-from server.models.ip_address import IpAddress
 from server.models.organisation import Organisation
 from server.utils.access_control import AccessControl
+from server.utils.auth_cache import auth_snapshot_cache
+from server.utils.user_activity import record_user_activity, get_real_ip
 import config, hmac, hashlib, json, urllib
 from typing import Optional, Tuple, Dict
 
@@ -138,23 +139,28 @@ def requires_auth(f=None,
                         }
                         return make_response(jsonify(response_object)), 401
 
-                    if not user.is_activated:
+                    # Activation, TFA and organisation details come from a cached snapshot where possible,
+                    # rather than loading the user's organisations on every request
+                    auth_snapshot = auth_snapshot_cache.get_or_build(user)
+
+                    if not auth_snapshot['is_activated']:
                         response_object = {
                             'status': 'fail',
                             'message': 'user not activated'
                         }
                         return make_response(jsonify(response_object)), 401
 
-                    if user.is_disabled:
+                    if auth_snapshot['is_disabled']:
                         response_object = {
                             'status': 'fail',
                             'message': 'user has been disabled'
                         }
                         return make_response(jsonify(response_object)), 401
 
-                    tfa_response_object = tfa_logic(user, tfa_token, ignore_tfa_requirement)
-                    if tfa_response_object:
-                        return make_response(jsonify(tfa_response_object)), 401
+                    if auth_snapshot['tfa_required']:
+                        tfa_response_object = tfa_logic(user, tfa_token, ignore_tfa_requirement)
+                        if tfa_response_object:
+                            return make_response(jsonify(tfa_response_object)), 401
 
                     if len(allowed_roles) > 0:
                         held_roles = resp.get('roles', {})
@@ -168,7 +174,7 @@ def requires_auth(f=None,
                     # ----- AUTH PASSED, DO FINAL SETUP -----
 
                     g.user = user
-                    g.member_organisations = [org.id for org in user.organisations]
+                    g.member_organisations = auth_snapshot['member_organisation_ids']
                     try:
                         g.active_organisation = None
 
@@ -184,16 +190,16 @@ def requires_auth(f=None,
 
                         # Then get the fallback organisation
                         if g.active_organisation is None:
-                            g.active_organisation = user.fallback_active_organisation()
+                            fallback_active_organisation_id = auth_snapshot['fallback_active_organisation_id']
+                            if fallback_active_organisation_id is not None:
+                                g.active_organisation = Organisation.query.get(fallback_active_organisation_id)
 
                     except NotImplementedError:
                         g.active_organisation = None
 
+                    # buffers the validated user's last seen timestamp and ip, to be written by flush_user_activity
                     proxies = request.headers.getlist("X-Forwarded-For")
-                    check_ip(proxies, user, num_proxy=1)
-
-                    # updates the validated user last seen timestamp
-                    user.update_last_seen_ts()
+                    record_user_activity(user, get_real_ip(proxies, num_proxy=1))
 
                     #This is the point where you've made it through ok and you can return the top method
                     return f(*args, **kwargs)
@@ -258,22 +264,6 @@ def tfa_logic(user, tfa_token, ignore_tfa_requirement=False):
     return None
 
 
-def check_ip(proxies, user, num_proxy=0):
-    """
-    Proxies can be faked easily. Assumes there is a set number of proxies in production.
-    Todo: make this more robust
-    """
-    correct_ip_index = num_proxy + 1
-
-    if len(proxies) >= correct_ip_index:
-        real_ip_address = proxies[-correct_ip_index]  # get the correct referring client ip
-        if real_ip_address is not None and not IpAddress.check_user_ips(user, real_ip_address):
-            # IP exists in request and is not already saved
-            new_ip = IpAddress(ip=real_ip_address)
-            new_ip.user = user
-            db.session.add(new_ip)
-
-
 def verify_slack_requests(f=None):
     """
     Verify the request signature of the request sent from Slack
@@ -0,0 +1,121 @@
+import json
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+import config
+from server import red
+from server.models.user import User
+from server.models.organisation import Organisation
+
+ORG_VERSION_KEY = 'AuthSnapshot-OrgVersion'
+
+# User attributes that auth snapshots are built from. Changes to anything else (such as last seen) keep the snapshot
+USER_SNAPSHOT_ATTRIBUTES = [
+    'is_activated', 'is_disabled', 'TFA_enabled', '_held_roles', 'default_organisation_id', 'organisations', 'deleted'
+]
+
+
+class AuthSnapshotCache(object):
+    """
+    Redis cache of what requires_auth needs to know about a user, so that it doesn't have to load their organisations
+    on every request.
+
+    Snapshots expire after AUTH_CACHE_TTL seconds, and are dropped as soon as the user's auth attributes change.
+    Every snapshot is also stamped with an organisation version number, which is bumped whenever any organisation
+    changes, so that changes to organisations never have to find the snapshots of all their users.
+    """
+
+    def _key(self, user_id):
+        return f'AuthSnapshot-{user_id}'
+
+    def build(self, user):
+        fallback_active_organisation = user.fallback_active_organisation()
+        return dict(
+            is_activated=bool(user.is_activated),
+            is_disabled=bool(user.is_disabled),
+            tfa_required=bool(user.is_TFA_required() or user.TFA_enabled),
+            member_organisation_ids=[org.id for org in user.organisations],
+            fallback_active_organisation_id=getattr(fallback_active_organisation, 'id', None)
+        )
+
+    def get(self, user_id):
+        pipe = self.red.pipeline()
+        pipe.get(self._key(user_id))
+        pipe.get(ORG_VERSION_KEY)
+        cached, org_version = pipe.execute()
+
+        if cached is None:
+            return None
+
+        snapshot = json.loads(cached)
+        if snapshot.pop('org_version') != int(org_version or 0):
+            return None
+
+        return snapshot
+
+    def set(self, user_id, snapshot):
+        # Read the version first, so that an organisation change during the build makes this snapshot stale
+        org_version = int(self.red.get(ORG_VERSION_KEY) or 0)
+        self.red.set(self._key(user_id), json.dumps(dict(snapshot, org_version=org_version)), ex=self.ttl)
+
+    def get_or_build(self, user):
+        snapshot = self.get(user.id)
+        if snapshot is None:
+            snapshot = self.build(user)
+            self.set(user.id, snapshot)
+
+        return snapshot
+
+    def invalidate_users(self, user_ids):
+        if user_ids:
+            self.red.delete(*[self._key(user_id) for user_id in user_ids])
+
+    def invalidate_organisations(self):
+        self.red.incr(ORG_VERSION_KEY)
+
+    def __init__(self, red, ttl):
+        self.red = red
+        self.ttl = ttl
+
+
+auth_snapshot_cache = AuthSnapshotCache(red, config.AUTH_CACHE_TTL)
+
+
+PENDING_INVALIDATIONS_KEY = 'auth_snapshot_invalidations'
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_auth_snapshot_invalidations(session, flush_context):
+    pending = session.info.setdefault(PENDING_INVALIDATIONS_KEY, {'user_ids': set(), 'organisations': False})
+
+    for instance in session.dirty:
+        if isinstance(instance, User) and any(
+                attributes.get_history(instance, key).has_changes() for key in USER_SNAPSHOT_ATTRIBUTES):
+            pending['user_ids'].add(instance.id)
+        elif isinstance(instance, Organisation) and session.is_modified(instance):
+            pending['organisations'] = True
+
+    for instance in session.deleted:
+        if isinstance(instance, User):
+            pending['user_ids'].add(instance.id)
+        elif isinstance(instance, Organisation):
+            pending['organisations'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_auth_snapshot_invalidations(session):
+    # Only once committed, so that a snapshot can't be rebuilt from the old rows in the meantime
+    pending = session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+    if pending is None:
+        return
+
+    auth_snapshot_cache.invalidate_users(pending['user_ids'])
+
+    if pending['organisations']:
+        auth_snapshot_cache.invalidate_organisations()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_auth_snapshot_invalidations(session, previous_transaction):
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
@@ -5,9 +5,13 @@ from eth_keys import keys
 from eth_utils import keccak
 import os
 import random
-from time import sleep
+import uuid
+from time import sleep, time
 
+import config
+from server import red
 from . import task_runner
+from server.utils.contract_call_cache import ContractCallCache
 
 from server.utils.exchange import (
     bonding_curve_tokens_to_reserve,
@@ -15,6 +19,9 @@ from server.utils.exchange import (
     bonding_curve_token1_to_token2
 )
 
+# Maximum number of transfers the worker will send and check as a single unit
+TRANSFER_BATCH_SIZE = 100
+
 
 class BlockchainTasker(object):
     def _eth_endpoint(self, endpoint):
@@ -24,26 +31,68 @@ class BlockchainTasker(object):
 
     def _execute_synchronous_celery(self, task, kwargs=None, args=None, timeout=None, queue='high-priority'):
         async_result = task_runner.delay_task(task, kwargs, args, queue=queue)
+        return self._gather_synchronous_celery([async_result], timeout=timeout)[0]
+
+    def _gather_synchronous_celery(self, async_results, timeout=None):
+        """
+        Waits for a set of tasks that have already been sent to the worker.
+        The redis result backend publishes each result as it's stored, so every get returns as soon as its
+        result exists. Because all of the tasks are in flight together, the total wait is that of the slowest task
+        rather than the sum of them all.
+        """
+        deadline = time() + (timeout or current_app.config['SYNCRONOUS_TASK_TIMEOUT'])
         try:
-            response = async_result.get(
-                timeout=timeout or current_app.config['SYNCRONOUS_TASK_TIMEOUT'],
-                propagate=True,
-                interval=0.3)
-        except Exception as e:
-            raise e
+            return [
+                async_result.get(timeout=max(deadline - time(), 0.01), propagate=True)
+                for async_result in async_results
+            ]
         finally:
-            async_result.forget()
-        return response
+            for async_result in async_results:
+                async_result.forget()
 
-    def _synchronous_call(self, contract_address, contract_type, func, args=None, signing_address=None, queue='high-priority'):
-        kwargs = {
+    def _call_kwargs(self, contract_address, contract_type, func, args=None, signing_address=None):
+        return {
             'contract_address': contract_address,
             'abi_type': contract_type,
             'function': func,
             'args': args,
             'signing_address': signing_address
         }
-        return self._execute_synchronous_celery(self._eth_endpoint('call_contract_function'), kwargs, queue=queue)
+
+    def _synchronous_call(self, contract_address, contract_type, func, args=None, signing_address=None, queue='high-priority'):
+        kwargs = self._call_kwargs(contract_address, contract_type, func, args, signing_address)
+        return self.call_cache.get_or_call(
+            contract_address, func, args,
+            lambda: self._execute_synchronous_celery(self._eth_endpoint('call_contract_function'), kwargs, queue=queue)
+        )
+
+    def call_contract_functions(self, calls, timeout=None, queue='high-priority'):
+        """
+        Makes several read only contract calls at once, sending them all to the worker before waiting on any
+        :param calls: list of dicts, each with the contract_address, contract_type, func and optional args
+        and signing_address of a call
+        :return: list of call results, in the same order as calls
+        """
+        results = [None] * len(calls)
+        keys = [self.call_cache.key_for(call['contract_address'], call['func'], call.get('args')) for call in calls]
+        uncached_indexes = []
+        for i, call in enumerate(calls):
+            hit, results[i] = self.call_cache.get(keys[i], call['func'])
+            if not hit:
+                uncached_indexes.append(i)
+
+        async_results = [
+            task_runner.delay_task(
+                self._eth_endpoint('call_contract_function'), self._call_kwargs(**calls[i]), queue=queue
+            )
+            for i in uncached_indexes
+        ]
+
+        for i, result in zip(uncached_indexes, self._gather_synchronous_celery(async_results, timeout=timeout)):
+            self.call_cache.set(keys[i], calls[i]['func'], result)
+            results[i] = result
+
+        return results
 
     def _transaction_task(self,
                           signing_address,
@@ -52,6 +101,9 @@ class BlockchainTasker(object):
                           gas_limit=None,
                           prior_tasks=None,
                           queue=None):
+        # Our own transaction is about to change this contract's state
+        self.call_cache.invalidate_contract(contract_address)
+
         kwargs = {
             'signing_address': signing_address,
             'contract_address': contract_address,
@@ -110,22 +162,41 @@ class BlockchainTasker(object):
             {'min_task_id': min_task_id, 'max_task_id': max_task_id, 'retry_unstarted': retry_unstarted}
         )
 
-    def deduplicate(self, min_task_id, max_task_id):
+    def deduplicate(self, min_task_id, max_task_id, dry_run=False):
         return self._execute_synchronous_celery(
-            self._eth_endpoint('deduplicate'), {'min_task_id': min_task_id, 'max_task_id': max_task_id}
+            self._eth_endpoint('deduplicate'),
+            {'min_task_id': min_task_id, 'max_task_id': max_task_id, 'dry_run': dry_run}
         )
 
+    def get_topup_wallets_metrics(self):
+        return self._execute_synchronous_celery(self._eth_endpoint('get_topup_wallets_metrics'))
+
     # TODO: dynamically set topups according to current app gas price (currently at 2 gwei)
     def create_blockchain_wallet(
-            self, wei_target_balance=2e16, wei_topup_threshold=1e16, private_key=None, queue='high-priority'
+            self,
+            wei_target_balance=config.WALLET_POOL_WEI_TARGET_BALANCE,
+            wei_topup_threshold=config.WALLET_POOL_WEI_TOPUP_THRESHOLD,
+            private_key=None,
+            queue='high-priority'
     ):
         """
-        Creates a blockchain wallet on the blockchain worker
+        Creates a blockchain wallet on the blockchain worker, or claims one that the worker made earlier if
+        the wallet pool's topup settings are wanted
         :param wei_target_balance: How much eth to top the wallet's balance up to
         :param wei_topup_threshold: How low the wallet's balance should drop before attempting a topup
         :param private_key:
         :return: The wallet's address
         """
+        if (
+                config.WALLET_POOL_SIZE > 0
+                and private_key is None
+                and wei_target_balance == config.WALLET_POOL_WEI_TARGET_BALANCE
+                and wei_topup_threshold == config.WALLET_POOL_WEI_TOPUP_THRESHOLD
+        ):
+            wallet_address = self.claim_pooled_wallet()
+            if wallet_address:
+                return wallet_address
+
         args={
             'wei_target_balance': wei_target_balance,
             'wei_topup_threshold': wei_topup_threshold,
@@ -140,6 +211,14 @@ class BlockchainTasker(object):
 
         return wallet_address
 
+    def claim_pooled_wallet(self):
+        """
+        Takes a wallet from the pool that the worker keeps replenished. Each wallet is only ever claimed once
+        :return: The wallet's address, or None if the pool is empty
+        """
+        wallet_address = red.lpop(config.WALLET_POOL_KEY)
+        return wallet_address.decode() if wallet_address else None
+
     def send_eth(self, signing_address, recipient_address, amount_wei, prior_tasks=None):
         """
         Send eth to a target address
@@ -218,6 +297,56 @@ class BlockchainTasker(object):
             queue=queue
         )
 
+    def make_token_transfers_batch(self, signing_address, token, transfers, queue='high-priority'):
+        """
+        Makes a batch of "Transfer" or "Transfer From" transactions on an ERC20 token, all signed by one wallet.
+        Transfers are sent to the worker in chunks, each of which is sent and checked as a single unit.
+
+        :param signing_address: address of wallet signing txns
+        :param token: ERC20 token being transferred
+        :param transfers: list of dicts, each with a 'from_address', 'to_address', 'amount' (in CENTS)
+        and optionally 'prior_tasks'
+        :return: list of task uuids, in the same order as transfers
+        """
+        task_uuids = []
+        calls_by_function = {'transfer': [], 'transferFrom': []}
+
+        for transfer in transfers:
+            task_uuid = str(uuid.uuid4())
+            task_uuids.append(task_uuid)
+
+            raw_amount = token.system_amount_to_token(transfer['amount'], queue=queue)
+
+            if transfer['from_address'] == signing_address:
+                function = 'transfer'
+                args = [transfer['to_address'], raw_amount]
+            else:
+                function = 'transferFrom'
+                args = [transfer['from_address'], transfer['to_address'], raw_amount]
+
+            calls_by_function[function].append({
+                'uuid': task_uuid,
+                'args': args,
+                'prior_tasks': transfer.get('prior_tasks')
+            })
+
+        for function, calls in calls_by_function.items():
+            for i in range(0, len(calls), TRANSFER_BATCH_SIZE):
+                kwargs = {
+                    'signing_address': signing_address,
+                    'contract_address': token.address,
+                    'abi_type': 'ERC20',
+                    'function': function,
+                    'calls': calls[i:i + TRANSFER_BATCH_SIZE]
+                }
+                self.call_cache.invalidate_contract(token.address)
+                task_runner.delay_task(
+                    self._eth_endpoint('transact_with_contract_function_batch'),
+                    kwargs=kwargs, queue=queue
+                )
+
+        return task_uuids
+
     def make_approval(self,
                       signing_address, token,
                       spender, amount,
@@ -261,6 +390,10 @@ class BlockchainTasker(object):
         prior_tasks = prior_tasks or []
 
         path = self._get_path(from_token, to_token, reserve_token)
+
+        # Supplies and reserve balances of every token along the path change with the exchange
+        for token_address in set(path):
+            self.call_cache.invalidate_contract(token_address)
         #
         # topup_task_uuid = self.topup_wallet_if_required(signing_address)
         #
@@ -280,35 +413,50 @@ class BlockchainTasker(object):
             prior_tasks=prior_tasks
         )
 
-    def get_conversion_amount(self, exchange_contract, from_token, to_token, from_amount, signing_address=None):
+    def get_exchange_curve_states(self, exchange_contract, tokens):
         """
-        Estimates the conversion amount received from a Liquid Token Contract network
+        Fetches the bonding curve state of each token's subexchange in a Liquid Token Contract network.
+        All of the supply and reserve reads are sent to the worker together, rather than one after another
         :param exchange_contract: the base convert contract used in the network
-        :param from_token: the token being exchanged from
-        :param to_token: the token being exchanged to
-        :param from_amount: the amount of the token being exchanged from
+        :param tokens: the (non-reserve) tokens to fetch the curve state for
+        :return: list of (token_supply, subexchange_reserve, subexchange_reserve_ratio_ppm), one per token
         """
+        reserve_token = exchange_contract.reserve_token
 
-        def get_token_exchange_details(token):
-            subexchange_details = exchange_contract.get_subexchange_details(token.address)
-            subexchange_address = subexchange_details['subexchange_address']
+        subexchange_details = [exchange_contract.get_subexchange_details(token.address) for token in tokens]
 
-            token_supply = self._synchronous_call(
+        calls = []
+        for token, details in zip(tokens, subexchange_details):
+            calls.append(dict(
                 contract_address=token.address,
                 contract_type='ERC20',
                 func='totalSupply'
-            )
-
-            subexchange_reserve = self._synchronous_call(
+            ))
+            calls.append(dict(
                 contract_address=reserve_token.address,
                 contract_type='ERC20',
                 func='balanceOf',
-                args=[subexchange_address]
-            )
+                args=[details['subexchange_address']]
+            ))
 
-            subexchange_reserve_ratio_ppm = subexchange_details['subexchange_reserve_ratio_ppm']
+        results = self.call_contract_functions(calls)
 
-            return token_supply, subexchange_reserve, subexchange_reserve_ratio_ppm
+        return [
+            (results[2 * i], results[2 * i + 1], details['subexchange_reserve_ratio_ppm'])
+            for i, details in enumerate(subexchange_details)
+        ]
+
+    def get_conversion_amount(self, exchange_contract, from_token, to_token, from_amount, signing_address=None):
+        """
+        Estimates the conversion amount received from a Liquid Token Contract network
+        :param exchange_contract: the base convert contract used in the network
+        :param from_token: the token being exchanged from
+        :param to_token: the token being exchanged to
+        :param from_amount: the amount of the token being exchanged from
+        """
+
+        def get_token_exchange_details(*tokens):
+            return self.get_exchange_curve_states(exchange_contract, tokens)
 
         raw_from_amount = from_token.system_amount_to_token(from_amount)
 
@@ -319,13 +467,12 @@ class BlockchainTasker(object):
 
         if (not from_is_reserve) and (not to_is_reserve):
 
-            (from_token_supply,
-             from_subexchange_reserve,
-             from_subexchange_reserve_ratio_ppm) = get_token_exchange_details(from_token)
-
-            (to_token_supply,
-             to_subexchange_reserve,
-             to_subexchange_reserve_ratio_ppm) = get_token_exchange_details(to_token)
+            ((from_token_supply,
+              from_subexchange_reserve,
+              from_subexchange_reserve_ratio_ppm),
+             (to_token_supply,
+              to_subexchange_reserve,
+              to_subexchange_reserve_ratio_ppm)) = get_token_exchange_details(from_token, to_token)
 
             to_amount = bonding_curve_token1_to_token2(from_token_supply, to_token_supply,
                                                        from_subexchange_reserve, to_subexchange_reserve,
@@ -334,9 +481,9 @@ class BlockchainTasker(object):
                                                        raw_from_amount)
 
         elif not from_is_reserve:
-            (from_token_supply,
-             from_subexchange_reserve,
-             from_subexchange_reserve_ratio_ppm) = get_token_exchange_details(from_token)
+            ((from_token_supply,
+              from_subexchange_reserve,
+              from_subexchange_reserve_ratio_ppm),) = get_token_exchange_details(from_token)
 
             to_amount = bonding_curve_tokens_to_reserve(from_token_supply,
                                                         from_subexchange_reserve,
@@ -344,9 +491,9 @@ class BlockchainTasker(object):
                                                         raw_from_amount)
 
         else:
-            (to_token_supply,
-             to_subexchange_reserve,
-             to_subexchange_reserve_ratio_ppm) = get_token_exchange_details(to_token)
+            ((to_token_supply,
+              to_subexchange_reserve,
+              to_subexchange_reserve_ratio_ppm),) = get_token_exchange_details(to_token)
 
             to_amount = bonding_curve_reserve_to_tokens(to_token_supply,
                                                         to_subexchange_reserve,
@@ -461,3 +608,5 @@ class BlockchainTasker(object):
             queue=queue
         )
 
+    def __init__(self):
+        self.call_cache = ContractCallCache(red)
@@ -39,6 +39,9 @@ def call_contract_function(kwargs, args):
 def transact_with_contract_function(kwargs, args):
     return FakeCeleryAsyncResult()
 
+def transact_with_contract_function_batch(kwargs, args):
+    return FakeCeleryAsyncResult(result=[call['uuid'] for call in kwargs['calls']])
+
 def get_task(kwargs, args):
     return FakeCeleryAsyncResult()
 
@@ -0,0 +1,167 @@
+import sentry_sdk
+from flask import g
+
+from server import db, executor
+from server.models.credit_transfer import CreditTransfer
+from server.models.token import Token
+from server.utils import pusher
+from server.utils.chunked_job import ChunkedJob
+from server.utils.credit_transfer import (
+    find_users_with_transfer_accounts,
+    make_payment_transfer,
+    make_target_balance_transfer)
+from server.utils.transfer_enums import TransferStatusEnum, TransferSubTypeEnum
+
+BULK_TRANSFER_TYPES = ['DISBURSEMENT', 'BALANCE']
+
+
+class BulkTransferJob(ChunkedJob):
+    """
+    Progress of a bulk transfer, with the transfer account ids of its recipients as its items
+    """
+    name = 'BulkTransferJob'
+
+    # Recipients are resolved, transferred to and committed this many at a time
+    chunk_size = 200
+
+    counters = ['succeeded', 'failed']
+    results_name = 'errors'
+
+
+def submit_bulk_transfer_job(transfer_type, recipient_transfer_account_ids, token, transfer_amount=None,
+                             target_balance=None, automatically_resolve_complete=True, queue='low-priority'):
+    """
+    Starts making a transfer to each of many transfer accounts in the background
+    :return: the BulkTransferJob, for checking its progress
+    """
+    job = BulkTransferJob.create(
+        getattr(g.active_organisation, 'id', None),
+        recipient_transfer_account_ids,
+        params=dict(
+            transfer_type=transfer_type,
+            token_id=token.id,
+            transfer_amount=transfer_amount,
+            target_balance=target_balance,
+            automatically_resolve_complete=automatically_resolve_complete,
+            queue=queue
+        )
+    )
+
+    run_bulk_transfer_job.submit(job.id, authorising_user_id=g.user.id)
+
+    return job
+
+
+def _make_bulk_transfer(transfer_type, recipient_user, token, transfer_amount, target_balance,
+                        automatically_resolve_complete, queue, uuid):
+    if transfer_type == 'DISBURSEMENT':
+        return make_payment_transfer(
+            transfer_amount,
+            token=token,
+            send_user=g.user,
+            receive_user=recipient_user,
+            uuid=uuid,
+            transfer_subtype=TransferSubTypeEnum.DISBURSEMENT,
+            automatically_resolve_complete=automatically_resolve_complete,
+            queue=queue,
+            enable_pusher=False,
+            batch_blockchain_payload=True
+        )
+
+    return make_target_balance_transfer(
+        target_balance,
+        recipient_user,
+        uuid=uuid,
+        automatically_resolve_complete=automatically_resolve_complete,
+        queue=queue,
+        batch_blockchain_payload=True
+    )
+
+
+def process_bulk_transfer_chunk(recipient_transfer_account_ids, transfer_uuids, transfer_type, token, transfer_amount,
+                                target_balance, automatically_resolve_complete, queue):
+    """
+    Makes the transfers for one chunk of recipients, and commits them together before sending them to the worker.
+    Recipients that already have a transfer with their uuid, from an earlier run of the chunk, are skipped.
+    :param transfer_uuids: uuid to make each recipient's transfer with, in the same order as the recipients
+    :return: tuple of (dict of the number of transfers made and failed, list of errors for recipients that failed)
+    """
+    errors = []
+    transfers = []
+
+    existing_transfers = CreditTransfer.query.filter(CreditTransfer.uuid.in_(transfer_uuids)).all()
+    existing_uuids = {transfer.uuid for transfer in existing_transfers}
+
+    recipients = find_users_with_transfer_accounts(recipient_transfer_account_ids)
+    for (transfer_account_id, recipient_user, error), uuid in zip(recipients, transfer_uuids):
+        if uuid in existing_uuids:
+            continue
+
+        if error:
+            errors.append({'transfer_account_id': transfer_account_id, 'status': 400, 'message': error})
+            continue
+
+        try:
+            transfer = _make_bulk_transfer(
+                transfer_type, recipient_user, token, transfer_amount, target_balance,
+                automatically_resolve_complete, queue, uuid
+            )
+        except Exception as e:
+            errors.append({'transfer_account_id': transfer_account_id, 'status': 400, 'message': str(e)})
+        else:
+            transfers.append((transfer_account_id, transfer))
+
+    try:
+        db.session.flush()
+
+        # Pushed before committing, while the transfers are still loaded
+        if transfers:
+            pusher.push_admin_credit_transfer([transfer for _, transfer in transfers])
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        sentry_sdk.capture_exception(e)
+        errors.extend(
+            {'transfer_account_id': transfer_account_id, 'status': 500, 'message': str(e)}
+            for transfer_account_id, _ in transfers
+        )
+        transfers = []
+
+    # Sent once they're committed, so that nothing is sent for a chunk that's rolled back. Includes any an earlier
+    # run of the chunk committed but stopped before sending
+    unsent_transfers = [
+        transfer for transfer in [transfer for _, transfer in transfers] + existing_transfers
+        if transfer.transfer_status == TransferStatusEnum.COMPLETE and not transfer.blockchain_task_uuid
+    ]
+    if unsent_transfers:
+        try:
+            CreditTransfer.send_blockchain_payloads_to_worker_in_batches(unsent_transfers, queue=queue)
+        finally:
+            # Keeps the task uuids of the batches that were sent if a later one can't be, which fails the job.
+            # Resuming it sends the rest
+            db.session.commit()
+
+    return dict(succeeded=len(transfers) + len(existing_uuids), failed=len(errors)), errors
+
+
+@executor.job
+def run_bulk_transfer_job(job_id, authorising_user_id):
+    job = BulkTransferJob(job_id)
+    params = job.get_params()
+
+    def process_chunk(recipient_transfer_account_ids, start):
+        # Each recipient's transfer has a uuid from its position in the job, so that a resumed job can tell
+        # which of a chunk's recipients it has already transferred to
+        return process_bulk_transfer_chunk(
+            recipient_transfer_account_ids,
+            [f'{job_id}-{start + i}' for i in range(len(recipient_transfer_account_ids))],
+            params['transfer_type'],
+            Token.query.get(params['token_id']),
+            params['transfer_amount'],
+            params['target_balance'],
+            params['automatically_resolve_complete'],
+            params['queue']
+        )
+
+    job.run(authorising_user_id, process_chunk)
@@ -0,0 +1,201 @@
+import json
+import time
+import uuid
+
+import sentry_sdk
+from flask import g
+
+from server import db, red
+from server.models.organisation import Organisation
+from server.models.user import User
+
+# How long a job, its items and results are kept for after it was last updated
+CHUNKED_JOB_TTL = 60 * 60 * 24 * 7
+
+# A job's runner holds its lock for this long after it last recorded progress. A job still processing whose lock
+# has expired has stopped, and can be resumed
+CHUNKED_JOB_STALE_AFTER = 60 * 10
+
+
+class ChunkedJob(object):
+    """
+    A background job that works through a list of items a chunk at a time. Its progress is kept in redis along with
+    the items and its parameters, so that it can be read while the job runs, and so that a job that stops can be
+    resumed from the first item it hadn't processed. Only one runner processes a job at a time.
+    Status goes from PENDING, to PROCESSING, to COMPLETE or FAILED.
+
+    Subclasses set the name its redis keys start with, how many items are processed at a time, the counters it keeps,
+    and what its list of per item results is called in its status.
+    """
+
+    name = None
+    chunk_size = None
+    counters = []
+    results_name = None
+
+    def _key(self):
+        return f'{self.name}-{self.id}'
+
+    def _items_key(self):
+        return f'{self.name}-{self.id}-Items'
+
+    def _results_key(self):
+        return f'{self.name}-{self.id}-Results'
+
+    def _lock_key(self):
+        return f'{self.name}-{self.id}-Lock'
+
+    def _acquire_lock(self):
+        self._lock_token = str(uuid.uuid4())
+        return red.set(self._lock_key(), self._lock_token, nx=True, ex=CHUNKED_JOB_STALE_AFTER)
+
+    def _release_lock(self):
+        # Left alone if it expired and another runner has taken it since
+        if red.get(self._lock_key()) == self._lock_token.encode():
+            red.delete(self._lock_key())
+
+    def _expire(self, pipe):
+        for key in [self._key(), self._items_key(), self._results_key()]:
+            pipe.expire(key, CHUNKED_JOB_TTL)
+
+    @classmethod
+    def create(cls, organisation_id, items, params=None):
+        """
+        :param organisation_id: organisation the job is run as, and that can read its status
+        :param items: list of json serialisable items for the job to process
+        :param params: json serialisable dict of anything else the job needs, read back with get_params
+        """
+        job = cls(str(uuid.uuid4()))
+
+        pipe = red.pipeline()
+        pipe.hmset(job._key(), dict(
+            status='PENDING', organisation_id=organisation_id or '', params=json.dumps(params or {}),
+            total=len(items), processed=0, last_updated=int(time.time()),
+            **{counter: 0 for counter in cls.counters}
+        ))
+        for i in range(0, len(items), cls.chunk_size):
+            pipe.rpush(job._items_key(), *[json.dumps(item) for item in items[i:i + cls.chunk_size]])
+        job._expire(pipe)
+        pipe.execute()
+
+        return job
+
+    def set_status(self, status, message=None):
+        mapping = dict(status=status, last_updated=int(time.time()))
+        if message is not None:
+            mapping['message'] = message
+        red.hmset(self._key(), mapping)
+
+    def get_params(self):
+        return json.loads(red.hget(self._key(), 'params') or '{}')
+
+    def get_items(self, start, count):
+        return [json.loads(item) for item in red.lrange(self._items_key(), start, start + count - 1)]
+
+    def record_chunk(self, processed, results, **counts):
+        """
+        :param processed: number of items processed so far, which is where a resumed job starts from
+        :param results: list of result dicts for the chunk's items
+        :param counts: amount to increase each of the job's counters by
+        """
+        pipe = red.pipeline()
+        pipe.hmset(self._key(), dict(processed=processed, last_updated=int(time.time())))
+        pipe.expire(self._lock_key(), CHUNKED_JOB_STALE_AFTER)
+        for counter, count in counts.items():
+            pipe.hincrby(self._key(), counter, count)
+        if results:
+            pipe.rpush(self._results_key(), *[json.dumps(result) for result in results])
+        self._expire(pipe)
+        pipe.execute()
+
+    def get_status(self):
+        pipe = red.pipeline()
+        pipe.hgetall(self._key())
+        pipe.lrange(self._results_key(), 0, -1)
+        pipe.exists(self._lock_key())
+        fields, results, running = pipe.execute()
+
+        if not fields:
+            return None
+
+        fields = {key.decode(): value.decode() for key, value in fields.items()}
+        fields.pop('params', None)
+        organisation_id = fields.pop('organisation_id')
+
+        status = dict(
+            job_id=self.id,
+            status=fields.pop('status'),
+            message=fields.pop('message', None),
+            organisation_id=int(organisation_id) if organisation_id else None,
+            running=bool(running),
+        )
+        status[self.results_name] = [json.loads(result) for result in results]
+        status.update({key: int(value) for key, value in fields.items()})
+
+        return status
+
+    @staticmethod
+    def can_resume(job_status):
+        # A job that's still processing but whose runner no longer holds its lock has stopped
+        return job_status['status'] in ['FAILED', 'PROCESSING'] and not job_status['running']
+
+    def resume(self, run_job):
+        """
+        Carries on processing from the first item after the last chunk that a stopped job recorded
+        :param run_job: the executor job that runs this kind of job
+        """
+        self.set_status('PENDING')
+
+        run_job.submit(self.id, authorising_user_id=g.user.id)
+
+    def run(self, authorising_user_id, process_chunk):
+        """
+        Processes the job's items a chunk at a time, starting from the first one it hasn't processed yet.
+        Does nothing if another runner is already processing the job.
+        A chunk can be committed without its progress being recorded, if the runner stops in between, so process_chunk
+        must be safe to call again with items it's already processed.
+        :param authorising_user_id: user the job is run as
+        :param process_chunk: function that processes and commits a list of items, given the items and the position
+        of the first of them in the job, and returns a tuple of
+        (dict of amounts to increase the job's counters by, list of result dicts)
+        """
+        if not self._acquire_lock():
+            return
+
+        try:
+            self.set_status('PROCESSING')
+
+            # Jobs run outside of the request that submitted them, so set up what requires_auth would have
+            organisation_id = red.hget(self._key(), 'organisation_id')
+            g.user = User.query.execution_options(show_all=True).get(authorising_user_id)
+            g.active_organisation = (
+                Organisation.query.get(int(organisation_id)) if organisation_id else None
+            )
+
+            processed = int(red.hget(self._key(), 'processed') or 0)
+
+            while True:
+                items = self.get_items(processed, self.chunk_size)
+                if not items:
+                    break
+
+                counts, results = process_chunk(items, processed)
+
+                processed += len(items)
+                self.record_chunk(processed, results, **counts)
+
+        except Exception as e:
+            db.session.rollback()
+            sentry_sdk.capture_exception(e)
+            self.set_status('FAILED', str(e))
+            raise
+
+        else:
+            self.set_status('COMPLETE')
+
+        finally:
+            self._release_lock()
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self._lock_token = None
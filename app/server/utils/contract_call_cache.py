@@ -0,0 +1,115 @@
+import json
+import hashlib
+
+import config
+
+# Seconds each cacheable read only function is cached for. None means the result never changes, so it's cached
+# indefinitely and isn't invalidated by our own transactions.
+FUNCTION_TTLS = {
+    'decimals': None,
+    'totalSupply': config.ETH_CALL_CACHE_TTL,
+    'balanceOf': config.ETH_CALL_CACHE_TTL,
+}
+
+STATS_KEY = 'ContractCallCache-Stats'
+
+
+class ContractCallCache(object):
+    """
+    Redis cache of read only contract call results, keyed by contract, function and args.
+
+    Mutable results are stored under a per contract version number. Bumping the version (see invalidate_contract)
+    orphans every cached result for that contract at once, and the orphaned keys then expire with their TTL.
+    """
+
+    def _version_key(self, contract_address):
+        return f'ContractCallCache-Version-{contract_address}'
+
+    def _result_key(self, contract_address, func, args, version):
+        args_hash = hashlib.md5(json.dumps(args, sort_keys=True).encode()).hexdigest()
+        return f'ContractCallCache-{contract_address}-{version}-{func}-{args_hash}'
+
+    def is_cacheable(self, func):
+        return func in FUNCTION_TTLS
+
+    def key_for(self, contract_address, func, args=None):
+        """
+        Resolves the key a call's result is cached under, including the contract's current version. Resolve it
+        once per call, before making it, and pass it to both get and set, so that a result fetched while the
+        contract is invalidated is stored under the version it was fetched for rather than the new one.
+        :return: the key, or None if the function isn't cacheable
+        """
+        if not self.is_cacheable(func):
+            return None
+
+        if FUNCTION_TTLS[func] is None:
+            return self._result_key(contract_address, func, args, 'immutable')
+
+        version = int(self.red.get(self._version_key(contract_address)) or 0)
+        return self._result_key(contract_address, func, args, version)
+
+    def get(self, key, func):
+        """
+        :param key: from key_for
+        :return: a tuple of (hit, result)
+        """
+        if key is None:
+            return False, None
+
+        cached = self.red.get(key)
+
+        hit = cached is not None
+        self.red.hincrby(STATS_KEY, f'{func}:{"hits" if hit else "misses"}', 1)
+
+        if not hit:
+            return False, None
+
+        return True, json.loads(cached)
+
+    def set(self, key, func, result):
+        """
+        :param key: from key_for, resolved before the call was made
+        """
+        if key is None:
+            return
+
+        ttl = FUNCTION_TTLS[func]
+
+        if ttl is None:
+            self.red.set(key, json.dumps(result))
+        else:
+            self.red.set(key, json.dumps(result), ex=ttl)
+
+    def get_or_call(self, contract_address, func, args, call):
+        key = self.key_for(contract_address, func, args)
+
+        hit, result = self.get(key, func)
+        if hit:
+            return result
+
+        result = call()
+        self.set(key, func, result)
+        return result
+
+    def invalidate_contract(self, contract_address):
+        """
+        Drops every mutable result cached for a contract. Used when one of our own transactions touches it.
+        """
+        self.red.incr(self._version_key(contract_address))
+
+    def stats(self):
+        """
+        :return: dict of function name to its hit and miss counts
+        """
+        stats = {}
+        for field, count in self.red.hgetall(STATS_KEY).items():
+            func, outcome = field.decode().split(':')
+            stats.setdefault(func, {'hits': 0, 'misses': 0})[outcome] = int(count)
+
+        return stats
+
+    def reset_stats(self):
+        self.red.delete(STATS_KEY)
+
+    def __init__(self, red):
+        self.red = red
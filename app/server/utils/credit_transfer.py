@@ -25,6 +25,7 @@ from server.utils import user as UserUtils
 from server.utils import pusher
 from server.utils.transfer_enums import TransferTypeEnum, TransferSubTypeEnum, TransferStatusEnum
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import selectinload
 
 
 def cents_to_dollars(amount_cents):
@@ -44,6 +45,35 @@ def find_user_with_transfer_account_from_identifiers(user_id, public_identifier,
     return user
 
 
+def find_users_with_transfer_accounts(transfer_account_ids):
+    """
+    Finds the primary user of many transfer accounts at once, for bulk transfers.
+    :param transfer_account_ids: list of transfer account ids
+    :return: list of (transfer_account_id, user, error message) in the order given, with either a user or an error
+    """
+    transfer_accounts = TransferAccount.query.options(
+        selectinload(TransferAccount.users)
+    ).filter(TransferAccount.id.in_(transfer_account_ids)).all()
+
+    transfer_accounts_by_id = {transfer_account.id: transfer_account for transfer_account in transfer_accounts}
+
+    results = []
+    for transfer_account_id in transfer_account_ids:
+        transfer_account = transfer_accounts_by_id.get(int(transfer_account_id))
+
+        if transfer_account is None:
+            results.append((transfer_account_id, None,
+                            'Transfer account not found for id {}'.format(transfer_account_id)))
+        elif transfer_account.primary_user is None:
+            results.append((transfer_account_id, None,
+                            'User not found for transfer account id {}'.format(transfer_account_id)))
+        else:
+            # The user has at least this transfer account, so there's no need to check they have one
+            results.append((transfer_account_id, transfer_account.primary_user, None))
+
+    return results
+
+
 def find_user_from_identifiers(user_id, public_identifier, transfer_account_id):
 
     if user_id:
@@ -198,7 +228,8 @@ def make_payment_transfer(transfer_amount,
                           transfer_subtype: TransferSubTypeEnum=TransferSubTypeEnum.STANDARD,
                           is_ghost_transfer=False,
                           enable_pusher=True,
-                          queue='high-priority'):
+                          queue='high-priority',
+                          batch_blockchain_payload=False):
     """
     This is used for internal transfers between Sempo wallets.
     :param transfer_amount:
@@ -216,6 +247,7 @@ def make_payment_transfer(transfer_amount,
     :param uuid:
     :param transfer_subtype: accepts TransferSubType str.
     :param is_ghost_transfer: if an account is created for recipient just to exchange, it's not real
+    :param batch_blockchain_payload: leave sending the blockchain payload to the caller, who batches it with others
     :return:
     """
 
@@ -284,7 +316,7 @@ def make_payment_transfer(transfer_amount,
         raise InsufficientBalanceError(message)
 
     if automatically_resolve_complete:
-        transfer.resolve_as_completed(queue=queue)
+        transfer.resolve_as_completed(queue=queue, batch_blockchain_payload=batch_blockchain_payload)
         if enable_pusher:
             pusher.push_admin_credit_transfer(transfer)
 
@@ -390,7 +422,8 @@ def make_target_balance_transfer(target_balance,
                                  require_sufficient_balance=True,
                                  automatically_resolve_complete=True,
                                  uuid=None,
-                                 queue='high-priority'):
+                                 queue='high-priority',
+                                 batch_blockchain_payload=False):
     if target_balance is None:
         raise InvalidTargetBalanceError("Target balance not provided")
 
@@ -410,7 +443,8 @@ def make_target_balance_transfer(target_balance,
                                          automatically_resolve_complete=automatically_resolve_complete,
                                          uuid=uuid,
                                          transfer_subtype=TransferSubTypeEnum.RECLAMATION,
-                                         queue=queue)
+                                         queue=queue,
+                                         batch_blockchain_payload=batch_blockchain_payload)
 
     else:
         transfer = make_payment_transfer(transfer_amount,
@@ -420,7 +454,8 @@ def make_target_balance_transfer(target_balance,
                                          automatically_resolve_complete=automatically_resolve_complete,
                                          uuid=uuid,
                                          transfer_subtype=TransferSubTypeEnum.DISBURSEMENT,
-                                         queue=queue)
+                                         queue=queue,
+                                         batch_blockchain_payload=batch_blockchain_payload)
 
     return transfer
 
@@ -1,5 +1,7 @@
 # See http://meissereconomics.com/assets/abfe-lesson5-bancor.pdf
 
+import numpy as np
+
 
 def bonding_curve_reserve_to_tokens(initial_supply, initial_reserve, reserve_ratio_ppm, reserve):
     reserve_ratio = reserve_ratio_ppm/1e6
@@ -24,3 +26,84 @@ def bonding_curve_token1_to_token2(t1_supply, t2_supply,
 
     return bonding_curve_reserve_to_tokens(t2_supply, converter2_reserve, converter2_rr_ppm, intermediate_reserve)
 
+
+
+# The inverses of the conversions above, used to solve for the amount that has to go in to get a desired amount out.
+# Converting back along the same curve undoes a conversion, so each inverse is the conversion the other way.
+
+bonding_curve_reserve_required_for_tokens = bonding_curve_tokens_to_reserve
+
+bonding_curve_tokens_required_for_reserve = bonding_curve_reserve_to_tokens
+
+
+def bonding_curve_token1_required_for_token2(t1_supply, t2_supply,
+                                             converter1_reserve, converter2_reserve,
+                                             converter1_rr_ppm, converter2_rr_ppm,
+                                             token2):
+
+    return bonding_curve_token1_to_token2(t2_supply, t1_supply,
+                                          converter2_reserve, converter1_reserve,
+                                          converter2_rr_ppm, converter1_rr_ppm,
+                                          token2)
+
+
+# Array versions of the conversions above, for quoting many pairs against one snapshot of the curve states at once
+
+class CurveSnapshot(object):
+    """
+    The bonding curve state of every token in an exchange network at one point in time, as arrays indexed by token.
+    The reserve token has no curve of its own, so its entries are placeholders that are never used.
+    """
+
+    def quote(self, from_indices, to_indices, amounts):
+        """
+        Vectorised bonding_curve_token1_to_token2 (or the single curve conversions, where one side is the reserve)
+        :param from_indices: array of token indices to convert from
+        :param to_indices: array of token indices to convert to
+        :param amounts: array of raw amounts of the from tokens
+        :return: array of raw amounts of the to tokens
+        """
+        from_indices = np.asarray(from_indices)
+        to_indices = np.asarray(to_indices)
+        amounts = np.asarray(amounts, dtype=np.float64)
+
+        reserve_amounts = np.where(
+            self.is_reserve[from_indices],
+            amounts,
+            bonding_curve_tokens_to_reserve(
+                self.supplies[from_indices], self.reserves[from_indices], self.reserve_ratios_ppm[from_indices], amounts
+            )
+        )
+
+        return np.where(
+            self.is_reserve[to_indices],
+            reserve_amounts,
+            bonding_curve_reserve_to_tokens(
+                self.supplies[to_indices], self.reserves[to_indices], self.reserve_ratios_ppm[to_indices],
+                reserve_amounts
+            )
+        )
+
+    def quote_matrix(self, amounts):
+        """
+        :param amounts: array of the raw amount of each token to convert from
+        :return: N x N array, where [i, j] is what amounts[i] of token i converts to in token j
+        """
+        n = len(self.supplies)
+        from_indices, to_indices = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+
+        return self.quote(from_indices, to_indices, np.broadcast_to(np.asarray(amounts)[:, None], (n, n)))
+
+    def __init__(self, supplies, reserves, reserve_ratios_ppm, is_reserve):
+        """
+        :param supplies: token supply of each token
+        :param reserves: reserve held by each token's subexchange
+        :param reserve_ratios_ppm: reserve ratio of each token's subexchange
+        :param is_reserve: whether each token is the reserve token
+        """
+        self.is_reserve = np.asarray(is_reserve, dtype=bool)
+
+        # Ones in place of the reserve token's missing state, so its unused conversions stay finite
+        self.supplies = np.where(self.is_reserve, 1, np.asarray(supplies, dtype=np.float64))
+        self.reserves = np.where(self.is_reserve, 1, np.asarray(reserves, dtype=np.float64))
+        self.reserve_ratios_ppm = np.where(self.is_reserve, 1e6, np.asarray(reserve_ratios_ppm, dtype=np.float64))
@@ -9,6 +9,7 @@ from server.models.blockchain_address import BlockchainAddress
 from server.models.credit_transfer import CreditTransfer
 from server.models.user import User
 from server.models.custom_attribute_user_storage import CustomAttributeUserStorage
+from server.models.transfer_stats_rollup import TransferStatsRollup, SenderTransferStatsRollup
 
 from server.utils.transfer_enums import TransferTypeEnum, TransferSubTypeEnum, TransferStatusEnum
 
@@ -22,146 +23,165 @@ import datetime, json
 
 def calculate_transfer_stats(total_time_series=False, start_date=None, end_date=None,
                              user_filter={}):
+    """
+    Dashboard transfer stats for the active organisation, answered from the daily transfer stats rollups
+    rather than by aggregating every transfer. Filtered stats, and counts of senders, come from the per sender
+    rollups, which the filters can be joined on.
+    """
+
+    # Only completed transfers are kept per sender
+    rollup = SenderTransferStatsRollup if user_filter else TransferStatsRollup
+
+    date_filter = []
+    sender_date_filter = []
+    filter_active = False
+    if start_date is not None and end_date is not None:
+        date_filter.append(rollup.day >= start_date)
+        date_filter.append(rollup.day <= end_date)
+        sender_date_filter.append(SenderTransferStatsRollup.day >= start_date)
+        sender_date_filter.append(SenderTransferStatsRollup.day <= end_date)
+        filter_active = True
+
+    active_organisation = getattr(g, 'active_organisation', None)
+    organisation_filters = [rollup.organisation_id == getattr(active_organisation, 'id', None)]
+    if rollup == TransferStatsRollup:
+        organisation_filters.append(TransferStatsRollup.transfer_status == TransferStatusEnum.COMPLETE.value)
+
+    sender_organisation_filters = [
+        SenderTransferStatsRollup.organisation_id == getattr(active_organisation, 'id', None)
+    ]
+
+    disbursement_filters = [
+        rollup.transfer_type == TransferTypeEnum.PAYMENT.value,
+        rollup.transfer_subtype == TransferSubTypeEnum.DISBURSEMENT.value
+    ]
+
+    standard_payment_filters = [
+        rollup.transfer_type == TransferTypeEnum.PAYMENT.value,
+        rollup.transfer_subtype == TransferSubTypeEnum.STANDARD.value
+    ]
+
+    sender_standard_payment_filters = [
+        SenderTransferStatsRollup.transfer_type == TransferTypeEnum.PAYMENT.value,
+        SenderTransferStatsRollup.transfer_subtype == TransferSubTypeEnum.STANDARD.value
+    ]
+
+    exchanged_filters = [
+        rollup.transfer_type == TransferTypeEnum.EXCHANGE.value,
+        rollup.token_id == getattr(getattr(active_organisation, 'token', None), 'id', None)
+    ]
+
+    beneficiary_filters = [User.has_beneficiary_role == True]
+    vendor_filters = [User.has_vendor_role == True]
+
+    exhaused_balance_filters = [
+        SenderTransferStatsRollup.transfer_type == TransferTypeEnum.PAYMENT.value,
+        TransferAccount._balance_wei == 0
+    ]
+
+    transfer_use_filters = [
+        *standard_payment_filters,
+        rollup.transfer_use != ''
+    ]
+
+    # Rollups store the raw wei column, so scale them the same way as CreditTransfer.transfer_amount
+    total_amount = func.sum(rollup.total_amount_wei) / int(1e16)
+
+    def rollup_query(*columns):
+        query = db.session.query(*columns)
+        query = apply_filters(query, user_filter, rollup)
+        return query.filter(*organisation_filters).filter(*date_filter)
+
+    def sender_rollup_query(*columns):
+        query = db.session.query(*columns)
+        query = apply_filters(query, user_filter, SenderTransferStatsRollup)
+        return query.filter(*sender_organisation_filters).filter(*sender_date_filter)
+
+    total_distributed = rollup_query(total_amount.label('total')).filter(*disbursement_filters).first().total or 0
+
+    total_spent = rollup_query(total_amount.label('total')).filter(*standard_payment_filters).first().total or 0
+
+    total_exchanged = rollup_query(total_amount.label('total')).filter(*exchanged_filters).first().total or 0
+
+    total_beneficiaries = db.session.query(User).filter(*beneficiary_filters)
+    total_beneficiaries = total_beneficiaries.count()
+
+    total_vendors = db.session.query(User).filter(*vendor_filters)
+    total_vendors = total_vendors.count()
+
+    total_users = total_beneficiaries + total_vendors
+
+    has_transferred_count = sender_rollup_query(
+        func.count(func.distinct(SenderTransferStatsRollup.sender_user_id)).label('transfer_count')) \
+        .filter(*sender_standard_payment_filters) \
+        .first().transfer_count
+
+    exhausted_balance_count = db.session.query(
+        func.count(func.distinct(SenderTransferStatsRollup.sender_transfer_account_id)).label('transfer_count')) \
+        .join(TransferAccount, TransferAccount.id == SenderTransferStatsRollup.sender_transfer_account_id) \
+        .filter(*sender_organisation_filters) \
+        .filter(*exhaused_balance_filters) \
+        .filter(*sender_date_filter) \
+        .first().transfer_count
+
+    daily_transaction_volume = rollup_query(total_amount.label('volume'), rollup.day.label('date')) \
+        .filter(*standard_payment_filters) \
+        .group_by(rollup.day) \
+        .order_by(rollup.day.desc()) \
+        .all()
+
+    daily_disbursement_volume = rollup_query(total_amount.label('volume'), rollup.day.label('date')) \
+        .filter(*disbursement_filters) \
+        .group_by(rollup.day) \
+        .order_by(rollup.day.desc()) \
+        .all()
+
+    transfer_use_breakdown = rollup_query(
+        rollup.transfer_use, func.sum(rollup.transfer_count).label('count')) \
+        .filter(*transfer_use_filters) \
+        .group_by(rollup.transfer_use) \
+        .all()
+
+    transfer_use_breakdown = [[json.loads(item.transfer_use), item.count] for item in transfer_use_breakdown]
 
-    return {}
-
-    # date_filter = []
-    # filter_active = False
-    # if start_date is not None and end_date is not None:
-    #     date_filter.append(CreditTransfer.created >= start_date)
-    #     date_filter.append(CreditTransfer.created <= end_date)
-    #     filter_active = True
-    #
-    # disbursement_filters = [
-    #     CreditTransfer.transfer_status == TransferStatusEnum.COMPLETE,
-    #     CreditTransfer.transfer_type == TransferTypeEnum.PAYMENT,
-    #     CreditTransfer.transfer_subtype == TransferSubTypeEnum.DISBURSEMENT]
-    #
-    # standard_payment_filters = [
-    #     CreditTransfer.transfer_status == TransferStatusEnum.COMPLETE,
-    #     CreditTransfer.transfer_type == TransferTypeEnum.PAYMENT,
-    #     CreditTransfer.transfer_subtype == TransferSubTypeEnum.STANDARD
-    # ]
-    #
-    # exchanged_filters = [
-    #     CreditTransfer.transfer_status == TransferStatusEnum.COMPLETE,
-    #     CreditTransfer.transfer_type == TransferTypeEnum.EXCHANGE,
-    #     CreditTransfer.token == g.active_organisation.token
-    # ]
-    #
-    # beneficiary_filters = [User.has_beneficiary_role == True]
-    # vendor_filters = [User.has_vendor_role == True]
-    #
-    # exhaused_balance_filters = [
-    #     CreditTransfer.transfer_type == TransferTypeEnum.PAYMENT,
-    #     TransferAccount._balance_wei == 0
-    # ]
-    #
-    # transfer_use_filters = [
-    #     *standard_payment_filters,
-    #     CreditTransfer.transfer_use.isnot(None),
-    # ]
-    #
-    # total_distributed = db.session.query(func.sum(CreditTransfer.transfer_amount).label('total'))
-    # total_distributed = apply_filters(total_distributed, user_filter, CreditTransfer)
-    # total_distributed = total_distributed.filter(*disbursement_filters).filter(*date_filter).first().total or 0
-    #
-    # total_spent = db.session.query(func.sum(CreditTransfer.transfer_amount).label('total'))
-    # total_spent = apply_filters(total_spent, user_filter, CreditTransfer)
-    # total_spent = (total_spent.filter(*standard_payment_filters).filter(*date_filter).first().total) or 0
-    #
-    #
-    # total_exchanged = db.session.query(func.sum(CreditTransfer.transfer_amount).label('total'))
-    # total_exchanged = apply_filters(total_exchanged, user_filter, CreditTransfer)
-    # total_exchanged = (total_exchanged.filter(*exchanged_filters).filter(*date_filter).first().total) or 0
-    #
-    # total_beneficiaries = db.session.query(User).filter(*beneficiary_filters)
-    # total_beneficiaries = total_beneficiaries.count()
-    #
-    # total_vendors = db.session.query(User).filter(*vendor_filters)
-    # total_vendors = total_vendors.count()
-    #
-    # total_users = total_beneficiaries + total_vendors
-    #
-    # has_transferred_count = db.session.query(func.count(func.distinct(CreditTransfer.sender_user_id))
-    #     .label('transfer_count'))\
-    #     .filter(*standard_payment_filters) \
-    #     .filter(*date_filter) \
-    #         .first().transfer_count
-    #
-    # exhausted_balance_count = db.session.query(func.count(func.distinct(
-    #     CreditTransfer.sender_transfer_account_id))
-    #     .label('transfer_count')) \
-    #     .join(CreditTransfer.sender_transfer_account)\
-    #     .filter(*exhaused_balance_filters) \
-    #     .filter(*date_filter) \
-    #         .first().transfer_count
-    #
-    # daily_transaction_volume = db.session.query(func.sum(CreditTransfer.transfer_amount).label('volume'),
-    #                                             func.date_trunc('day', CreditTransfer.created).label('date'))
-    # daily_transaction_volume = apply_filters(daily_transaction_volume, user_filter,  CreditTransfer)
-    # daily_transaction_volume = daily_transaction_volume.group_by(func.date_trunc('day', CreditTransfer.created))\
-    #     .filter(*standard_payment_filters) \
-    #     .filter(*date_filter) \
-    #         .all()
-    #
-    # daily_disbursement_volume = db.session.query(func.sum(CreditTransfer.transfer_amount).label('volume'),
-    #                                             func.date_trunc('day', CreditTransfer.created).label('date'))
-    # daily_disbursement_volume = apply_filters(daily_disbursement_volume, user_filter, CreditTransfer)
-    # daily_disbursement_volume = daily_disbursement_volume.group_by(func.date_trunc('day', CreditTransfer.created)) \
-    #     .filter(*disbursement_filters) \
-    #     .filter(*date_filter) \
-    #         .all()
-    #
-    # transfer_use_breakdown = db.session.query(CreditTransfer.transfer_use.cast(JSONB),func.count(CreditTransfer.transfer_use))
-    # transfer_use_breakdown = apply_filters(transfer_use_breakdown, user_filter, CreditTransfer)
-    # transfer_use_breakdown = transfer_use_breakdown.filter(*transfer_use_filters) \
-    #     .group_by(CreditTransfer.transfer_use.cast(JSONB)) \
-    #         .all()
-    #
-    # try:
-    #     last_day = daily_transaction_volume[0].date
-    #     last_day_volume = daily_transaction_volume[0].volume
-    #     transaction_vol_list = [
-    #         {'date': item.date.isoformat(), 'volume': item.volume} for item in daily_transaction_volume
-    #     ]
-    # except IndexError:  # No transactions
-    #     last_day = datetime.datetime.utcnow()
-    #     last_day_volume = 0
-    #     has_transferred_count = 0
-    #     transaction_vol_list = [{'date': datetime.datetime.utcnow().isoformat(), 'volume': 0}]
-    #
-    # try:
-    #     last_day_disbursement_volume = daily_disbursement_volume[0].volume
-    #     disbursement_vol_list = [
-    #         {'date': item.date.isoformat(), 'volume': item.volume} for item in daily_disbursement_volume
-    #     ]
-    # except IndexError:
-    #     last_day_disbursement_volume = 0
-    #     disbursement_vol_list = [{'date': datetime.datetime.utcnow().isoformat(), 'volume': 0}]
-    #
-    # try:
-    #     master_wallet_balance = cached_funds_available()
-    # except:
-    #     master_wallet_balance = 0
-    #
-    # data = {
-    #     'total_distributed': total_distributed,
-    #     'total_spent': total_spent,
-    #     'total_exchanged': total_exchanged,
-    #     'has_transferred_count': has_transferred_count,
-    #     'zero_balance_count': exhausted_balance_count,
-    #     'total_beneficiaries': total_beneficiaries,
-    #     'total_users': total_users,
-    #     'master_wallet_balance': master_wallet_balance,
-    #     'daily_transaction_volume': transaction_vol_list,
-    #     'daily_disbursement_volume': disbursement_vol_list,
-    #     'transfer_use_breakdown': transfer_use_breakdown,
-    #     'last_day_volume': {'date': last_day.isoformat(), 'volume': last_day_volume},
-    #     'filter_active': filter_active
-    # }
-    #
-    # return data
+    try:
+        last_day = daily_transaction_volume[0].date
+        last_day_volume = daily_transaction_volume[0].volume
+        transaction_vol_list = [
+            {'date': item.date.isoformat(), 'volume': item.volume} for item in daily_transaction_volume
+        ]
+    except IndexError:  # No transactions
+        last_day = datetime.datetime.utcnow()
+        last_day_volume = 0
+        has_transferred_count = 0
+        transaction_vol_list = [{'date': datetime.datetime.utcnow().isoformat(), 'volume': 0}]
+
+    disbursement_vol_list = [
+        {'date': item.date.isoformat(), 'volume': item.volume} for item in daily_disbursement_volume
+    ] or [{'date': datetime.datetime.utcnow().isoformat(), 'volume': 0}]
+
+    try:
+        master_wallet_balance = cached_funds_available()
+    except:
+        master_wallet_balance = 0
+
+    data = {
+        'total_distributed': total_distributed,
+        'total_spent': total_spent,
+        'total_exchanged': total_exchanged,
+        'has_transferred_count': has_transferred_count,
+        'zero_balance_count': exhausted_balance_count,
+        'total_beneficiaries': total_beneficiaries,
+        'total_users': total_users,
+        'master_wallet_balance': master_wallet_balance,
+        'daily_transaction_volume': transaction_vol_list,
+        'daily_disbursement_volume': disbursement_vol_list,
+        'transfer_use_breakdown': transfer_use_breakdown,
+        'last_day_volume': {'date': last_day.isoformat(), 'volume': last_day_volume},
+        'filter_active': filter_active
+    }
+
+    return data
 
 def apply_filters(query, filters, query_table):
 
@@ -192,6 +212,8 @@ def apply_filters(query, filters, query_table):
 def determine_join_conditions(table):
     if table == CreditTransfer:
         return CreditTransfer.sender_user_id, CreditTransfer.sender_transfer_account_id
+    if table == SenderTransferStatsRollup:
+        return SenderTransferStatsRollup.sender_user_id, SenderTransferStatsRollup.sender_transfer_account_id
     if table == User:
         return User.id, None
 
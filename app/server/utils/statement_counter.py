@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class StatementCounter(object):
+    """
+    Counts the SQL statements run on an engine while it's listening, for checking how many queries something makes
+    """
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __init__(self):
+        self.count = 0
+
+
+@contextmanager
+def count_sql_statements(engine):
+    """
+    Counts the SQL statements run inside a block:
+        with count_sql_statements(db.engine) as counter:
+            ...
+        assert counter.count == 3
+    """
+    counter = StatementCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
@@ -4,12 +4,15 @@ from functools import reduce
 from toolz import curry, pipe
 from sqlalchemy import or_
 from sqlalchemy.orm import Query
+from sqlalchemy.sql import func
 
 from server.exceptions import TransferLimitCreationError
 
 from server.models.kyc_application import KycApplication
 from server.models import token
+from server import db
 from server.models.credit_transfer import CreditTransfer
+from server.models.transfer_limit_rollup import TransferLimitRollup
 from server.utils.transfer_enums import TransferSubTypeEnum, TransferTypeEnum, TransferStatusEnum
 from server.utils.access_control import AccessControl
 import config
@@ -203,6 +206,31 @@ def not_rejected_filter(query: Query):
 def empty_filter(transfer: CreditTransfer, query: Query):
     return query
 
+# ~~~~~~ROLLUP FILTERS~~~~~~
+# Equivalents of the transfer filters above, applied to the daily TransferLimitRollup rows
+
+
+@curry
+def matching_transfer_type_rollup_filter(transfer: CreditTransfer, query: Query):
+    return query.filter(TransferLimitRollup.transfer_type == transfer.transfer_type.value)
+
+
+@curry
+def matching_transfer_type_and_subtype_rollup_filter(transfer: CreditTransfer, query: Query):
+    return (query
+            .filter(TransferLimitRollup.transfer_type == transfer.transfer_type.value)
+            .filter(TransferLimitRollup.transfer_subtype ==
+                    (transfer.transfer_subtype.value if transfer.transfer_subtype else '')))
+
+
+@curry
+def withdrawal_or_agent_out_and_not_excluded_rollup_filter(transfer: CreditTransfer, query: Query):
+    return (query
+            .filter(or_(TransferLimitRollup.transfer_type == TransferTypeEnum.WITHDRAWAL.value,
+                        TransferLimitRollup.transfer_subtype == TransferSubTypeEnum.AGENT_OUT.value))
+            .filter(TransferLimitRollup.exclude_from_limit_calcs == False)
+            )
+
 
 class TransferLimit(object):
 
@@ -217,12 +245,43 @@ class TransferLimit(object):
                     after_time_period_filter(self.time_period_days),
                     self.transfer_filter(transfer))
 
+    def rolling_totals(self, transfer: CreditTransfer):
+        """
+        Total amount and count of the sender's transfers in this limit's time period, matching apply_all_filters.
+        Whole days are read from the daily rollups, so only the partial day at the start of the period
+        reads individual transfers.
+        :return: tuple of (total amount, transfer count)
+        """
+        epoch = datetime.datetime.today() - datetime.timedelta(days=self.time_period_days)
+        first_whole_day = epoch.date() + datetime.timedelta(days=1)
+
+        rollup_wei, rollup_count = pipe(
+            db.session.query(func.sum(TransferLimitRollup.total_amount_wei),
+                             func.sum(TransferLimitRollup.transfer_count)),
+            lambda query: query.filter(TransferLimitRollup.sender_user == transfer.sender_user),
+            lambda query: query.filter(TransferLimitRollup.day >= first_whole_day),
+            self.rollup_filter(transfer)
+        ).first()
+
+        partial_day_wei, partial_day_count = self.apply_all_filters(
+            transfer,
+            db.session.query(func.sum(CreditTransfer._transfer_amount_wei), func.count(CreditTransfer.id))
+        ).filter(
+            CreditTransfer.created < datetime.datetime.combine(first_whole_day, datetime.time())
+        ).execution_options(show_all=True).first()
+
+        total_wei = (rollup_wei or 0) + (partial_day_wei or 0)
+        total_count = (rollup_count or 0) + (partial_day_count or 0)
+
+        return float(total_wei) / int(1e16), int(total_count)
+
     def __init__(self,
                  name: str,
                  applied_to_transfer_types: AppliedToTypes,
                  application_filter: Callable,
                  time_period_days: int,
                  transfer_filter: Optional[Query.filter] = matching_transfer_type_filter,
+                 rollup_filter: Optional[Query.filter] = matching_transfer_type_rollup_filter,
                  no_transfer_allowed: [bool] = False,
                  total_amount: Optional[int] = None,
                  transfer_count: Optional[int] = None,
@@ -237,6 +296,8 @@ class TransferLimit(object):
         self.time_period_days = time_period_days
         # TODO: Make LIMIT_EXCHANGE_RATE configurable per org
         self.transfer_filter = transfer_filter
+        # Must select the same transfers as transfer_filter, but from the daily rollups
+        self.rollup_filter = rollup_filter
 
         self.no_transfer_allowed = no_transfer_allowed
         self.total_amount = int(total_amount * config.LIMIT_EXCHANGE_RATE) if total_amount else None
@@ -305,12 +366,14 @@ LIMITS = [
                   [AGENT_OUT_PAYMENT, WITHDRAWAL],
                   is_user_and_liquid_token, 7,
                   transfer_filter=withdrawal_or_agent_out_and_not_excluded_filter,
+                  rollup_filter=withdrawal_or_agent_out_and_not_excluded_rollup_filter,
                   no_transfer_allowed=True),
 
     TransferLimit('GE Liquid Token - Group Account User',
                   [AGENT_OUT_PAYMENT, WITHDRAWAL],
                   is_group_and_liquid_token, 30,
                   transfer_filter=withdrawal_or_agent_out_and_not_excluded_filter,
+                  rollup_filter=withdrawal_or_agent_out_and_not_excluded_rollup_filter,
                   transfer_count=1, transfer_balance_fraction=0.50)
 ]
 
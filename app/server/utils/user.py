@@ -200,7 +200,8 @@ def create_transfer_account_user(first_name=None, last_name=None, preferred_lang
                                  is_self_sign_up=False,
                                  business_usage=None,
                                  initial_disbursement=None,
-                                 registration_method=None):
+                                 registration_method=None,
+                                 batch_blockchain_payload=False):
 
     user = User(first_name=first_name,
                 last_name=last_name,
@@ -277,7 +278,8 @@ def create_transfer_account_user(first_name=None, last_name=None, preferred_lang
             transfer_account.token = token
 
         if not is_self_sign_up:
-            transfer_account.approve_and_disburse(initial_disbursement=initial_disbursement)
+            transfer_account.approve_and_disburse(
+                initial_disbursement=initial_disbursement, batch_blockchain_payload=batch_blockchain_payload)
 
         db.session.add(transfer_account)
 
@@ -393,31 +395,25 @@ def send_one_time_code(phone, user):
             'Something went wrong. ERROR: {}'.format(e))
 
 
-def proccess_create_or_modify_user_request(
-        attribute_dict,
-        organisation=None,
-        allow_existing_user_modify=False,
-        is_self_sign_up=False,
-        modify_only=False,
-):
+# Attributes of a create or modify user request that parse_user_attributes reads, rather than custom attributes
+USER_REQUEST_ATTRIBUTES = DEFAULT_ATTRIBUTES + [
+    'user_id', 'vendor', 'is_tokenagent', 'is_groupaccount', 'referred_by', 'business_usage_name', 'geo_location',
+    'primary_user_pin', 'registration_method', 'require_transfer_card_exists',
+    'payment_card_qr_code', 'payment_card_barcode', 'custom_attributes'
+]
+
+
+def parse_user_attributes(attribute_dict, is_self_sign_up=False):
     """
-    Takes a create or modify user request and determines the response. Normally what's in the top level API function,
-    but here it's one layer down because there's multiple entry points for 'create user':
-    - The admin api
-    - The register api
+    Reads and checks the attributes of a create or modify user request, without looking for an existing user.
+    Shared by proccess_create_or_modify_user_request and the spreadsheet user import.
 
     :param attribute_dict: attributes that can be supplied by the request maker
-    :param organisation:  what organisation the request maker belongs to. The created user is bound to the same org
-    :param allow_existing_user_modify: whether to return and error when the user already exists for the supplied IDs
     :param is_self_sign_up: does the request come from the register api?
-    :return: An http response
+    :return: tuple of (dict of arguments for create_transfer_account_user, with location and referred_by_user, None)
+    if the attributes are valid, otherwise (None, (error response object, response code))
     """
 
-    if not attribute_dict.get('custom_attributes'):
-        attribute_dict['custom_attributes'] = {}
-
-    user_id = attribute_dict.get('user_id')
-
     email = attribute_dict.get('email')
     phone = attribute_dict.get('phone')
 
@@ -440,7 +436,7 @@ def proccess_create_or_modify_user_request(
             pass
 
     require_transfer_card_exists = attribute_dict.get(
-        'require_transfer_card_exists', g.active_organisation.require_transfer_card)
+        'require_transfer_card_exists', getattr(g.active_organisation, 'require_transfer_card', False))
 
     public_serial_number = (provided_public_serial_number
                             or attribute_dict.get('payment_card_qr_code')
@@ -496,7 +492,7 @@ def proccess_create_or_modify_user_request(
         except ValueError:
             response_object = {
                 'message': 'Blockchain Address {} Not Valid'.format(blockchain_address)}
-            return response_object, 400
+            return None, (response_object, 400)
 
     if isinstance(phone, bool):
         phone = None
@@ -507,7 +503,7 @@ def proccess_create_or_modify_user_request(
             phone = proccess_phone_number(phone)
         except NumberParseException as e:
             response_object = {'message': 'Invalid Phone Number: ' + str(e)}
-            return response_object, 400
+            return None, (response_object, 400)
 
     # Work out if there's an existing transfer account to bind to
     existing_transfer_account = None
@@ -517,28 +513,28 @@ def proccess_create_or_modify_user_request(
 
         if not primary_user or not primary_user.verify_password(primary_user_pin):
             response_object = {'message': 'Primary User not Found'}
-            return response_object, 400
+            return None, (response_object, 400)
 
         if not primary_user.verify_password(primary_user_pin):
             response_object = {'message': 'Invalid PIN for Primary User'}
-            return response_object, 400
+            return None, (response_object, 400)
 
         primary_user_transfer_account = primary_user.transfer_account
 
         if not primary_user_transfer_account:
             response_object = {
                 'message': 'Primary User has no transfer account'}
-            return response_object, 400
+            return None, (response_object, 400)
 
     if not (phone or email or public_serial_number or blockchain_address):
         response_object = {'message': 'Must provide a unique identifier'}
-        return response_object, 400
+        return None, (response_object, 400)
 
     if use_precreated_pin and not public_serial_number:
         response_object = {
             'message': 'Must provide public serial number to use a transfer card or pre-created pin'
         }
-        return response_object, 400
+        return None, (response_object, 400)
 
     if public_serial_number:
         public_serial_number = str(public_serial_number)
@@ -549,7 +545,7 @@ def proccess_create_or_modify_user_request(
 
             if not transfer_card:
                 response_object = {'message': 'Transfer card not found'}
-                return response_object, 400
+                return None, (response_object, 400)
 
     business_usage = None
     if business_usage_id:
@@ -558,7 +554,7 @@ def proccess_create_or_modify_user_request(
             response_object = {
                 'message': f'Business Usage not found for id {business_usage_id}'
             }
-            return response_object, 400
+            return None, (response_object, 400)
 
     referred_by_user = find_user_from_public_identifier(referred_by)
 
@@ -566,10 +562,62 @@ def proccess_create_or_modify_user_request(
         response_object = {
             'message': f'Referrer user not found for public identifier {referred_by}'
         }
-        return response_object, 400
+        return None, (response_object, 400)
+
+    attributes = dict(
+        first_name=first_name, last_name=last_name, preferred_language=preferred_language,
+        phone=phone, email=email, public_serial_number=public_serial_number,
+        blockchain_address=blockchain_address,
+        transfer_account_name=transfer_account_name,
+        location=location, lat=lat, lng=lng,
+        use_precreated_pin=use_precreated_pin,
+        use_last_4_digits_of_id_as_initial_pin=use_last_4_digits_of_id_as_initial_pin,
+        existing_transfer_account=existing_transfer_account,
+        is_beneficiary=is_beneficiary, is_vendor=is_vendor,
+        is_tokenagent=is_tokenagent, is_groupaccount=is_groupaccount,
+        business_usage=business_usage, initial_disbursement=initial_disbursement,
+        registration_method=registration_method,
+        referred_by_user=referred_by_user
+    )
+
+    return attributes, None
+
+
+def proccess_create_or_modify_user_request(
+        attribute_dict,
+        organisation=None,
+        allow_existing_user_modify=False,
+        is_self_sign_up=False,
+        modify_only=False,
+):
+    """
+    Takes a create or modify user request and determines the response. Normally what's in the top level API function,
+    but here it's one layer down because there's multiple entry points for 'create user':
+    - The admin api
+    - The register api
+
+    :param attribute_dict: attributes that can be supplied by the request maker
+    :param organisation:  what organisation the request maker belongs to. The created user is bound to the same org
+    :param allow_existing_user_modify: whether to return and error when the user already exists for the supplied IDs
+    :param is_self_sign_up: does the request come from the register api?
+    :return: An http response
+    """
+
+    if not attribute_dict.get('custom_attributes'):
+        attribute_dict['custom_attributes'] = {}
+
+    user_id = attribute_dict.get('user_id')
+
+    attributes, error_response = parse_user_attributes(attribute_dict, is_self_sign_up=is_self_sign_up)
+    if error_response:
+        return error_response
+
+    phone = attributes['phone']
+    location = attributes['location']
+    referred_by_user = attributes['referred_by_user']
 
     existing_user = find_user_from_public_identifier(
-        email, phone, public_serial_number, blockchain_address)
+        attributes['email'], phone, attributes['public_serial_number'], attributes['blockchain_address'])
 
     if modify_only:
         existing_user = User.query.get(user_id)
@@ -587,20 +635,20 @@ def proccess_create_or_modify_user_request(
 
             user = update_transfer_account_user(
                 existing_user,
-                first_name=first_name,
-                last_name=last_name,
-                preferred_language=preferred_language,
+                first_name=attributes['first_name'],
+                last_name=attributes['last_name'],
+                preferred_language=attributes['preferred_language'],
                 phone=phone,
-                email=email,
+                email=attributes['email'],
                 location=location,
-                public_serial_number=public_serial_number,
-                use_precreated_pin=use_precreated_pin,
-                existing_transfer_account=existing_transfer_account,
-                is_beneficiary=is_beneficiary,
-                is_vendor=is_vendor,
-                is_tokenagent=is_tokenagent,
-                is_groupaccount=is_groupaccount,
-                business_usage=business_usage
+                public_serial_number=attributes['public_serial_number'],
+                use_precreated_pin=attributes['use_precreated_pin'],
+                existing_transfer_account=attributes['existing_transfer_account'],
+                is_beneficiary=attributes['is_beneficiary'],
+                is_vendor=attributes['is_vendor'],
+                is_tokenagent=attributes['is_tokenagent'],
+                is_groupaccount=attributes['is_groupaccount'],
+                business_usage=attributes['business_usage']
             )
 
             if referred_by_user:
@@ -627,20 +675,21 @@ def proccess_create_or_modify_user_request(
             return response_object, 400
 
     user = create_transfer_account_user(
-        first_name=first_name, last_name=last_name, preferred_language=preferred_language,
-        phone=phone, email=email, public_serial_number=public_serial_number,
+        first_name=attributes['first_name'], last_name=attributes['last_name'],
+        preferred_language=attributes['preferred_language'],
+        phone=phone, email=attributes['email'], public_serial_number=attributes['public_serial_number'],
         organisation=organisation,
-        blockchain_address=blockchain_address,
-        transfer_account_name=transfer_account_name,
-        lat=lat, lng=lng,
-        use_precreated_pin=use_precreated_pin,
-        use_last_4_digits_of_id_as_initial_pin=use_last_4_digits_of_id_as_initial_pin,
-        existing_transfer_account=existing_transfer_account,
-        is_beneficiary=is_beneficiary, is_vendor=is_vendor,
-        is_tokenagent=is_tokenagent, is_groupaccount=is_groupaccount,
+        blockchain_address=attributes['blockchain_address'],
+        transfer_account_name=attributes['transfer_account_name'],
+        lat=attributes['lat'], lng=attributes['lng'],
+        use_precreated_pin=attributes['use_precreated_pin'],
+        use_last_4_digits_of_id_as_initial_pin=attributes['use_last_4_digits_of_id_as_initial_pin'],
+        existing_transfer_account=attributes['existing_transfer_account'],
+        is_beneficiary=attributes['is_beneficiary'], is_vendor=attributes['is_vendor'],
+        is_tokenagent=attributes['is_tokenagent'], is_groupaccount=attributes['is_groupaccount'],
         is_self_sign_up=is_self_sign_up,
-        business_usage=business_usage, initial_disbursement=initial_disbursement,
-        registration_method=registration_method)
+        business_usage=attributes['business_usage'], initial_disbursement=attributes['initial_disbursement'],
+        registration_method=attributes['registration_method'])
 
     if referred_by_user:
         user.referred_by.append(referred_by_user)
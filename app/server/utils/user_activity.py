@@ -0,0 +1,111 @@
+import datetime
+
+import sentry_sdk
+from sqlalchemy import bindparam, or_, tuple_
+
+from server import db, red, mt
+from server.models.user import User
+from server.models.ip_address import IpAddress
+
+# Activity is buffered in redis by authenticated requests, and written to the database in bulk by
+# flush_user_activity, so that read only requests never need to write
+LAST_SEEN_KEY = 'UserActivity-LastSeen'
+IPS_KEY = 'UserActivity-Ips'
+
+# Last seen times are only recorded to this resolution, the same as User.update_last_seen_ts
+LAST_SEEN_RESOLUTION = datetime.timedelta(minutes=1)
+
+
+def get_real_ip(proxies, num_proxy=0):
+    """
+    Proxies can be faked easily. Assumes there is a set number of proxies in production.
+    Todo: make this more robust
+    """
+    correct_ip_index = num_proxy + 1
+
+    if len(proxies) >= correct_ip_index:
+        return proxies[-correct_ip_index]  # get the correct referring client ip
+
+    return None
+
+
+def record_user_activity(user, ip_address=None):
+    """
+    Buffers that a user was just seen, and from which ip address
+    """
+    pipe = red.pipeline()
+    pipe.hset(LAST_SEEN_KEY, user.id, datetime.datetime.utcnow().timestamp())
+    if ip_address is not None:
+        pipe.sadd(IPS_KEY, f'{user.id}|{ip_address}')
+    pipe.execute()
+
+
+def _take(key, read):
+    # Reads and clears a buffer in one transaction, so activity recorded meanwhile waits for the next flush
+    pipe = red.pipeline(transaction=True)
+    read(pipe, key)
+    pipe.delete(key)
+    return pipe.execute()[0]
+
+
+def flush_user_activity():
+    """
+    Writes buffered activity to the database: one bulk update of users' last seen times, and one insert of the
+    ip addresses that users haven't been seen at before.
+    :return: tuple of (number of last seen times flushed, number of new ip addresses)
+    """
+    last_seen = _take(LAST_SEEN_KEY, lambda pipe, key: pipe.hgetall(key))
+    ips = _take(IPS_KEY, lambda pipe, key: pipe.smembers(key))
+
+    last_seen_rows = []
+    for user_id, timestamp in last_seen.items():
+        last_seen_rows.append(dict(
+            user_id=int(user_id),
+            last_seen=datetime.datetime.utcfromtimestamp(float(timestamp)),
+        ))
+
+    if last_seen_rows:
+        user_table = User.__table__
+        db.session.execute(
+            user_table.update()
+            .where(user_table.c.id == bindparam('user_id'))
+            .where(or_(
+                user_table.c._last_seen == None,
+                user_table.c._last_seen <= bindparam('last_seen') - LAST_SEEN_RESOLUTION
+            ))
+            .values(_last_seen=bindparam('last_seen')),
+            last_seen_rows
+        )
+
+    user_ips = set()
+    for member in ips:
+        user_id, ip_address = member.decode().split('|', 1)
+        user_ips.add((int(user_id), ip_address))
+
+    new_ip_addresses = []
+    if user_ips:
+        existing = db.session.query(IpAddress.user_id, IpAddress._ip).filter(
+            tuple_(IpAddress.user_id, IpAddress._ip).in_(list(user_ips))
+        ).all()
+        existing = {(user_id, str(ip_address)) for user_id, ip_address in existing}
+
+        for user_id, ip_address in sorted(user_ips - existing):
+            ip = IpAddress()
+            ip._ip = ip_address
+            ip.user_id = user_id
+            new_ip_addresses.append(ip)
+
+        db.session.add_all(new_ip_addresses)
+        db.session.flush()
+
+    db.session.commit()
+
+    # Only once the addresses have ids to look their locations up for
+    for ip in new_ip_addresses:
+        try:
+            mt.set_ip_location(ip.id, ip._ip)
+        except Exception as e:
+            print(e)
+            sentry_sdk.capture_exception(e)
+
+    return len(last_seen_rows), len(new_ip_addresses)
@@ -0,0 +1,392 @@
+import sentry_sdk
+from eth_utils import to_checksum_address
+from flask import current_app, g
+from sqlalchemy import or_, tuple_
+
+from server import db, executor
+from server.models.blockchain_address import BlockchainAddress
+from server.models.credit_transfer import CreditTransfer
+from server.models.custom_attribute_user_storage import CustomAttributeUserStorage
+from server.models.user import User
+from server.utils.chunked_job import ChunkedJob
+from server.utils.transfer_enums import TransferStatusEnum
+from server.utils.user import (
+    USER_REQUEST_ATTRIBUTES,
+    create_transfer_account_user,
+    parse_user_attributes,
+    update_transfer_account_user,
+    send_onboarding_sms_messages)
+
+IDENTIFIERS = ['email', 'phone', 'public_serial_number']
+
+USER_CREATED = 'User Created'
+USER_UPDATED = 'User Updated'
+
+
+class UserImportJob(ChunkedJob):
+    """
+    Progress of a spreadsheet user import, with the rows to import as its items
+    """
+    name = 'UserImportJob'
+
+    # Rows are parsed, matched to existing users, imported and committed this many at a time
+    chunk_size = 500
+
+    counters = ['created', 'updated', 'failed']
+    results_name = 'diagnostics'
+
+
+def rows_from_dataset(data, header_positions, is_vendor=False):
+    """
+    Maps spreadsheet rows, keyed by column, to the attributes named by each column's header. Empty rows are dropped.
+    :return: list of dicts of the row's position in the spreadsheet and its attributes
+    """
+    rows = []
+    for index, datarow in enumerate(data):
+        attributes = {}
+        for key, header_label in header_positions.items():
+            attribute = datarow.get(key)
+            if attribute:
+                attributes[str(header_label).lower()] = attribute
+
+        if attributes:
+            attributes.setdefault('is_vendor', is_vendor)
+            rows.append({'row': index, 'attributes': attributes})
+
+    return rows
+
+
+def _diagnostic(row, message, status):
+    return {'row': row, 'message': message, 'status': status}
+
+
+def _parse_attributes(row_attributes):
+    """
+    Checks a row with the same rules as a single create or modify user request
+    :return: tuple of (parsed attributes, with the row's custom attributes, None), or (None, (message, status))
+    """
+    attributes, error_response = parse_user_attributes(dict(row_attributes))
+    if error_response:
+        response_object, response_code = error_response
+        return None, (response_object['message'], response_code)
+
+    # Users are matched on the same values they're stored with, as find_user_from_public_identifier does
+    if attributes['email']:
+        attributes['email'] = str(attributes['email']).lower()
+    if attributes['blockchain_address']:
+        try:
+            attributes['blockchain_address'] = to_checksum_address(attributes['blockchain_address'])
+        except ValueError as e:
+            return None, (str(e), 400)
+
+    attributes['custom_attributes'] = {
+        key: value for key, value in row_attributes.items() if key not in USER_REQUEST_ATTRIBUTES
+    }
+
+    return attributes, None
+
+
+def _identifier_keys(attributes):
+    # Serial numbers are looked up lowercased, as find_user_from_public_identifier does
+    keys = []
+    if attributes.get('email'):
+        keys.append(('email', attributes['email']))
+    if attributes.get('phone'):
+        keys.append(('phone', attributes['phone']))
+    if attributes.get('public_serial_number'):
+        keys.append(('public_serial_number', attributes['public_serial_number'].lower()))
+    if attributes.get('blockchain_address'):
+        keys.append(('blockchain_address', attributes['blockchain_address']))
+    return keys
+
+
+def _find_existing_users(rows_attributes):
+    """
+    Finds the users that already exist for any of the rows' identifiers, with one query for users and one for
+    blockchain addresses, rather than several per row
+    :return: dict of (identifier name, value) to user
+    """
+    values = {identifier: set() for identifier in IDENTIFIERS + ['blockchain_address']}
+    for attributes in rows_attributes:
+        for identifier, value in _identifier_keys(attributes):
+            values[identifier].add(value)
+
+    existing = {}
+
+    conditions = [
+        getattr(User, identifier).in_(values[identifier]) for identifier in IDENTIFIERS if values[identifier]
+    ]
+    if conditions:
+        for user in User.query.execution_options(show_all=True).filter(or_(*conditions)).all():
+            for identifier in IDENTIFIERS:
+                value = getattr(user, identifier)
+                if value is not None:
+                    existing[(identifier, value.lower() if identifier != 'phone' else value)] = user
+
+    if values['blockchain_address']:
+        blockchain_addresses = BlockchainAddress.query.filter(
+            BlockchainAddress.address.in_(values['blockchain_address'])
+        ).all()
+        for blockchain_address in blockchain_addresses:
+            if blockchain_address.transfer_account and blockchain_address.transfer_account.primary_user:
+                existing[('blockchain_address', blockchain_address.address)] = \
+                    blockchain_address.transfer_account.primary_user
+
+    return existing
+
+
+def _update_user(user, attributes):
+    update_transfer_account_user(
+        user,
+        first_name=attributes['first_name'],
+        last_name=attributes['last_name'],
+        preferred_language=attributes['preferred_language'],
+        phone=attributes['phone'],
+        email=attributes['email'],
+        location=attributes['location'],
+        public_serial_number=attributes['public_serial_number'],
+        use_precreated_pin=attributes['use_precreated_pin'],
+        existing_transfer_account=attributes['existing_transfer_account'],
+        is_beneficiary=attributes['is_beneficiary'],
+        is_vendor=attributes['is_vendor'],
+        is_tokenagent=attributes['is_tokenagent'],
+        is_groupaccount=attributes['is_groupaccount'],
+        business_usage=attributes['business_usage']
+    )
+
+    if attributes['referred_by_user']:
+        user.referred_by.clear()
+        user.referred_by.append(attributes['referred_by_user'])
+
+
+def _create_user(attributes, organisation):
+    user = create_transfer_account_user(
+        first_name=attributes['first_name'],
+        last_name=attributes['last_name'],
+        preferred_language=attributes['preferred_language'],
+        phone=attributes['phone'],
+        email=attributes['email'],
+        public_serial_number=attributes['public_serial_number'],
+        organisation=organisation,
+        blockchain_address=attributes['blockchain_address'],
+        transfer_account_name=attributes['transfer_account_name'],
+        lat=attributes['lat'],
+        lng=attributes['lng'],
+        use_precreated_pin=attributes['use_precreated_pin'],
+        use_last_4_digits_of_id_as_initial_pin=attributes['use_last_4_digits_of_id_as_initial_pin'],
+        existing_transfer_account=attributes['existing_transfer_account'],
+        is_beneficiary=attributes['is_beneficiary'],
+        is_vendor=attributes['is_vendor'],
+        is_tokenagent=attributes['is_tokenagent'],
+        is_groupaccount=attributes['is_groupaccount'],
+        business_usage=attributes['business_usage'],
+        initial_disbursement=attributes['initial_disbursement'],
+        registration_method=attributes['registration_method'],
+        batch_blockchain_payload=True
+    )
+
+    if attributes['referred_by_user']:
+        user.referred_by.append(attributes['referred_by_user'])
+
+    if attributes['location']:
+        user.location = attributes['location']
+
+    return user
+
+
+def _replace_custom_attributes(custom_attributes):
+    """
+    Sets the custom attributes of many users at once, replacing any they already have of the same names
+    :param custom_attributes: dict of (user_id, name) to value
+    """
+    table = CustomAttributeUserStorage.__table__
+
+    db.session.execute(
+        table.delete().where(tuple_(table.c.user_id, table.c.name).in_(list(custom_attributes.keys())))
+    )
+
+    db.session.bulk_insert_mappings(CustomAttributeUserStorage, [
+        dict(user_id=user_id, name=name, value=value) for (user_id, name), value in custom_attributes.items()
+    ])
+
+
+def _import_row(attributes, existing, organisation):
+    """
+    Updates the existing user that any of the row's identifiers belong to, or creates one
+    :return: tuple of (the user, whether it was created)
+    """
+    keys = _identifier_keys(attributes)
+    user = next((existing[key] for key in keys if key in existing), None)
+
+    if user:
+        _update_user(user, attributes)
+        return user, False
+
+    return _create_user(attributes, organisation), True
+
+
+def _save_custom_attributes(imported):
+    """
+    :param imported: list of (row, user, created, attributes) tuples, for users that have been flushed
+    """
+    custom_attributes = {
+        (user.id, name): value
+        for _, user, _, attributes in imported
+        for name, value in attributes['custom_attributes'].items()
+    }
+    if custom_attributes:
+        _replace_custom_attributes(custom_attributes)
+
+
+def _send_initial_disbursements(imported):
+    """
+    Sends the initial disbursements to created users to the worker, and commits the task uuids they're given.
+    Only called once the users are committed, so that disbursements are never sent to users that are rolled back.
+    :param imported: list of (row, user, created, attributes) tuples, for users that have been committed
+    """
+    disbursements = [
+        transfer
+        for _, user, created, _ in imported if created
+        for transfer in user.default_transfer_account.credit_receives
+        if transfer.transfer_status == TransferStatusEnum.COMPLETE and not transfer.blockchain_task_uuid
+    ]
+    if not disbursements:
+        return
+
+    try:
+        CreditTransfer.send_blockchain_payloads_to_worker_in_batches(disbursements)
+    except Exception as e:
+        # The users are already imported, so this doesn't fail their rows. Batches sent before the one that
+        # failed still have their task uuids committed below, so they're never sent again
+        sentry_sdk.capture_exception(e)
+
+    db.session.commit()
+
+
+def _import_chunk(parsed, organisation):
+    """
+    Imports every row of a chunk with a single flush. Raises if any row can't be imported.
+    """
+    existing = _find_existing_users(attributes for _, attributes in parsed)
+
+    imported = []
+    for row_index, attributes in parsed:
+        user, created = _import_row(attributes, existing, organisation)
+
+        # So that later rows for the same user update it rather than creating it again
+        for key in _identifier_keys(attributes):
+            existing[key] = user
+
+        imported.append((row_index, user, created, attributes))
+
+    db.session.flush()
+    _save_custom_attributes(imported)
+
+    return imported, []
+
+
+def _import_chunk_by_row(parsed, organisation):
+    """
+    Imports each row of a chunk in its own savepoint, so that the rows that can't be imported are rolled back
+    without the rest. Much slower than _import_chunk, so only used once that has failed.
+    """
+    existing = _find_existing_users(attributes for _, attributes in parsed)
+
+    imported = []
+    diagnostics = []
+    for row_index, attributes in parsed:
+        try:
+            with db.session.begin_nested():
+                user, created = _import_row(attributes, existing, organisation)
+                db.session.flush()
+                _save_custom_attributes([(row_index, user, created, attributes)])
+        except Exception as e:
+            diagnostics.append(_diagnostic(row_index, str(e), 400))
+            continue
+
+        for key in _identifier_keys(attributes):
+            existing[key] = user
+
+        imported.append((row_index, user, created, attributes))
+
+    return imported, diagnostics
+
+
+def import_user_rows(rows, organisation=None):
+    """
+    Imports one chunk of spreadsheet rows, creating users that don't exist yet and updating those that do,
+    and commits them together. If the chunk can't be written in one go, it's rolled back and each row is imported
+    on its own instead. Initial disbursements to the created users are sent to the worker as batches once they're
+    committed, so nothing is sent for an attempt that's rolled back.
+    :param rows: list of row dicts, as returned by rows_from_dataset
+    :param organisation: organisation that created users are added to
+    :return: list of diagnostics, one for every row in row order, with a status of 200 for rows that were imported
+    """
+    diagnostics = []
+
+    parsed = []
+    for row in rows:
+        attributes, error = _parse_attributes(row['attributes'])
+        if error:
+            diagnostics.append(_diagnostic(row['row'], *error))
+        else:
+            parsed.append((row['row'], attributes))
+
+    try:
+        imported, row_diagnostics = _import_chunk(parsed, organisation)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        sentry_sdk.capture_exception(e)
+
+        imported, row_diagnostics = _import_chunk_by_row(parsed, organisation)
+        db.session.commit()
+
+    _send_initial_disbursements(imported)
+
+    diagnostics.extend(row_diagnostics)
+    diagnostics.extend(
+        _diagnostic(row_index, USER_CREATED if created else USER_UPDATED, 200)
+        for row_index, _, created, _ in imported
+    )
+
+    if current_app.config['ONBOARDING_SMS']:
+        for _, user, created, _ in imported:
+            if created and user.phone:
+                try:
+                    send_onboarding_sms_messages(user)
+                except Exception as e:
+                    print(e)
+                    sentry_sdk.capture_exception(e)
+
+    return sorted(diagnostics, key=lambda diagnostic: diagnostic['row'])
+
+
+def submit_user_import_job(rows):
+    """
+    Starts importing spreadsheet rows in the background
+    :return: the UserImportJob, for checking its progress
+    """
+    job = UserImportJob.create(getattr(g.active_organisation, 'id', None), rows)
+
+    run_user_import_job.submit(job.id, authorising_user_id=g.user.id)
+
+    return job
+
+
+def _process_user_import_chunk(rows, start):
+    # Rows imported again update the users they created the first time, so need nothing to tell them apart
+    diagnostics = import_user_rows(rows, organisation=g.active_organisation)
+
+    counts = dict(
+        created=sum(1 for diagnostic in diagnostics if diagnostic['message'] == USER_CREATED),
+        updated=sum(1 for diagnostic in diagnostics if diagnostic['message'] == USER_UPDATED),
+        failed=sum(1 for diagnostic in diagnostics if diagnostic['status'] != 200)
+    )
+
+    return counts, [diagnostic for diagnostic in diagnostics if diagnostic['status'] != 200]
+
+
+@executor.job
+def run_user_import_job(job_id, authorising_user_id):
+    UserImportJob(job_id).run(authorising_user_id, _process_user_import_chunk)
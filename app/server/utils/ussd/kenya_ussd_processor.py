@@ -5,14 +5,14 @@ from server.models.ussd import UssdMenu, UssdSession
 from server.models.user import User
 from server.utils.user import get_user_by_phone, default_token
 from server.utils.ussd.kenya_ussd_state_machine import KenyaUssdStateMachine, ITEMS_PER_MENU, USSD_MAX_LENGTH
+from server.utils.ussd.session_store import UssdSessionState
 from server.utils.i18n import i18n_for
 from server.utils.credit_transfer import cents_to_dollars
 
 
 class KenyaUssdProcessor:
     @staticmethod
-    def process_request(session_id: str, user_input: str, user: User) -> UssdMenu:
-        session: Optional[UssdSession] = UssdSession.query.filter_by(session_id=session_id).first()
+    def process_request(session: Optional[UssdSessionState], user_input: str, user: User) -> UssdMenu:
         # returning session
         if session:
             if user_input == "":
@@ -10,7 +10,10 @@ from phonenumbers.phonenumberutil import NumberParseException
 import math
 import config
 
-from transitions import Machine, State
+from collections import namedtuple
+
+from transitions import MachineError, State
+from transitions.core import listify
 
 from server import ussd_tasker
 from server.utils.phone import send_message
@@ -27,8 +30,10 @@ ITEMS_PER_MENU = 8
 USSD_MAX_LENGTH = 164
 MIN_EXCHANGE_AMOUNT_CENTS = 40
 
+CompiledTransition = namedtuple('CompiledTransition', ['dest', 'conditions', 'unless', 'after'])
+
 
-class KenyaUssdStateMachine(Machine):
+class KenyaUssdStateMachine(object):
 
     def __repr__(self):
         return f"<KenyaUssdStateMachine: {self.state}>"
@@ -463,16 +468,76 @@ class KenyaUssdStateMachine(Machine):
     def menu_ten_selected(self, user_input):
         return user_input == '10'
 
+    def feed_char(self, user_input):
+        """
+        Moves to the next state for the user's input, using the first transition out of the current state whose
+        conditions all pass and whose unless conditions all fail, the same way transitions.Machine would.
+        :return: whether a transition was made
+        """
+        transitions = self.transition_table.get(self.state)
+        if not transitions:
+            raise MachineError("Can't trigger event feed_char from state {}!".format(self.state))
+
+        for transition in transitions:
+            if not all(getattr(self, condition)(user_input) for condition in transition.conditions):
+                continue
+            if any(getattr(self, condition)(user_input) for condition in transition.unless):
+                continue
+
+            self.state = transition.dest
+            for callback in self.on_enter_callbacks.get(transition.dest, []) + transition.after:
+                getattr(self, callback)(user_input)
+
+            return True
+
+        return False
+
     # initialize machine
     def __init__(self, session: UssdSession, user: User):
+        if session.state not in self.state_names:
+            raise ValueError("State '{}' is not a registered state.".format(session.state))
+
         self.session = session
         self.user = user
-        Machine.__init__(
-            self,
-            model=self,
-            states=self.states,
-            initial=session.state
-        )
+        self.state = session.state
+
+    @classmethod
+    def compile_transitions(cls):
+        """
+        Builds the table of transitions out of each state from transition_definitions. This is done once, when the
+        module is loaded, so that each hop only has to bind a session and user to the machine.
+        """
+        cls.state_names = set()
+        cls.on_enter_callbacks = {}
+        for state in cls.states:
+            if isinstance(state, State):
+                cls.state_names.add(state.name)
+                cls.on_enter_callbacks[state.name] = listify(state.on_enter)
+            else:
+                cls.state_names.add(state)
+
+        cls.transition_table = {}
+        for definition in cls.transition_definitions():
+            if definition['dest'] not in cls.state_names:
+                raise ValueError("State '{}' is not a registered state.".format(definition['dest']))
+
+            # feed_char is the only trigger, so transitions are looked up by source state alone
+            transition = CompiledTransition(
+                dest=definition['dest'],
+                conditions=listify(definition.get('conditions', [])),
+                unless=listify(definition.get('unless', [])),
+                after=listify(definition.get('after', []))
+            )
+            for source in listify(definition['source']):
+                cls.transition_table.setdefault(source, []).append(transition)
+
+    @staticmethod
+    def transition_definitions():
+        """
+        Every transition of the machine, in the form taken by transitions.Machine.add_transitions
+        """
+        transitions = []
+
 
         # event: initial_language_selection transitions
         initial_language_selection_transitions = [
@@ -494,7 +559,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'initial_language_selection',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(initial_language_selection_transitions)
+        transitions.extend(initial_language_selection_transitions)
 
         # event: initial_pin_entry transitions
         initial_pin_entry_transitions = [
@@ -507,7 +572,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'initial_pin_entry',
              'dest': 'exit_invalid_pin'}
         ]
-        self.add_transitions(initial_pin_entry_transitions)
+        transitions.extend(initial_pin_entry_transitions)
 
         # event: initial_pin_confirmation transitions
         initial_pin_confirmation_transitions = [
@@ -532,7 +597,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'initial_pin_confirmation',
              'dest': 'exit_pin_mismatch'}
         ]
-        self.add_transitions(initial_pin_confirmation_transitions)
+        transitions.extend(initial_pin_confirmation_transitions)
 
         # event: start transitions
         start_transitions = [
@@ -561,7 +626,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'start',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(start_transitions)
+        transitions.extend(start_transitions)
 
         # event: send_enter_recipient transitions
         send_enter_recipient_transitions = [
@@ -579,7 +644,7 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_invalid_recipient',
              'after': 'upsell_unregistered_recipient'}
         ]
-        self.add_transitions(send_enter_recipient_transitions)
+        transitions.extend(send_enter_recipient_transitions)
 
         # event: send_token_amount transitions
         send_token_amount_transitions = [
@@ -592,7 +657,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'send_token_amount',
              'dest': 'exit_invalid_input'},
         ]
-        self.add_transitions(send_token_amount_transitions)
+        transitions.extend(send_token_amount_transitions)
 
         # event: send_token_reason transitions
         send_token_reason_transitions = [
@@ -628,7 +693,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'send_token_reason_other',
              'dest': 'exit_invalid_menu_option'},
         ]
-        self.add_transitions(send_token_reason_transitions)
+        transitions.extend(send_token_reason_transitions)
 
         directory_listing_transitions = [
             {'trigger': 'feed_char',
@@ -663,7 +728,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'directory_listing_other',
              'dest': 'exit_invalid_menu_option'},
         ]
-        self.add_transitions(directory_listing_transitions)
+        transitions.extend(directory_listing_transitions)
 
         # event: send_token_pin_authorization transitions
         send_token_pin_authorization_transitions = [
@@ -677,7 +742,7 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_pin_blocked',
              'conditions': 'is_blocked_pin'}
         ]
-        self.add_transitions(send_token_pin_authorization_transitions)
+        transitions.extend(send_token_pin_authorization_transitions)
 
         # event: account_management transitions
         account_management_transitions = [
@@ -705,7 +770,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'account_management',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(account_management_transitions)
+        transitions.extend(account_management_transitions)
 
         # event: user_profile transitions
         user_profile_transitions = [
@@ -733,7 +798,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'user_profile',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(user_profile_transitions)
+        transitions.extend(user_profile_transitions)
 
         # event: choose_language transition
         choose_language_transitions = [
@@ -751,7 +816,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'choose_language',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(choose_language_transitions)
+        transitions.extend(choose_language_transitions)
 
         # event: balance_inquiry_pin_authorization transitions
         balance_inquiry_pin_authorization_transitions = [
@@ -766,7 +831,7 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_pin_blocked',
              'conditions': 'is_blocked_pin'}
         ]
-        self.add_transitions(balance_inquiry_pin_authorization_transitions)
+        transitions.extend(balance_inquiry_pin_authorization_transitions)
 
         # event: current_pin transitions
         current_pin_transitions = [
@@ -779,7 +844,7 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_pin_blocked',
              'conditions': 'is_blocked_pin'}
         ]
-        self.add_transitions(current_pin_transitions)
+        transitions.extend(current_pin_transitions)
 
         # event: new_pin transitions
         new_pin_transitions = [
@@ -792,7 +857,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'new_pin',
              'dest': 'exit_invalid_pin'}
         ]
-        self.add_transitions(new_pin_transitions)
+        transitions.extend(new_pin_transitions)
 
         # event: new_pin_confirmation transitions
         new_pin_confirmation = [
@@ -805,7 +870,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'new_pin_confirmation',
              'dest': 'exit_pin_mismatch'}
         ]
-        self.add_transitions(new_pin_confirmation)
+        transitions.extend(new_pin_confirmation)
 
         # event: opt_out_of_market_place_pin_authorization transitions
         opt_out_of_market_place_pin_authorization_transitions = [
@@ -819,13 +884,13 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_pin_blocked',
              'conditions': 'is_blocked_pin'}
         ]
-        self.add_transitions(opt_out_of_market_place_pin_authorization_transitions)
+        transitions.extend(opt_out_of_market_place_pin_authorization_transitions)
 
         # first_name_entry transitions
-        self.add_transition(trigger='feed_char',
-                            source='first_name_entry',
-                            dest='last_name_entry',
-                            after='add_first_name_to_session_data')
+        transitions.append(dict(trigger='feed_char',
+                                source='first_name_entry',
+                                dest='last_name_entry',
+                                after='add_first_name_to_session_data'))
 
         # last_name_entry transitions
         last_name_entry_transitions = [
@@ -867,7 +932,7 @@ class KenyaUssdStateMachine(Machine):
              'conditions': 'has_empty_bio_info',
              'after': 'add_last_name_to_session_data'}
         ]
-        self.add_transitions(last_name_entry_transitions)
+        transitions.extend(last_name_entry_transitions)
 
         # gender_entry transitions
         gender_entry_transitions = [
@@ -900,7 +965,7 @@ class KenyaUssdStateMachine(Machine):
              'unless': 'has_empty_location_info',
              'conditions': 'has_empty_bio_info'}
         ]
-        self.add_transitions(gender_entry_transitions)
+        transitions.extend(gender_entry_transitions)
 
         # location_entry_transitions
         location_entry_transitions = [
@@ -927,7 +992,7 @@ class KenyaUssdStateMachine(Machine):
              'after': 'add_location_to_session_data'},
 
         ]
-        self.add_transitions(location_entry_transitions)
+        transitions.extend(location_entry_transitions)
 
         # change_my_business_prompt_transitions
         change_my_business_prompt_transitions = [
@@ -946,42 +1011,42 @@ class KenyaUssdStateMachine(Machine):
              'after': 'add_bio_to_session_data'},
 
         ]
-        self.add_transitions(change_my_business_prompt_transitions)
+        transitions.extend(change_my_business_prompt_transitions)
 
         # name_change_pin_authorization transitions
-        self.add_transition(trigger='feed_char',
-                            source='name_change_pin_authorization',
-                            dest='exit',
-                            after='save_username_info')
+        transitions.append(dict(trigger='feed_char',
+                                source='name_change_pin_authorization',
+                                dest='exit',
+                                after='save_username_info'))
 
         # gender_change_pin_authorization transitions
-        self.add_transition(trigger='feed_char',
-                            source='gender_change_pin_authorization',
-                            dest='exit',
-                            after='save_gender_info')
+        transitions.append(dict(trigger='feed_char',
+                                source='gender_change_pin_authorization',
+                                dest='exit',
+                                after='save_gender_info'))
 
         # location_change_pin_authorization transitions
-        self.add_transition(trigger='feed_char',
-                            source='location_change_pin_authorization',
-                            dest='exit',
-                            after='save_location_info')
+        transitions.append(dict(trigger='feed_char',
+                                source='location_change_pin_authorization',
+                                dest='exit',
+                                after='save_location_info'))
 
         # bio_change_pin_authorization transitions
-        self.add_transition(trigger='feed_char',
-                            source='bio_change_pin_authorization',
-                            dest='exit',
-                            after='save_bio_info')
+        transitions.append(dict(trigger='feed_char',
+                                source='bio_change_pin_authorization',
+                                dest='exit',
+                                after='save_bio_info'))
 
         # profile_info_change_pin_authorization transitions
-        self.add_transition(trigger='feed_char',
-                            source='profile_info_change_pin_authorization',
-                            dest='exit',
-                            after='save_profile_info')
+        transitions.append(dict(trigger='feed_char',
+                                source='profile_info_change_pin_authorization',
+                                dest='exit',
+                                after='save_profile_info'))
 
         # view_profile_pin_authorization transitions
-        self.add_transition(trigger='feed_char',
-                            source='view_profile_pin_authorization',
-                            dest='about_me')
+        transitions.append(dict(trigger='feed_char',
+                                source='view_profile_pin_authorization',
+                                dest='about_me'))
 
         # event: exchange_token transitions
         exchange_token_transitions = [
@@ -998,7 +1063,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'exchange_token',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(exchange_token_transitions)
+        transitions.extend(exchange_token_transitions)
 
         # DEPRECATED - exchange rate currently given without requiring pin
         # event: exchange_rate_pin_authorization transitions
@@ -1013,7 +1078,7 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_pin_blocked',
              'conditions': 'is_blocked_pin'}
         ]
-        self.add_transitions(exchange_rate_pin_authorization_transitions)
+        transitions.extend(exchange_rate_pin_authorization_transitions)
 
         # event: exchange_token_agent_number_entry transitions
         exchange_token_agent_number_entry_transitions = [
@@ -1026,7 +1091,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'exchange_token_agent_number_entry',
              'dest': 'exit_invalid_token_agent'}
         ]
-        self.add_transitions(exchange_token_agent_number_entry_transitions)
+        transitions.extend(exchange_token_agent_number_entry_transitions)
 
         # event: exchange_token_amount_entry transitions
         exchange_token_amount_entry_transitions = [
@@ -1039,7 +1104,7 @@ class KenyaUssdStateMachine(Machine):
              'source': 'exchange_token_amount_entry',
              'dest': 'exit_invalid_exchange_amount'}
         ]
-        self.add_transitions(exchange_token_amount_entry_transitions)
+        transitions.extend(exchange_token_amount_entry_transitions)
 
         # event: exchange_token_pin_authorization transitions
         exchange_token_pin_authorization_transitions = [
@@ -1052,7 +1117,7 @@ class KenyaUssdStateMachine(Machine):
              'dest': 'exit_pin_blocked',
              'conditions': 'is_blocked_pin'}
         ]
-        self.add_transitions(exchange_token_pin_authorization_transitions)
+        transitions.extend(exchange_token_pin_authorization_transitions)
 
         # event: exchange_token_confirmation transitions
         exchange_token_confirmation_transitions = [
@@ -1069,4 +1134,9 @@ class KenyaUssdStateMachine(Machine):
              'source': 'exchange_token_confirmation',
              'dest': 'exit_invalid_menu_option'}
         ]
-        self.add_transitions(exchange_token_confirmation_transitions)
+        transitions.extend(exchange_token_confirmation_transitions)
+
+        return transitions
+
+
+KenyaUssdStateMachine.compile_transitions()
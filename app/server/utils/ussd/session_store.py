@@ -0,0 +1,250 @@
+"""
+Hot USSD session state is kept here rather than in the ussd_session table, since sessions only last a few seconds
+and every hop would otherwise have to read and write a row. Sessions are written to the ussd_session table for audit
+in batches by persist_ussd_sessions, once they're complete or have been left idle.
+"""
+import json
+import time
+
+from sqlalchemy.dialects.postgresql import insert
+
+import config
+from server import db, red
+from server.models.user import User
+from server.models.ussd import UssdSession
+
+# How long a session is kept in the store after its last hop. Gateways end sessions well before this
+SESSION_TTL = 60 * 10
+
+# How long a session has to have been idle for before it's persisted, if it didn't complete
+IDLE_BEFORE_PERSIST = 60 * 2
+
+PERSIST_BATCH_SIZE = 500
+
+# Removes sessions from the unpersisted set only if their score hasn't changed since they were taken, so that a
+# session saved again while it was being persisted stays queued for the next pass
+MARK_PERSISTED_SCRIPT = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) == tonumber(ARGV[i + 1]) then
+        removed = removed + redis.call('ZREM', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+
+class UssdSessionState(object):
+    """
+    A USSD session as held in a session store. Has the same interface as UssdSession, so that the state machine
+    and processors work with either.
+    """
+
+    FIELDS = ['session_id', 'service_code', 'msisdn', 'user_input', 'state', 'session_data', 'ussd_menu_id', 'user_id']
+
+    def set_data(self, key, value):
+        if self.session_data is None:
+            self.session_data = {}
+        self.session_data[key] = value
+
+    def get_data(self, key):
+        if self.session_data is not None:
+            return self.session_data.get(key)
+        else:
+            return None
+
+    @property
+    def user(self):
+        if self._user is None and self.user_id is not None:
+            self._user = User.query.get(self.user_id)
+        return self._user
+
+    @user.setter
+    def user(self, user):
+        self._user = user
+        self.user_id = user.id
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data.get(field) for field in cls.FIELDS})
+
+    def __init__(self, session_id, service_code, msisdn, user_input=None, state=None, session_data=None,
+                 ussd_menu_id=None, user_id=None):
+        self.session_id = session_id
+        self.service_code = service_code
+        self.msisdn = msisdn
+        self.user_input = user_input
+        self.state = state
+        self.session_data = session_data
+        self.ussd_menu_id = ussd_menu_id
+        self.user_id = user_id
+        self._user = None
+
+    def __repr__(self):
+        return f"<UssdSessionState {self.session_id}: {self.state}>"
+
+
+class UssdSessionStore(object):
+    """
+    Base for session stores. Along with each session, stores keep track of the sessions that haven't been persisted
+    since they last changed, scored by when they last changed. Complete sessions are scored by the negated time,
+    so they're always due, and each save still gets a different score.
+    """
+
+    def _get(self, session_id):
+        raise NotImplementedError
+
+    def _set(self, session_id, data, score):
+        raise NotImplementedError
+
+    def take_unpersisted(self, before, limit):
+        """
+        :return: list of (session_id, session dict or None if it has expired, score) scored at or before the given
+        time
+        """
+        raise NotImplementedError
+
+    def mark_persisted(self, scored_session_ids):
+        """
+        :param scored_session_ids: list of (session_id, score) as taken. Sessions that have been saved again since
+        keep their place
+        """
+        raise NotImplementedError
+
+    def get(self, session_id):
+        data = self._get(session_id)
+        if data is None:
+            return None
+
+        return UssdSessionState.from_dict(data)
+
+    def save(self, session, completed=False):
+        now = time.time()
+        self._set(session.session_id, session.to_dict(), -now if completed else now)
+
+
+class RedisUssdSessionStore(UssdSessionStore):
+
+    UNPERSISTED_KEY = 'UssdSession-Unpersisted'
+
+    def _key(self, session_id):
+        return f'UssdSession-{session_id}'
+
+    def _get(self, session_id):
+        data = self.red.get(self._key(session_id))
+        return json.loads(data) if data is not None else None
+
+    def _set(self, session_id, data, score):
+        pipe = self.red.pipeline()
+        pipe.set(self._key(session_id), json.dumps(data), ex=self.ttl)
+        pipe.zadd(self.UNPERSISTED_KEY, {session_id: score})
+        pipe.execute()
+
+    def take_unpersisted(self, before, limit):
+        # Scores are read before the sessions, so a session saved in between is just written again on the next pass
+        scored = [
+            (session_id.decode(), score) for session_id, score in
+            self.red.zrangebyscore(self.UNPERSISTED_KEY, '-inf', before, start=0, num=limit, withscores=True)
+        ]
+        if not scored:
+            return []
+
+        values = self.red.mget([self._key(session_id) for session_id, _ in scored])
+        return [
+            (session_id, json.loads(value) if value is not None else None, score)
+            for (session_id, score), value in zip(scored, values)
+        ]
+
+    def mark_persisted(self, scored_session_ids):
+        if scored_session_ids:
+            args = []
+            for session_id, score in scored_session_ids:
+                args.extend([session_id, repr(score)])
+            self._mark_persisted_script(keys=[self.UNPERSISTED_KEY], args=args)
+
+    def __init__(self, red, ttl):
+        self.red = red
+        self.ttl = ttl
+        self._mark_persisted_script = red.register_script(MARK_PERSISTED_SCRIPT)
+
+
+class InMemoryUssdSessionStore(UssdSessionStore):
+    """
+    Session store for tests. Sessions don't expire.
+    """
+
+    def _get(self, session_id):
+        data = self.sessions.get(session_id)
+        # Copied, as redis would, so that changes aren't stored until saved
+        return json.loads(json.dumps(data)) if data is not None else None
+
+    def _set(self, session_id, data, score):
+        self.sessions[session_id] = json.loads(json.dumps(data))
+        self.unpersisted[session_id] = score
+
+    def take_unpersisted(self, before, limit):
+        session_ids = sorted(
+            (session_id for session_id, score in self.unpersisted.items() if score <= before),
+            key=lambda session_id: self.unpersisted[session_id]
+        )[:limit]
+        return [(session_id, self._get(session_id), self.unpersisted[session_id]) for session_id in session_ids]
+
+    def mark_persisted(self, scored_session_ids):
+        for session_id, score in scored_session_ids:
+            if self.unpersisted.get(session_id) == score:
+                del self.unpersisted[session_id]
+
+    def clear(self):
+        self.sessions.clear()
+        self.unpersisted.clear()
+
+    def __init__(self):
+        self.sessions = {}
+        self.unpersisted = {}
+
+
+if config.IS_TEST:
+    ussd_session_store = InMemoryUssdSessionStore()
+else:
+    ussd_session_store = RedisUssdSessionStore(red, SESSION_TTL)
+
+
+def persist_ussd_sessions(store=ussd_session_store, idle_before_persist=IDLE_BEFORE_PERSIST,
+                          batch_size=PERSIST_BATCH_SIZE):
+    """
+    Writes complete and idle sessions from the store to the ussd_session table, a batch at a time, with one upsert
+    per batch.
+    :return: the number of sessions persisted
+    """
+    table = UssdSession.__table__
+    persisted = 0
+
+    while True:
+        taken = store.take_unpersisted(before=time.time() - idle_before_persist, limit=batch_size)
+        if not taken:
+            return persisted
+
+        rows = [
+            data for _, data, _ in taken
+            # Sessions that expired before being persisted, or never reached a menu, can't be written
+            if data is not None and data.get('ussd_menu_id') is not None
+        ]
+
+        if rows:
+            statement = insert(table).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.session_id],
+                set_={
+                    column: statement.excluded[column]
+                    for column in ['user_input', 'state', 'session_data', 'ussd_menu_id', 'user_id', 'updated']
+                }
+            )
+            db.session.execute(statement)
+            db.session.commit()
+
+        store.mark_persisted([(session_id, score) for session_id, _, score in taken])
+        persisted += len(rows)
@@ -1,28 +1,31 @@
 from typing import Optional
 
-from server import db
 from server.models.user import User
-from server.models.ussd import UssdMenu, UssdSession
+from server.models.ussd import UssdMenu
 from server.utils.i18n import i18n_for
+from server.utils.ussd.session_store import UssdSessionState, ussd_session_store
 
 
 def menu_display_text_in_lang(current_menu: UssdMenu, user: Optional[User]) -> str:
     return i18n_for(user, current_menu.display_key)
 
 
-def create_or_update_session(session_id: str, user: User, current_menu: UssdMenu, user_input: str, service_code: str) -> UssdSession:
-    session: Optional[UssdSession] = UssdSession.query.filter_by(session_id=session_id).first()
+def create_or_update_session(session_id: str, user: User, current_menu: UssdMenu, user_input: str, service_code: str,
+                             session: Optional[UssdSessionState] = None) -> UssdSessionState:
+    """
+    Updates the session, if already fetched from the store, else the stored one, or starts a new one.
+    The session isn't saved to the store, so that the caller can save it once it's done with it.
+    """
+    session = session or ussd_session_store.get(session_id)
     if session:
         session.user_input = user_input
-        session.ussd_menu = current_menu
+        session.ussd_menu_id = current_menu.id
         session.state = current_menu.name
     else:
-        session = UssdSession(session_id=session_id, msisdn=user.phone, user_input=user_input,
-                              state=current_menu.name, service_code=service_code)
+        session = UssdSessionState(session_id=session_id, msisdn=user.phone, user_input=user_input,
+                                   state=current_menu.name, service_code=service_code)
 
         session.user = user
-        session.ussd_menu = current_menu
-
-        db.session.add(session)
+        session.ussd_menu_id = current_menu.id
 
     return session
@@ -4,6 +4,7 @@ endpoint_simulators = {
     'eth_manager.celery_tasks.deploy_contract': blockchain_tasks_simulator.deploy_contract,
     'eth_manager.celery_tasks.call_contract_function': blockchain_tasks_simulator.call_contract_function,
     'eth_manager.celery_tasks.transact_with_contract_function': blockchain_tasks_simulator.transact_with_contract_function,
+    'eth_manager.celery_tasks.transact_with_contract_function_batch': blockchain_tasks_simulator.transact_with_contract_function_batch,
     'eth_manager.celery_tasks.get_task': blockchain_tasks_simulator.get_task,
     'eth_manager.celery_tasks.retry_task': blockchain_tasks_simulator.retry_task,
     'eth_manager.celery_tasks.retry_failed': blockchain_tasks_simulator.retry_failed,
@@ -144,6 +144,10 @@ TFA_REQUIRED_ROLES = config_parser['APP']['TFA_REQUIRED_ROLES'].split(',')
 MOBILE_VERSION = config_parser['APP']['MOBILE_VERSION']
 SEMPOADMIN_EMAILS = config_parser['APP'].get('sempoadmin_emails', '').split(',')
 DEFAULT_COUNTRY = config_parser['APP'].get('default_country')
+# Hard limit on items per page for paginated list endpoints
+MAX_PAGE_SIZE = config_parser['APP'].getint('max_page_size', 500)
+# Seconds an authenticated user's activation, TFA and organisation details are cached for between requests
+AUTH_CACHE_TTL = config_parser['APP'].getint('auth_cache_ttl', 60)
 
 TOKEN_EXPIRATION =  60 * 60 * 24 * 1 # Day
 PASSWORD_PEPPER     = secrets_parser['APP'].get('PASSWORD_PEPPER')
@@ -298,6 +302,9 @@ ETH_CHECK_TRANSACTION_RETRIES_TIME_LIMIT = sum(
     [ETH_CHECK_TRANSACTION_BASE_TIME * 2 ** i for i in range(1, ETH_CHECK_TRANSACTION_RETRIES + 1)]
 )
 
+# Resolve transaction receipts from the eth_worker block follower rather than a polling task per transaction
+ETH_USE_BLOCK_FOLLOWER = config_parser['ETHEREUM'].getboolean('use_block_follower', False)
+
 INTERNAL_TO_TOKEN_RATIO = float(config_parser['ETHEREUM'].get('internal_to_token_ratio', 1))
 FORCE_ETH_DISBURSEMENT_AMOUNT = float(config_parser['ETHEREUM'].get('force_eth_disbursement_amount', 0))
 
@@ -323,6 +330,13 @@ RESERVE_TOKEN_SYMBOL = config_parser['ETHEREUM'].get('reserve_token_symbol')
 SYSTEM_WALLET_TARGET_BALANCE = int(config_parser['ETHEREUM'].get('system_wallet_target_balance', 0))
 SYSTEM_WALLET_TOPUP_THRESHOLD = int(config_parser['ETHEREUM'].get('system_wallet_topup_threshold', 0))
 
+# eth_worker keeps this many funded wallets ready in redis for the app to claim, so that creating an account
+# doesn't wait on the worker. Off unless set, like the block follower
+WALLET_POOL_SIZE = config_parser['ETHEREUM'].getint('wallet_pool_size', 0)
+WALLET_POOL_KEY = 'BlockchainWalletPool'
+WALLET_POOL_WEI_TARGET_BALANCE = int(2e16)
+WALLET_POOL_WEI_TOPUP_THRESHOLD = int(1e16)
+
 ETH_CONTRACT_TYPE       = config_parser['ETHEREUM'].get('contract_type', 'standard').lower()
 ETH_CONTRACT_ADDRESS    = config_parser['ETHEREUM'].get('contract_address')
 USING_EXTERNAL_ERC20    = ETH_CONTRACT_TYPE != 'mintable'
@@ -337,6 +351,8 @@ EXCHANGE_CONTRACT_ADDRESS = config_parser['ETHEREUM'].get('exchange_contract_add
 
 SYNCRONOUS_TASK_TIMEOUT = config_parser['ETHEREUM'].getint('synchronous_task_timeout', 4)
 CALL_TIMEOUT = config_parser['ETHEREUM'].getint('call_timeout', 2)
+# Seconds that changeable read only call results (eg totalSupply, balanceOf) are cached for, roughly one block
+ETH_CALL_CACHE_TTL = config_parser['ETHEREUM'].getint('call_cache_ttl', 5)
 
 FACEBOOK_TOKEN = common_secrets_parser['FACEBOOK']['token']
 FACEBOOK_VERIFY_TOKEN = common_secrets_parser['FACEBOOK']['verify_token']
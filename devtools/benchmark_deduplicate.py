@@ -0,0 +1,132 @@
+"""
+Compares the ways the eth_worker can find duplicated tasks and the work needed to reverse them:
+  legacy:  one query with correlated counts per task over the whole id range, then each task and its
+           reversals loaded one at a time (as composite.deduplicate used to)
+  chunked: an aggregate over the (blockchain_task_id, _status) index per chunk of task ids, then each chunk's
+           tasks and reversal counts loaded together (SQLPersistenceInterface.find_duplicates)
+
+Seeds tasks, a share of which have extra successful transactions, into the worker tables inside a transaction that
+is always rolled back. Needs the worker database migrated. Run from the eth_worker directory:
+  python ../devtools/benchmark_deduplicate.py [task_counts] [duplicate_every] [chunk_size]
+e.g.
+  python ../devtools/benchmark_deduplicate.py 10000,100000,1000000 50 10000
+"""
+import sys
+from time import time
+
+import benchmark_utils  # noqa: F401, puts config and the eth_worker on the path
+
+LEGACY_DUPLICATES = '''
+    SELECT blockchain_task.id as task_id,
+      (SELECT COUNT(*)
+        FROM blockchain_transaction
+        WHERE blockchain_task_id = blockchain_task.id AND _status = 'SUCCESS'
+        ) as txn_count
+    FROM blockchain_task
+    RIGHT JOIN blockchain_transaction
+    ON  blockchain_transaction.blockchain_task_id = blockchain_task.id
+    WHERE blockchain_task.id > :min_task_id and blockchain_task.id < :max_task_id
+    GROUP BY blockchain_task.id
+    HAVING (
+      SELECT COUNT(*)
+      FROM blockchain_transaction
+      WHERE blockchain_task_id = blockchain_task.id AND _status = 'SUCCESS'
+      ) > 1
+'''
+
+CHUNK_DUPLICATES = '''
+    SELECT blockchain_task_id, count(*)
+    FROM blockchain_transaction
+    WHERE blockchain_task_id > :chunk_start AND blockchain_task_id <= :chunk_end AND _status = 'SUCCESS'
+    GROUP BY blockchain_task_id
+    HAVING count(*) > 1
+    ORDER BY blockchain_task_id
+'''
+
+
+def seed(connection, task_count, duplicate_every):
+    min_task_id = connection.execute('SELECT coalesce(max(id), 0) FROM blockchain_task').scalar()
+
+    connection.execute(text('''
+        INSERT INTO blockchain_task (id, uuid, _type, function, args, _status)
+        SELECT :min_task_id + i, md5(random()::text), 'FUNCTION', 'transferFrom',
+          '["0xSender", "0xRecipient", 100]', 'SUCCESS'
+        FROM generate_series(1, :task_count) i
+    '''), min_task_id=min_task_id, task_count=task_count)
+
+    # One successful transaction per task, an extra for every duplicate_every-th, and a failed attempt for some
+    connection.execute(text('''
+        INSERT INTO blockchain_transaction (blockchain_task_id, _status)
+        SELECT :min_task_id + i, 'SUCCESS' FROM generate_series(1, :task_count) i
+        UNION ALL
+        SELECT :min_task_id + i, 'SUCCESS' FROM generate_series(1, :task_count) i WHERE i % :duplicate_every = 0
+        UNION ALL
+        SELECT :min_task_id + i, 'FAILED' FROM generate_series(1, :task_count) i WHERE i % 7 = 0
+    '''), min_task_id=min_task_id, task_count=task_count, duplicate_every=duplicate_every)
+
+    connection.execute('ANALYZE blockchain_task')
+    connection.execute('ANALYZE blockchain_transaction')
+
+    return min_task_id, min_task_id + task_count + 1
+
+
+def run_legacy(connection, min_task_id, max_task_id, chunk_size):
+    duplicates = connection.execute(
+        text(LEGACY_DUPLICATES), min_task_id=min_task_id, max_task_id=max_task_id
+    ).fetchall()
+
+    for task_id, _ in duplicates:
+        connection.execute(text('SELECT * FROM blockchain_task WHERE id = :id'), id=task_id).fetchone()
+        connection.execute(text('SELECT * FROM blockchain_task WHERE reverses_id = :id'), id=task_id).fetchall()
+
+    return len(duplicates)
+
+
+def run_chunked(connection, min_task_id, max_task_id, chunk_size):
+    found = 0
+    for chunk_start in range(min_task_id, max_task_id - 1, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, max_task_id - 1)
+        duplicates = connection.execute(
+            text(CHUNK_DUPLICATES), chunk_start=chunk_start, chunk_end=chunk_end
+        ).fetchall()
+
+        task_ids = [task_id for task_id, _ in duplicates]
+        if task_ids:
+            connection.execute(text('SELECT * FROM blockchain_task WHERE id = ANY(:ids)'), ids=task_ids).fetchall()
+            connection.execute(text('''
+                SELECT reverses_id, count(*) FROM blockchain_task WHERE reverses_id = ANY(:ids) GROUP BY reverses_id
+            '''), ids=task_ids).fetchall()
+
+        found += len(duplicates)
+
+    return found
+
+
+def benchmark(name, runner, connection, min_task_id, max_task_id, chunk_size, task_count):
+    start = time()
+    found = runner(connection, min_task_id, max_task_id, chunk_size)
+    duration = time() - start
+
+    print(f'{name:<8} tasks {task_count:<8} {duration:.3f}s  ({found} duplicates)')
+
+
+if __name__ == '__main__':
+    from sqlalchemy import create_engine, text
+    import config
+
+    task_counts = [int(c) for c in sys.argv[1].split(',')] if len(sys.argv) > 1 else [10000, 100000]
+    duplicate_every = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+
+    engine = create_engine(config.ETH_DATABASE_URI)
+
+    for task_count in task_counts:
+        connection = engine.connect()
+        transaction = connection.begin()
+        try:
+            min_task_id, max_task_id = seed(connection, task_count, duplicate_every)
+            benchmark('legacy', run_legacy, connection, min_task_id, max_task_id, chunk_size, task_count)
+            benchmark('chunked', run_chunked, connection, min_task_id, max_task_id, chunk_size, task_count)
+        finally:
+            transaction.rollback()
+            connection.close()
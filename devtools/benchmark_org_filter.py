@@ -0,0 +1,70 @@
+"""
+Compares the organisation filter that before_compile adds to queries on many-to-many organisation models:
+  exists:  the old organisations.any() filter, a correlated EXISTS through the organisation table
+  in:      the current filter, an uncorrelated IN on the association table
+Prints the mean time to build and compile a credit transfer list query with each filter, then the query plan and
+execution time of each against the app database, so run it against one with a large credit_transfer table.
+
+Run from the app directory:
+  python ../devtools/benchmark_org_filter.py [organisation_id] [rounds]
+e.g.
+  python ../devtools/benchmark_org_filter.py 1 1000
+"""
+import sys
+
+from benchmark_utils import create_benchmark_app, summarise, time_rounds
+
+
+def exists_filter(query, organisation_id):
+    return query.execution_options(show_all=True).filter(or_(
+        CreditTransfer.organisations.any(Organisation.id.in_([organisation_id])),
+        CreditTransfer.is_public == True,
+    ))
+
+
+def in_filter(query, organisation_id):
+    # Left to before_compile
+    return query
+
+
+def list_query():
+    return CreditTransfer.query.order_by(CreditTransfer.id.desc()).limit(50)
+
+
+def benchmark_compile(name, apply_filter, organisation_id, rounds):
+    durations = time_rounds(
+        lambda: str(apply_filter(list_query(), organisation_id).statement.compile(dialect=db.engine.dialect)), rounds
+    )
+
+    print(f'{name:<8} compile {summarise(durations, precision=3)}  ({rounds} rounds)')
+
+
+def explain(name, apply_filter, organisation_id):
+    statement = apply_filter(list_query(), organisation_id).statement
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+
+    print(f'\n{name} plan:')
+    for row in db.session.execute(f'EXPLAIN ANALYZE {compiled}'):
+        print('  ' + row[0])
+
+
+if __name__ == '__main__':
+    app = create_benchmark_app()
+
+    from flask import g
+    from sqlalchemy import or_
+    from server import db
+    from server.models.credit_transfer import CreditTransfer
+    from server.models.organisation import Organisation
+
+    organisation_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with app.test_request_context():
+        g.active_organisation = Organisation.query.execution_options(show_all=True).get(organisation_id)
+
+        benchmark_compile('exists', exists_filter, organisation_id, rounds)
+        benchmark_compile('in', in_filter, organisation_id, rounds)
+
+        explain('exists', exists_filter, organisation_id)
+        explain('in', in_filter, organisation_id)
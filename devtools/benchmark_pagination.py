@@ -0,0 +1,59 @@
+"""
+Compares the latency of fetching a deep page of credit transfers, most recent first:
+  offset: LIMIT/OFFSET, as paginate_query does
+  keyset: id < cursor, as keyset_paginate_query does
+
+Reads from the app database, so it needs at least page * per_page credit transfers to be meaningful.
+Run from the app directory:
+  python ../devtools/benchmark_pagination.py [page] [per_page] [rounds]
+"""
+import sys
+
+from benchmark_utils import create_benchmark_app, summarise, time_rounds
+
+
+def offset_page(connection, page, per_page):
+    return connection.execute(text('''
+        SELECT * FROM credit_transfer ORDER BY id DESC LIMIT :limit OFFSET :offset
+    '''), limit=per_page, offset=(page - 1) * per_page).fetchall()
+
+
+def keyset_page(connection, after_id, per_page):
+    return connection.execute(text('''
+        SELECT * FROM credit_transfer WHERE id < :after_id ORDER BY id DESC LIMIT :limit
+    '''), after_id=after_id, limit=per_page).fetchall()
+
+
+def benchmark(name, fetch, rounds):
+    durations = time_rounds(fetch, rounds)
+
+    print(f'{name:<8} {summarise(durations)}  ({rounds} rounds)')
+
+
+if __name__ == '__main__':
+    app = create_benchmark_app()
+
+    from sqlalchemy import text
+    from server import db
+
+    page = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    with app.app_context():
+        connection = db.engine.connect()
+        try:
+            # The cursor a client would be holding after walking to the page before
+            previous_page = offset_page(connection, page - 1, per_page) if page > 1 else []
+            if page > 1 and not previous_page:
+                sys.exit(f'Fewer than {(page - 1) * per_page} credit transfers, so there is no page {page}')
+            after_id = previous_page[-1]['id'] if previous_page else sys.maxsize
+
+            assert [r['id'] for r in offset_page(connection, page, per_page)] == \
+                   [r['id'] for r in keyset_page(connection, after_id, per_page)]
+
+            print(f'Page {page}, {per_page} per page')
+            benchmark('offset', lambda: offset_page(connection, page, per_page), rounds)
+            benchmark('keyset', lambda: keyset_page(connection, after_id, per_page), rounds)
+        finally:
+            connection.close()
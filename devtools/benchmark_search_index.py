@@ -0,0 +1,97 @@
+"""
+Compares the cost of keeping user search vectors up to date on each user write, as the number of users grows:
+  materialized_view: REFRESH MATERIALIZED VIEW of every user, as the old search_view trigger did on each write
+  incremental:       upsert of just the written user's search_index row (see server.models.search)
+
+Writes to a scratch copy of the user table inside a transaction that is always rolled back.
+Run from the app directory:
+  python ../devtools/benchmark_search_index.py [user_counts] [writes]
+e.g.
+  python ../devtools/benchmark_search_index.py 1000,10000,100000 50
+"""
+import sys
+from time import time
+
+from benchmark_utils import create_benchmark_app, summarise
+
+TSV_SELECT = '''
+    SELECT
+        u.id,
+        to_tsvector(u.email) AS tsv_email,
+        to_tsvector(u._phone) AS tsv_phone,
+        to_tsvector(u.first_name) AS tsv_first_name,
+        to_tsvector(u.last_name) AS tsv_last_name
+    FROM bench_user u
+'''
+
+
+def setup_tables(connection, user_count):
+    connection.execute('''
+        CREATE TEMPORARY TABLE bench_user (
+            id INTEGER PRIMARY KEY, email VARCHAR, _phone VARCHAR, first_name VARCHAR, last_name VARCHAR
+        ) ON COMMIT DROP
+    ''')
+    connection.execute(text('''
+        INSERT INTO bench_user
+        SELECT i, 'user' || i || '@example.com', '+1902555' || i, 'First' || i, 'Last' || i
+        FROM generate_series(1, :user_count) i
+    '''), user_count=user_count)
+
+    connection.execute(f'CREATE MATERIALIZED VIEW bench_search_view AS ({TSV_SELECT})')
+    connection.execute('CREATE UNIQUE INDEX ON bench_search_view (id)')
+
+    connection.execute(f'CREATE TEMPORARY TABLE bench_search_index ON COMMIT DROP AS ({TSV_SELECT})')
+    connection.execute('ALTER TABLE bench_search_index ADD PRIMARY KEY (id)')
+
+
+def write_user(connection, user_id):
+    connection.execute(text('UPDATE bench_user SET first_name = first_name || \'x\' WHERE id = :id'), id=user_id)
+
+
+def materialized_view_write(connection, user_id):
+    write_user(connection, user_id)
+    connection.execute('REFRESH MATERIALIZED VIEW bench_search_view')
+
+
+def incremental_write(connection, user_id):
+    write_user(connection, user_id)
+    connection.execute(text(f'''
+        INSERT INTO bench_search_index {TSV_SELECT} WHERE u.id = :id
+        ON CONFLICT (id) DO UPDATE SET
+            tsv_email = EXCLUDED.tsv_email,
+            tsv_phone = EXCLUDED.tsv_phone,
+            tsv_first_name = EXCLUDED.tsv_first_name,
+            tsv_last_name = EXCLUDED.tsv_last_name
+    '''), id=user_id)
+
+
+def benchmark(name, writer, connection, user_count, writes):
+    durations = []
+    for i in range(writes):
+        start = time()
+        writer(connection, (i % user_count) + 1)
+        durations.append(time() - start)
+
+    print(f'{name:<18} users {user_count:<8} {summarise(durations)}  ({writes} writes)')
+
+
+if __name__ == '__main__':
+    app = create_benchmark_app()
+
+    from sqlalchemy import text
+    from server import db
+
+    user_counts = [int(c) for c in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with app.app_context():
+        for user_count in user_counts:
+            connection = db.engine.connect()
+            transaction = connection.begin()
+            try:
+                setup_tables(connection, user_count)
+                benchmark('materialized_view', materialized_view_write, connection, user_count, writes)
+                benchmark('incremental', incremental_write, connection, user_count, writes)
+            finally:
+                transaction.rollback()
+                connection.close()
@@ -0,0 +1,72 @@
+"""
+Compares the ways the app can wait on read only contract calls made through the eth_worker:
+  polling:    each call sent and then polled for every 0.3 seconds until ready, one after another
+  sequential: each call sent and then waited on through the result backend, one after another
+  batch:      every call sent up front, then gathered together (BlockchainTasker.call_contract_functions)
+
+The contract call cache is bypassed, so that every call makes the round trip to the worker being measured.
+
+Needs a running eth_worker. Run from the app directory:
+  python ../devtools/benchmark_synchronous_calls.py <token_address> [calls_per_round] [rounds]
+"""
+import sys
+from time import sleep
+
+from benchmark_utils import create_benchmark_app, summarise, time_rounds
+
+POLL_INTERVAL = 0.3
+
+
+def polled_call(kwargs, timeout):
+    async_result = task_runner.delay_task(bt._eth_endpoint('call_contract_function'), kwargs)
+    elapsed = 0
+    try:
+        while not async_result.ready():
+            if elapsed > timeout:
+                raise TimeoutError
+            sleep(POLL_INTERVAL)
+            elapsed += POLL_INTERVAL
+        return async_result.get()
+    finally:
+        async_result.forget()
+
+
+def run_polling(calls, timeout):
+    return [polled_call(bt._call_kwargs(**call), timeout) for call in calls]
+
+
+def run_sequential(calls, timeout):
+    return [bt._synchronous_call(**call) for call in calls]
+
+
+def run_batch(calls, timeout):
+    return bt.call_contract_functions(calls, timeout=timeout)
+
+
+def benchmark(name, runner, calls, rounds, timeout):
+    durations = time_rounds(lambda: runner(calls, timeout), rounds)
+
+    print(f'{name:<12} {summarise(durations, unit="s", precision=3)}  ({len(calls)} calls x {rounds} rounds)')
+
+
+if __name__ == '__main__':
+    app = create_benchmark_app()
+
+    from server import bt
+    from server.utils import task_runner
+
+    bt.call_cache.is_cacheable = lambda func: False
+
+    token_address = sys.argv[1]
+    calls_per_round = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    calls = [dict(contract_address=token_address, contract_type='ERC20', func='totalSupply')
+             for _ in range(calls_per_round)]
+
+    with app.app_context():
+        timeout = app.config['SYNCRONOUS_TASK_TIMEOUT'] * calls_per_round
+
+        benchmark('polling', run_polling, calls, rounds, timeout)
+        benchmark('sequential', run_sequential, calls, rounds, timeout)
+        benchmark('batch', run_batch, calls, rounds, timeout)
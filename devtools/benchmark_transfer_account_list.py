@@ -0,0 +1,54 @@
+"""
+Counts the SQL statements and time taken to load and dump a page of transfer accounts with the list schema:
+  default: the relationship loading strategies set on the models
+  summary: TransferAccount.summary_query_options(), as the list endpoints use
+
+Reads from the app database. Run from the app directory:
+  python ../devtools/benchmark_transfer_account_list.py [page_sizes] [rounds]
+e.g.
+  python ../devtools/benchmark_transfer_account_list.py 10,50,200 5
+"""
+import sys
+from time import time
+
+from benchmark_utils import create_benchmark_app, summarise
+
+
+def load_and_dump(options, per_page):
+    # Start from an empty identity map, as a request would
+    db.session.expunge_all()
+    query = TransferAccount.query.options(*options).order_by(TransferAccount.id.desc()).limit(per_page)
+    return transfer_accounts_schema.dump(query.all()).data
+
+
+def benchmark(name, options, per_page, rounds):
+    durations = []
+    counts = []
+    for _ in range(rounds):
+        with count_sql_statements(db.engine) as counter:
+            start = time()
+            dumped = load_and_dump(options, per_page)
+            durations.append(time() - start)
+        counts.append(counter.count)
+
+    print(f'{name:<8} per_page {per_page:<5} accounts {len(dumped):<5} statements {max(counts):<5} '
+          f'{summarise(durations)}  ({rounds} rounds)')
+
+
+if __name__ == '__main__':
+    app = create_benchmark_app()
+
+    from flask import g
+    from server import db
+    from server.models.transfer_account import TransferAccount
+    from server.schemas import transfer_accounts_schema
+    from server.utils.statement_counter import count_sql_statements
+
+    page_sizes = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else [10, 50, 200]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with app.test_request_context():
+        g.show_all = True
+        for per_page in page_sizes:
+            benchmark('default', [], per_page, rounds)
+            benchmark('summary', TransferAccount.summary_query_options(), per_page, rounds)
@@ -0,0 +1,67 @@
+"""
+Times the per hop overhead of the kenya USSD processor:
+  machine: building a transitions.Machine from every transition on each hop, as before, against binding a session
+           and user to KenyaUssdStateMachine's compiled transition table
+  menu:    looking a menu up with a count() and first() query, as before, against UssdMenu.find_by_name's cache
+
+Reads menus from the app database. Run from the app directory:
+  python ../devtools/benchmark_ussd_hop.py [rounds]
+e.g.
+  python ../devtools/benchmark_ussd_hop.py 200
+"""
+import sys
+
+from benchmark_utils import create_benchmark_app, summarise, time_rounds
+
+
+def build_machine(session):
+    machine = Machine(model=object(), states=KenyaUssdStateMachine.states, initial=session.state)
+    machine.add_transitions(KenyaUssdStateMachine.transition_definitions())
+    return machine
+
+
+def bind_machine(session):
+    return KenyaUssdStateMachine(session, None)
+
+
+def query_menu(name):
+    menus = UssdMenu.query.filter_by(name=name)
+    if menus.count() == 0:
+        return UssdMenu.query.filter_by(name='exit_invalid_request').first()
+    return menus.first()
+
+
+def cached_menu(name):
+    return UssdMenu.find_by_name(name)
+
+
+def benchmark(name, func, arg, rounds):
+    with count_sql_statements(db.engine) as counter:
+        durations = time_rounds(lambda: func(arg), rounds)
+
+    print(f'{name:<14} {summarise(durations, precision=3)}  statements/hop {counter.count / rounds:.2f}  '
+          f'({rounds} rounds)')
+
+
+if __name__ == '__main__':
+    app = create_benchmark_app()
+
+    from transitions import Machine
+    from server import db
+    from server.models.ussd import UssdMenu, UssdSession
+    from server.utils.statement_counter import count_sql_statements
+    from server.utils.ussd.kenya_ussd_state_machine import KenyaUssdStateMachine
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with app.app_context():
+        session = UssdSession(state='start')
+
+        benchmark('build machine', build_machine, session, rounds)
+        benchmark('bind machine', bind_machine, session, rounds)
+
+        # Warm the cache, as every hop after the first in a process would find it
+        cached_menu('start')
+
+        benchmark('query menu', query_menu, 'start', rounds)
+        benchmark('cached menu', cached_menu, 'start', rounds)
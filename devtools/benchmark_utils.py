@@ -0,0 +1,49 @@
+"""
+Scaffolding shared by the benchmark scripts in this directory, which are run from the app or eth_worker directory:
+  python ../devtools/benchmark_<name>.py
+Importing it puts the repo root (for config) and the directory it's run from on the path.
+"""
+import os
+import sys
+from time import time
+from statistics import mean, median
+
+parent_dir = os.path.abspath(os.path.join(os.getcwd(), ".."))
+sys.path.append(parent_dir)
+sys.path.append(os.getcwd())
+
+
+def create_benchmark_app():
+    """
+    Loads the app's config and secrets and creates the app, for benchmarks run from the app directory
+    """
+    import init
+    init.init()
+
+    from server import create_app
+    return create_app()
+
+
+def time_rounds(func, rounds):
+    """
+    :return: list of how long each of rounds calls of func took, in seconds
+    """
+    durations = []
+    for _ in range(rounds):
+        start = time()
+        func()
+        durations.append(time() - start)
+    return durations
+
+
+def summarise(durations, unit='ms', precision=2):
+    """
+    :param durations: list of durations in seconds
+    :param unit: 'ms' or 's'
+    :return: mean, median and max of the durations, for printing
+    """
+    scale = 1000 if unit == 'ms' else 1
+    return '  '.join(
+        f'{name} {value * scale:.{precision}f}{unit}'
+        for name, value in [('mean', mean(durations)), ('median', median(durations)), ('max', max(durations))]
+    )
@@ -20,6 +20,9 @@ elif [ "$CONTAINER_TYPE" == 'LOW_PRIORITY_WORKER' ]; then
 elif [ "$CONTAINER_TYPE" == 'HIGH_PRIORITY_WORKER' ]; then
   echo "Starting High Priority Worker"
   celery -A eth_manager worker --loglevel=INFO --concurrency=$WORKER_CONCURRENCY --pool=eventlet -Q=high-priority --without-gossip --without-mingle
+elif [ "$CONTAINER_TYPE" == 'BLOCK_FOLLOWER' ]; then
+  echo "Starting Block Follower"
+  python -m eth_manager.block_follower
 elif [ "$CONTAINER_TYPE" == 'FLOWER' ]; then
   flower -A worker --port=5555
 elif [ "$CONTAINER_TYPE" == 'ANY_PRIORITY_WORKER' ]; then
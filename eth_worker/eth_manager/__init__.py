@@ -65,8 +65,24 @@ celery_app.conf.beat_schedule = {
         "task": utils.eth_endpoint('topup_wallets'),
         "schedule": 600.0
     },
+    "check_nonce_gaps": {
+        "task": utils.eth_endpoint('check_nonce_gaps'),
+        "schedule": 120.0
+    },
 }
 
+if config.WALLET_POOL_SIZE > 0:
+    celery_app.conf.beat_schedule["replenish_wallet_pool"] = {
+        "task": utils.eth_endpoint('replenish_wallet_pool'),
+        "schedule": 30.0
+    }
+
+if config.ETH_USE_BLOCK_FOLLOWER:
+    celery_app.conf.beat_schedule["sweep_pending_transactions"] = {
+        "task": utils.eth_endpoint('sweep_pending_transactions'),
+        "schedule": 60.0
+    }
+
 w3 = Web3(HTTPProvider(config.ETH_HTTP_PROVIDER))
 
 red = redis.Redis.from_url(config.REDIS_URL)
@@ -107,6 +123,9 @@ if os.environ.get('CONTAINER_TYPE') == 'PRIMARY':
         allow_existing=True
     )
 
+    # Chain or DB state may have moved on while we were down, so reconcile nonces on their next claim
+    persistence_interface.invalidate_all_nonce_allocations()
+
 
 def register_tokens_from_app(host_address, auth_username, auth_password):
     token_req = requests.get(host_address + '/api/token', auth=HTTPBasicAuth(auth_username, auth_password))
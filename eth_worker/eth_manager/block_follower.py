@@ -0,0 +1,100 @@
+from time import sleep
+
+LAST_BLOCK_KEY = 'BlockFollower-LastBlock'
+POLL_INTERVAL_SECONDS = 1
+
+# Recent blocks are read again on every poll, to catch transactions whose hash was saved after they were mined
+RESCAN_DEPTH = 5
+
+
+class BlockFollower(object):
+    """
+    Resolves transaction receipts by reading each new block once, instead of scheduling a polling task per
+    transaction. The transaction hashes in each block are matched against the PENDING blockchain transactions,
+    and every match is resolved in a single batch update.
+
+    The last processed block is kept in redis so that a restarted follower catches up on any blocks it missed.
+    The most recent blocks are read again on each poll, and anything older that's still PENDING is left to
+    TransactionProcessor.sweep_pending_transactions.
+    """
+
+    def process_block(self, block_number):
+        block = self.w3.eth.getBlock(block_number)
+
+        if block is None:
+            return []
+
+        transaction_hashes = [transaction_hash.hex() for transaction_hash in block.transactions]
+
+        transactions = self.persistence_interface.get_pending_transactions_by_hash(transaction_hashes)
+
+        if transactions:
+            print(f'Block {block_number}: resolving {len(transactions)} transactions')
+            self.processor.resolve_transaction_receipts(transactions)
+
+        return transactions
+
+    def get_last_processed_block(self):
+        last_block = self.red.get(LAST_BLOCK_KEY)
+        if last_block is None:
+            return None
+
+        return int(last_block)
+
+    def set_last_processed_block(self, block_number):
+        self.red.set(LAST_BLOCK_KEY, block_number)
+
+    def process_new_blocks(self):
+        """
+        Processes every block since the last one processed, up to and including the latest block, along with the
+        rescan_depth blocks before them.
+        :return: the number of new blocks processed
+        """
+
+        latest_block = self.w3.eth.blockNumber
+
+        last_processed = self.get_last_processed_block()
+        if last_processed is None:
+            last_processed = latest_block - 1
+
+        first_block = max(min(last_processed + 1, latest_block - self.rescan_depth + 1), 0)
+
+        processed = 0
+        for block_number in range(first_block, latest_block + 1):
+            try:
+                self.process_block(block_number)
+            finally:
+                self.persistence_interface.session.remove()
+
+            if block_number > last_processed:
+                self.set_last_processed_block(block_number)
+                processed += 1
+
+        return processed
+
+    def run(self):
+        print('Starting block follower')
+
+        while True:
+            try:
+                self.process_new_blocks()
+            except Exception as e:
+                # The failed block isn't marked as processed, so it will be retried on the next poll
+                print(e)
+
+            sleep(self.poll_interval)
+
+    def __init__(self, w3, red, persistence_interface, processor,
+                 poll_interval=POLL_INTERVAL_SECONDS, rescan_depth=RESCAN_DEPTH):
+        self.w3 = w3
+        self.red = red
+        self.persistence_interface = persistence_interface
+        self.processor = processor
+        self.poll_interval = poll_interval
+        self.rescan_depth = rescan_depth
+
+
+if __name__ == '__main__':
+    from eth_manager import w3, red, persistence_interface, blockchain_processor
+
+    BlockFollower(w3, red, persistence_interface, blockchain_processor).run()
@@ -112,10 +112,33 @@ def create_new_blockchain_wallet(self, wei_target_balance=0, wei_topup_threshold
     return wallet.address
 
 
+# Set retry attempts to zero since beat will replenish again shortly anyway
+@celery_app.task(**{**low_priority_config, 'max_retries': 0})
+def replenish_wallet_pool(self):
+    return eth_manager.task_interfaces.composite.replenish_wallet_pool()
+
+
+# Set retry attempts to zero since beat will check again shortly anyway
+@celery_app.task(**{**low_priority_config, 'max_retries': 0})
+def check_nonce_gaps(self):
+    return blockchain_processor.check_nonce_gaps()
+
+
+# Set retry attempts to zero since beat will sweep again shortly anyway
+@celery_app.task(**{**low_priority_config, 'max_retries': 0})
+def sweep_pending_transactions(self):
+    return blockchain_processor.sweep_pending_transactions()
+
+
 @celery_app.task(**low_priority_config)
 def topup_wallets(self):
     return eth_manager.task_interfaces.composite.topup_wallets()
 
+
+@celery_app.task(**base_task_config)
+def get_topup_wallets_metrics(self):
+    return eth_manager.task_interfaces.composite.get_topup_wallets_metrics()
+
 # Set retry attempts to zero since beat will retry shortly anyway
 @celery_app.task(**no_retry_config)
 def topup_wallet_if_required(self, address):
@@ -147,6 +170,24 @@ def transact_with_contract_function(self, contract_address, function,  abi_type=
                                                                 gas_limit, prior_tasks, reverses_task)
 
 
+@celery_app.task(**base_task_config)
+def transact_with_contract_function_batch(self, contract_address, function, calls, abi_type=None,
+                                          signing_address=None, encrypted_private_key=None, gas_limit=None):
+
+    return blockchain_processor.transact_with_contract_function_batch(self.request.id,
+                                                                      contract_address, abi_type, function, calls,
+                                                                      signing_address, encrypted_private_key,
+                                                                      gas_limit)
+
+
+@celery_app.task(**base_task_config)
+def send_eth_batch(self, sends, signing_address=None, encrypted_private_key=None):
+
+    return blockchain_processor.send_eth_batch(self.request.id,
+                                               sends,
+                                               signing_address, encrypted_private_key)
+
+
 @celery_app.task(**base_task_config)
 def deploy_contract(self, contract_name, args=None, kwargs=None,
                     signing_address=None, encrypted_private_key=None,
@@ -179,8 +220,8 @@ def retry_failed(self, min_task_id=None, max_task_id=None, retry_unstarted=False
     return blockchain_processor.retry_failed(min_task_id, max_task_id, retry_unstarted)
 
 @celery_app.task(**no_retry_config)
-def deduplicate(self, min_task_id, max_task_id):
-    return eth_manager.task_interfaces.composite.deduplicate(min_task_id, max_task_id)
+def deduplicate(self, min_task_id, max_task_id, dry_run=False):
+    return eth_manager.task_interfaces.composite.deduplicate(min_task_id, max_task_id, dry_run)
 
 
 @celery_app.task(**base_task_config)
@@ -193,6 +234,11 @@ def _attempt_transaction(self, task_uuid):
     return blockchain_processor.attempt_transaction(task_uuid)
 
 
+@celery_app.task(**base_task_config)
+def _attempt_batch(self, batch_uuid):
+    return blockchain_processor.attempt_batch(batch_uuid)
+
+
 @celery_app.task(**processor_task_config)
 def _process_send_eth_transaction(self, transaction_id, recipient_address, amount, task_id=None):
     return blockchain_processor.process_send_eth_transaction(transaction_id, recipient_address, amount, task_id)
@@ -204,6 +250,10 @@ def _process_function_transaction(self, transaction_id, contract_address, abi_ty
     return blockchain_processor.process_function_transaction(transaction_id, contract_address, abi_type,
                                                              function, args, kwargs, gas_limit, task_id)
 
+@celery_app.task(**processor_task_config)
+def _process_function_transaction_batch(self, transaction_ids):
+    return blockchain_processor.process_function_transaction_batch(transaction_ids)
+
 @celery_app.task(**processor_task_config)
 def _process_deploy_contract_transaction(self, transaction_id, contract_name,
                                          args=None, kwargs=None,  gas_limit=None, task_id=None):
@@ -216,6 +266,16 @@ def _check_transaction_response(self, transaction_id):
     return blockchain_processor.check_transaction_response(self, transaction_id)
 
 
+@celery_app.task(base=SqlAlchemyTask, bind=True, max_retries=config.ETH_CHECK_TRANSACTION_RETRIES, soft_time_limit=300)
+def _check_transaction_batch_response(self, transaction_ids):
+    return blockchain_processor.check_transaction_batch_response(self, transaction_ids)
+
+
 @celery_app.task(base=SqlAlchemyTask)
 def _log_error(request, exc, traceback, transaction_id):
     return blockchain_processor.log_error(request, exc, traceback, transaction_id)
+
+
+@celery_app.task(base=SqlAlchemyTask)
+def _log_batch_error(request, exc, traceback, transaction_ids):
+    return blockchain_processor.log_batch_error(request, exc, traceback, transaction_ids)
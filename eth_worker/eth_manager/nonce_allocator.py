@@ -0,0 +1,107 @@
+from typing import Optional
+
+# Hands out the next nonce for a wallet in a single round trip. Nonces that were claimed but never made it
+# to the chain are returned to a per-wallet sorted set of gaps and are always reused before the counter moves on.
+CLAIM_NONCE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local gap = redis.call('ZPOPMIN', KEYS[2])
+if gap[1] then
+    return tonumber(gap[1])
+end
+return redis.call('INCR', KEYS[1]) - 1
+"""
+
+# As above, but hands out a block of nonces for a batch of transactions in one call. Returns an empty list if
+# the counter needs to be reconciled first.
+CLAIM_NONCES_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+end
+local count = tonumber(ARGV[1])
+local nonces = {}
+while #nonces < count do
+    local gap = redis.call('ZPOPMIN', KEYS[2])
+    if not gap[1] then
+        break
+    end
+    table.insert(nonces, tonumber(gap[1]))
+end
+local remaining = count - #nonces
+if remaining > 0 then
+    local last = redis.call('INCRBY', KEYS[1], remaining)
+    for nonce = last - remaining, last - 1 do
+        table.insert(nonces, nonce)
+    end
+end
+return nonces
+"""
+
+
+class NonceAllocator(object):
+    """
+    Atomic per-wallet nonce allocation backed by Redis.
+
+    The counter holds the next unused nonce for each signing address. It is seeded from chain and database state
+    by the persistence interface (see SQLPersistenceInterface.reconcile_nonce), and only re-seeded when the
+    counter is missing (ie on startup) or has been invalidated because a gap was detected.
+    """
+
+    def _counter_key(self, address):
+        return f'NonceCounter-{address}'
+
+    def _gaps_key(self, address):
+        return f'NonceGaps-{address}'
+
+    def claim(self, address) -> Optional[int]:
+        """
+        :return: the claimed nonce, or None if the counter for this address needs to be reconciled first
+        """
+        nonce = self._claim_script(keys=[self._counter_key(address), self._gaps_key(address)])
+
+        if nonce < 0:
+            return None
+
+        return nonce
+
+    def claim_many(self, address, count) -> Optional[list]:
+        """
+        :return: a list of count claimed nonces, or None if the counter for this address needs to be reconciled
+        """
+        nonces = self._claim_many_script(keys=[self._counter_key(address), self._gaps_key(address)], args=[count])
+
+        if not nonces:
+            return None
+
+        return [int(n) for n in nonces]
+
+    def release(self, address, nonce):
+        """
+        Return a nonce that was claimed but not consumed on chain, so the next claim reuses it
+        """
+        self.red.zadd(self._gaps_key(address), {str(nonce): nonce})
+
+    def reset(self, address, next_nonce, gaps=None):
+        pipe = self.red.pipeline()
+        pipe.set(self._counter_key(address), next_nonce)
+        pipe.delete(self._gaps_key(address))
+        if gaps:
+            pipe.zadd(self._gaps_key(address), {str(n): n for n in gaps})
+        pipe.execute()
+
+    def invalidate(self, address):
+        self.red.delete(self._counter_key(address), self._gaps_key(address))
+
+    def invalidate_all(self):
+        for pattern in [self._counter_key('*'), self._gaps_key('*')]:
+            for key in self.red.scan_iter(match=pattern):
+                self.red.delete(key)
+
+    def is_initialised(self, address):
+        return bool(self.red.exists(self._counter_key(address)))
+
+    def __init__(self, red):
+        self.red = red
+        self._claim_script = red.register_script(CLAIM_NONCE_SCRIPT)
+        self._claim_many_script = red.register_script(CLAIM_NONCES_SCRIPT)
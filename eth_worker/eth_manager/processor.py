@@ -18,6 +18,15 @@ RETRY_TRANSACTION_BASE_TIME = 2
 ETH_CHECK_TRANSACTION_BASE_TIME = 2
 ETH_CHECK_TRANSACTION_RETRIES_TIME_LIMIT = 4
 
+# How long a transaction can go without being resolved by the block follower before its receipt is checked directly
+PENDING_RECEIPT_SWEEP_AGE_SECONDS = 120
+
+# How long the lowest PENDING nonce of a wallet can go unmined before the wallet's nonces are treated as having a gap
+NONCE_GAP_AGE_SECONDS = 300
+
+# Node error messages that indicate the nonce we sent with doesn't line up with the chain
+NONCE_ERROR_FRAGMENTS = ['nonce too low', 'known transaction', 'replacement transaction underpriced']
+
 class TransactionProcessor(object):
 
     def private_key_to_address(self, private_key):
@@ -45,7 +54,7 @@ class TransactionProcessor(object):
 
         return gas_price
 
-    def topup_if_required(self, wallet, posterior_task_uuid):
+    def topup_if_required(self, wallet, posterior_task_uuids):
         balance = self.w3.eth.getBalance(wallet.address)
 
         wei_topup_threshold = wallet.wei_topup_threshold
@@ -58,7 +67,7 @@ class TransactionProcessor(object):
                                 'amount_wei': wei_target_balance - balance,
                                 'recipient_address': wallet.address,
                                 'prior_tasks': [],
-                                'posterior_tasks': [posterior_task_uuid]
+                                'posterior_tasks': posterior_task_uuids
                             })
 
             task_uuid = utils.execute_task(sig)
@@ -88,8 +97,8 @@ class TransactionProcessor(object):
                 return argument.get('data').encode()
         return argument
 
-    def process_function_transaction(self, transaction_id, contract_address, abi_type,
-                                     function_name, args=None, kwargs=None, gas_limit=None, task_id=None):
+    def bind_contract_function(self, transaction_id, contract_address, abi_type,
+                               function_name, args=None, kwargs=None, task_id=None):
 
         args = args or tuple()
         if not isinstance(args, (list, tuple)):
@@ -105,10 +114,93 @@ class TransactionProcessor(object):
 
         function = self.registry.get_contract_function(contract_address, function_name, abi_type)
 
-        bound_function = function(*args, **kwargs)
+        return function(*args, **kwargs)
+
+    def process_function_transaction(self, transaction_id, contract_address, abi_type,
+                                     function_name, args=None, kwargs=None, gas_limit=None, task_id=None):
+
+        bound_function = self.bind_contract_function(transaction_id, contract_address, abi_type,
+                                                     function_name, args, kwargs, task_id)
 
         return self.process_transaction(transaction_id, bound_function, gas_limit=gas_limit)
 
+    def process_function_transaction_batch(self, transaction_ids):
+        """
+        Sends a batch of function or send eth transactions from the same signing wallet, claiming all of their nonces
+        at once. Any transaction that fails to send falls back to being retried individually.
+
+        :param transaction_ids: ids of the transactions in the batch
+        :return: ids of the transactions that were sent
+        """
+
+        if not transaction_ids:
+            return []
+
+        signing_wallet_obj = self.persistence_interface.get_transaction_signing_wallet(transaction_ids[0])
+
+        prepared = []
+        for transaction_id in transaction_ids:
+            try:
+                task = self.persistence_interface.get_transaction(transaction_id).task
+
+                if task.type == 'SEND_ETH':
+                    print(f'\n##Tx {transaction_id}, task {task.id}: Sending Eth \n'
+                          f'to: {task.recipient_address} \n'
+                          f'amount: {int(task.amount)}')
+
+                    partial_txn_dict = {'to': task.recipient_address, 'value': int(task.amount)}
+
+                    prepared.append((transaction_id, None, partial_txn_dict, 100000, 100000))
+                    continue
+
+                bound_function = self.bind_contract_function(transaction_id, task.contract_address, task.abi_type,
+                                                             task.function, task.args, task.kwargs, task.id)
+
+                gas = task.gas_limit or self.estimate_gas(bound_function, signing_wallet_obj, self.gas_price)
+
+                prepared.append((transaction_id, bound_function, None, gas, task.gas_limit))
+
+            except Exception as e:
+                self.fail_batched_transaction(transaction_id, e)
+
+        claimed_nonces = self.persistence_interface.claim_transaction_nonces(
+            signing_wallet_obj, [transaction_id for transaction_id, _, _, _, _ in prepared]
+        )
+        nonces_by_transaction_id = {transaction_id: nonce for nonce, transaction_id in claimed_nonces}
+
+        sent_transaction_ids = []
+        for transaction_id, bound_function, partial_txn_dict, gas, gas_limit in prepared:
+            try:
+                self.send_transaction(transaction_id,
+                                      signing_wallet_obj,
+                                      nonces_by_transaction_id[transaction_id],
+                                      gas, self.gas_price,
+                                      unbuilt_transaction=bound_function,
+                                      partial_txn_dict=partial_txn_dict,
+                                      gas_limit=gas_limit)
+
+                sent_transaction_ids.append(transaction_id)
+
+            except Exception as e:
+                self.fail_batched_transaction(transaction_id, e)
+
+        return sent_transaction_ids
+
+    def fail_batched_transaction(self, transaction_id, exc):
+        # Unlike a single transaction we can't raise here without losing the rest of the batch,
+        # so log and hand the task back to the regular retry path
+        print(f'Batched transaction {transaction_id} failed: {exc}')
+
+        self.log_error(None, exc, None, transaction_id)
+
+        self.persistence_interface.release_transaction_nonce(transaction_id)
+
+        transaction_object = self.persistence_interface.get_transaction(transaction_id)
+        try:
+            self.new_transaction_attempt(transaction_object.task)
+        except TaskRetriesExceededError:
+            pass
+
     def process_deploy_contract_transaction(self, transaction_id, contract_name,
                                             args=None, kwargs=None, gas_limit=None, task_id=None):
 
@@ -128,6 +220,78 @@ class TransactionProcessor(object):
 
         return self.process_transaction(transaction_id, constructor, gas_limit=gas_limit)
 
+    def estimate_gas(self, unbuilt_transaction, signing_wallet_obj, gas_price):
+        try:
+            return unbuilt_transaction.estimateGas({
+                'from': signing_wallet_obj.address,
+                'gasPrice': gas_price
+            })
+        except ValueError as e:
+            print("Estimate Gas Failed. Remedy by specifying gas limit.")
+
+            raise e
+
+    def send_transaction(self,
+                         transaction_id,
+                         signing_wallet_obj,
+                         nonce,
+                         gas,
+                         gas_price,
+                         unbuilt_transaction=None,
+                         partial_txn_dict=None,
+                         gas_limit=None):
+
+        chainId = self.ethereum_chain_id
+
+        metadata = {
+            'gas': gas_limit or min(int(gas*1.2), 8000000),
+            'gasPrice': gas_price,
+            'nonce': nonce
+        }
+
+        if chainId:
+            metadata['chainId'] = chainId
+
+        if unbuilt_transaction:
+            txn = unbuilt_transaction.buildTransaction(metadata)
+        else:
+            txn = {**metadata, **partial_txn_dict}
+
+        signed_txn = self.w3.eth.account.signTransaction(txn, private_key=signing_wallet_obj.private_key)
+
+        # Saved before broadcasting, since the transaction can be mined (and seen by the block follower)
+        # before sendRawTransaction returns
+        transaction_data = {
+            'hash': signed_txn.hash.hex(),
+            'nonce': nonce,
+            'submitted_date': str(datetime.datetime.utcnow())
+        }
+
+        print('***************Data for transaction {}:***************'.format(transaction_id))
+        print(transaction_data)
+
+        self.persistence_interface.update_transaction_data(transaction_id, transaction_data)
+
+        try:
+            print('@@@@@@@@@@@@@@ tx {} using nonce {} @@@@@@@@@@@@@@'.format(transaction_id, nonce))
+
+            result = self.w3.eth.sendRawTransaction(signed_txn.rawTransaction)
+
+        except ValueError as e:
+
+            if self.is_nonce_error(e):
+                # Our allocated nonces have drifted from the chain, so reconcile before the next claim
+                self.persistence_interface.invalidate_nonce_allocation(signing_wallet_obj)
+
+            message = f'Transaction {transaction_id}: {str(e)}'
+            exc = PreBlockchainError(message, False)
+            self.log_error(None, exc, None, transaction_id)
+
+            raise PreBlockchainError(message, True)
+
+        # If we've made it this far, the nonce will(?) be consumed
+        self.persistence_interface.update_transaction_data(transaction_id, {'nonce_consumed': True})
+
     def process_transaction(self,
                             transaction_id,
                             unbuilt_transaction=None,
@@ -137,7 +301,6 @@ class TransactionProcessor(object):
 
         try:
 
-            chainId = self.ethereum_chain_id
             gasPrice = gas_price or self.gas_price
             # gasPrice = gas_price or self.get_gas_price()
 
@@ -146,66 +309,27 @@ class TransactionProcessor(object):
             if gas_limit:
                 gas = gas_limit
             else:
-                try:
-                    gas = unbuilt_transaction.estimateGas({
-                        'from': signing_wallet_obj.address,
-                        'gasPrice': gasPrice
-                    })
-                except ValueError as e:
-                    print("Estimate Gas Failed. Remedy by specifying gas limit.")
-
-                    raise e
+                gas = self.estimate_gas(unbuilt_transaction, signing_wallet_obj, gasPrice)
 
-            nonce, transaction_id = self.persistence_interface.locked_claim_transaction_nonce(
+            nonce, transaction_id = self.persistence_interface.claim_transaction_nonce(
                 signing_wallet_obj, transaction_id
             )
 
-            metadata = {
-                'gas': gas_limit or min(int(gas*1.2), 8000000),
-                'gasPrice': gasPrice,
-                'nonce': nonce
-            }
-
-            if chainId:
-                metadata['chainId'] = chainId
-
-            if unbuilt_transaction:
-                txn = unbuilt_transaction.buildTransaction(metadata)
-            else:
-                txn = {**metadata, **partial_txn_dict}
-
-            signed_txn = self.w3.eth.account.signTransaction(txn, private_key=signing_wallet_obj.private_key)
-
-            try:
-                print('@@@@@@@@@@@@@@ tx {} using nonce {} @@@@@@@@@@@@@@'.format(transaction_id, nonce))
-
-                result = self.w3.eth.sendRawTransaction(signed_txn.rawTransaction)
-
-            except ValueError as e:
-
-                message = f'Transaction {transaction_id}: {str(e)}'
-                exc = PreBlockchainError(message, False)
-                self.log_error(None, exc, None, transaction_id)
-
-                raise PreBlockchainError(message, True)
-
-            # If we've made it this far, the nonce will(?) be consumed
-            transaction_data = {
-                'hash': signed_txn.hash.hex(),
-                'nonce': nonce,
-                'submitted_date': str(datetime.datetime.utcnow()),
-                'nonce_consumed': True
-            }
-
-            print('***************Data for transaction {}:***************'.format(transaction_id))
-            print(transaction_data)
-
-            self.persistence_interface.update_transaction_data(transaction_id, transaction_data)
+            self.send_transaction(transaction_id,
+                                  signing_wallet_obj,
+                                  nonce,
+                                  gas, gasPrice,
+                                  unbuilt_transaction=unbuilt_transaction,
+                                  partial_txn_dict=partial_txn_dict,
+                                  gas_limit=gas_limit)
 
             return transaction_id
 
         except Exception as e:
 
+            # The transaction never reached the chain, so any nonce it claimed can be reused
+            self.persistence_interface.release_transaction_nonce(transaction_id)
+
             # Attempt a new transaction if there's any error, but still raise
             transaction_object = self.persistence_interface.get_transaction(transaction_id)
             try:
@@ -215,6 +339,10 @@ class TransactionProcessor(object):
 
             raise e
 
+    def is_nonce_error(self, error):
+        message = str(error).lower()
+        return any(fragment in message for fragment in NONCE_ERROR_FRAGMENTS)
+
     def get_unstarted_posteriors(self, task):
 
         unstarted_posteriors = []
@@ -240,44 +368,144 @@ class TransactionProcessor(object):
             return t(celery_task.request.retries)
 
         try:
-            transaction_object = self.persistence_interface.get_transaction(transaction_id)
+            status = self.resolve_transaction_response(transaction_id)
 
-            task = transaction_object.task
+            if status == 'PENDING':
+                celery_task.request.retries = 0
+                raise Exception("Need Retry")
 
-            transaction_hash = transaction_object.hash
+        except TaskRetriesExceededError as e:
+            pass
 
-            result = self.check_transaction_hash(transaction_hash)
+        except Exception as e:
+            print(e)
+            celery_task.retry(countdown=transaction_response_countdown())
 
-            self.persistence_interface.update_transaction_data(transaction_id, result)
+    def check_transaction_batch_response(self, celery_task, transaction_ids):
+        """
+        Checks the receipts for a batch of transactions in one task, rather than a polling task per transaction.
+        Only the transactions still pending are carried into the retry.
+        """
 
-            status = result.get('status')
+        still_pending = []
+        for transaction_id in transaction_ids or []:
+            try:
+                status = self.resolve_transaction_response(transaction_id)
 
-            print(f'Status for transaction {transaction_object.id} of task UUID {task.uuid} is:'
-            f'\n {status}')
+                if status == 'PENDING':
+                    still_pending.append(transaction_id)
 
-            if status == 'SUCCESS':
+            except TaskRetriesExceededError as e:
+                pass
 
-                unstarted_posteriors = self.get_unstarted_posteriors(task)
+            except Exception as e:
+                print(e)
+                still_pending.append(transaction_id)
 
-                for dep_task in unstarted_posteriors:
-                    print('Starting posterior task: {}'.format(dep_task.uuid))
-                    signature(utils.eth_endpoint('_attempt_transaction'), args=(dep_task.uuid,)).delay()
+        if still_pending:
+            celery_task.request.retries = 0
+            celery_task.retry(args=(still_pending,), countdown=ETH_CHECK_TRANSACTION_BASE_TIME)
 
-                self.persistence_interface.set_task_status_text(task, 'SUCCESS')
+    def resolve_transaction_response(self, transaction_id):
+        transaction_object = self.persistence_interface.get_transaction(transaction_id)
 
-            if status == 'PENDING':
-                celery_task.request.retries = 0
-                raise Exception("Need Retry")
+        task = transaction_object.task
 
-            if status == 'FAILED':
-                self.new_transaction_attempt(task)
+        transaction_hash = transaction_object.hash
 
-        except TaskRetriesExceededError as e:
-            pass
+        result = self.check_transaction_hash(transaction_hash)
 
-        except Exception as e:
-            print(e)
-            celery_task.retry(countdown=transaction_response_countdown())
+        self.persistence_interface.update_transaction_data(transaction_id, result)
+
+        status = result.get('status')
+
+        print(f'Status for transaction {transaction_object.id} of task UUID {task.uuid} is:'
+        f'\n {status}')
+
+        if status == 'SUCCESS':
+            self.persistence_interface.set_task_status_text(task, 'SUCCESS')
+
+        self.handle_task_outcome(task, status)
+
+        return status
+
+    def handle_task_outcome(self, task, status):
+        if status == 'SUCCESS':
+
+            unstarted_posteriors = self.get_unstarted_posteriors(task)
+
+            for dep_task in unstarted_posteriors:
+                print('Starting posterior task: {}'.format(dep_task.uuid))
+                signature(utils.eth_endpoint('_attempt_transaction'), args=(dep_task.uuid,)).delay()
+
+        if status == 'FAILED':
+            self.new_transaction_attempt(task)
+
+    def resolve_transaction_receipts(self, transactions):
+        """
+        Resolves a set of transactions that are known to have been included in a block, such as those
+        matched by the block follower. All of the receipt results are written in a single commit.
+        """
+
+        results = {}
+        for transaction in transactions:
+            results[transaction.id] = self.check_transaction_hash(transaction.hash)
+
+        self.persistence_interface.resolve_transactions(results)
+
+        for transaction in transactions:
+            status = results[transaction.id].get('status')
+
+            print(f'Status for transaction {transaction.id} of task UUID {transaction.task.uuid} is:'
+                  f'\n {status}')
+
+            try:
+                self.handle_task_outcome(transaction.task, status)
+            except TaskRetriesExceededError:
+                pass
+
+        return results
+
+    def check_nonce_gaps(self):
+        """
+        Looks for wallets whose chain nonce hasn't moved past their lowest PENDING nonce for a while. This is what
+        happens when a claimed nonce is never sent, for example because a worker died between claiming it and
+        broadcasting, and every later transaction from the wallet queues behind it on chain without an error.
+        :return: the addresses of the wallets found with a gap
+        """
+
+        updated_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=NONCE_GAP_AGE_SECONDS)
+
+        gapped_addresses = []
+        for wallet, lowest_pending_nonce in self.persistence_interface.get_lowest_stale_pending_nonces(updated_before):
+            chain_nonce = self.w3.eth.getTransactionCount(wallet.address, block_identifier='latest')
+
+            # A chain nonce past the lowest pending one means it was mined, and only the receipt is outstanding
+            if chain_nonce <= lowest_pending_nonce:
+                print(f'Nonce gap for {wallet.address}: chain is at {chain_nonce}, '
+                      f'lowest pending nonce is {lowest_pending_nonce}')
+
+                self.persistence_interface.resolve_nonce_gap(wallet)
+                gapped_addresses.append(wallet.address)
+
+        return gapped_addresses
+
+    def sweep_pending_transactions(self):
+        """
+        Checks the receipts of transactions that have been PENDING for a while, in case the block follower
+        missed them. Only used with the block follower, since otherwise every transaction has its own receipt polling.
+        :return: the number of transactions resolved
+        """
+
+        submitted_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=PENDING_RECEIPT_SWEEP_AGE_SECONDS)
+
+        transactions = self.persistence_interface.get_unresolved_pending_transactions(submitted_before)
+        if not transactions:
+            return 0
+
+        results = self.resolve_transaction_receipts(transactions)
+
+        return len([result for result in results.values() if result.get('status') != 'PENDING'])
 
     def check_transaction_hash(self, tx_hash):
 
@@ -336,7 +564,7 @@ class TransactionProcessor(object):
                 [f'{u.id} ({u.uuid})' for u in unsatisfied_prior_tasks]))
             return
 
-        topup_uuid = self.topup_if_required(task.signing_wallet, task_uuid)
+        topup_uuid = self.topup_if_required(task.signing_wallet, [task_uuid])
         if topup_uuid:
             print(f'Skipping {task.id}: Topup required')
             return
@@ -351,7 +579,7 @@ class TransactionProcessor(object):
         try:
             have_lock = lock.acquire(blocking_timeout=1)
             if have_lock:
-                current_status = task.status
+                current_status = self.persistence_interface.get_current_task_status(task)
                 if current_status in ['SUCCESS', 'PENDING']:
                     print(f'Skipping {task.id}: task status is currently {current_status}')
                     return
@@ -406,9 +634,84 @@ class TransactionProcessor(object):
         else:
             raise Exception(f"Task type {task_object.type} not recognised")
 
+        error_callback = signature(utils.eth_endpoint('_log_error'), args=(transaction_obj.id,))
+
+        if config.ETH_USE_BLOCK_FOLLOWER:
+            # The block follower picks up the receipt once the transaction is mined
+            return chain1.on_error(error_callback).delay()
+
         chain2 = signature(utils.eth_endpoint('_check_transaction_response'))
 
-        error_callback = signature(utils.eth_endpoint('_log_error'), args=(transaction_obj.id,))
+        return chain([chain1, chain2]).on_error(error_callback).delay()
+
+    def attempt_batch(self, batch_uuid):
+        """
+        Attempts every ready task in a batch as a single unit: one processing task sends all of the transactions
+        with a block of nonces, and one checking task follows their receipts.
+        Tasks waiting on prior tasks are left to be started individually once those succeed.
+        """
+
+        tasks = self.persistence_interface.get_tasks_from_batch_uuid(batch_uuid)
+
+        ready_tasks = []
+        for task in tasks:
+            unsatisfied_prior_tasks = self.get_unsatisfied_prior_tasks(task)
+            if len(unsatisfied_prior_tasks) > 0:
+                print('Skipping {}: prior tasks {} unsatisfied'.format(
+                    task.id,
+                    [f'{u.id} ({u.uuid})' for u in unsatisfied_prior_tasks]))
+                continue
+
+            ready_tasks.append(task)
+
+        if not ready_tasks:
+            return
+
+        topup_uuid = self.topup_if_required(ready_tasks[0].signing_wallet, [t.uuid for t in ready_tasks])
+        if topup_uuid:
+            print(f'Skipping batch {batch_uuid}: Topup required')
+            return
+
+        # Same mutex as attempt_transaction, so a concurrent retry can't create a second transaction for a task
+        locks = []
+        try:
+            tasks_to_attempt = []
+            for task in ready_tasks:
+                lock = self.red.lock(f'TaskID-{task.id}', timeout=10)
+                if not lock.acquire(blocking_timeout=1):
+                    print(f'Skipping {task.id}: Failed to aquire lock')
+                    continue
+
+                locks.append(lock)
+
+                current_status = self.persistence_interface.get_current_task_status(task)
+                if current_status in ['SUCCESS', 'PENDING']:
+                    print(f'Skipping {task.id}: task status is currently {current_status}')
+                    continue
+
+                tasks_to_attempt.append(task)
+
+            transaction_objs = self.persistence_interface.create_blockchain_transactions(tasks_to_attempt)
+
+        finally:
+            for lock in locks:
+                lock.release()
+
+        if not transaction_objs:
+            return
+
+        transaction_ids = [t.id for t in transaction_objs]
+
+        print(f'Starting batch {batch_uuid} of {len(transaction_ids)} transactions')
+
+        chain1 = signature(utils.eth_endpoint('_process_function_transaction_batch'), args=(transaction_ids,))
+
+        error_callback = signature(utils.eth_endpoint('_log_batch_error'), args=(transaction_ids,))
+
+        if config.ETH_USE_BLOCK_FOLLOWER:
+            return chain1.on_error(error_callback).delay()
+
+        chain2 = signature(utils.eth_endpoint('_check_transaction_batch_response'))
 
         return chain([chain1, chain2]).on_error(error_callback).delay()
 
@@ -445,6 +748,10 @@ class TransactionProcessor(object):
         else:
             print("NOT LOGGING")
 
+    def log_batch_error(self, request, exc, traceback, transaction_ids):
+        for transaction_id in transaction_ids:
+            self.log_error(request, exc, traceback, transaction_id)
+
     def new_transaction_attempt(self, task):
         number_of_attempts_this_round = abs(
             len(task.transactions) - self.task_max_retries * (task.previous_invocations or 0)
@@ -543,6 +850,42 @@ class TransactionProcessor(object):
         # Attempt Create Async Transaction
         signature(utils.eth_endpoint('_attempt_transaction'), args=(task.uuid,)).delay()
 
+    def transact_with_contract_function_batch(
+            self,
+            uuid: UUID,
+            contract_address: str, abi_type: str, function_name: str,
+            calls: list,
+            signing_address: Optional[str] = None, encrypted_private_key: Optional[str] = None,
+            gas_limit: Optional[int] = None
+    ):
+        """
+        The batch transaction entrypoint for the processor. Creates a task for every call, all signed by the
+        same wallet against the same contract function, and sends them together.
+
+        :param uuid: the celery generated uuid for the batch
+        :param contract_address: the address of the contract for the function
+        :param abi_type: the type of ABI for the contract being called
+        :param function_name: name of the function
+        :param calls: list of dicts with the 'uuid' to give the call's task, its 'args' and optionally
+        'kwargs' and 'prior_tasks'
+        :param signing_address: address of the wallet signing the txns
+        :param encrypted_private_key: private key of the wallet making the transactions, encrypted using key from settings
+        :param gas_limit: limit on the amount of gas each txn can use. Overrides system default
+        :return: list of task uuids
+        """
+
+        signing_wallet_obj = self.get_signing_wallet_object(signing_address, encrypted_private_key)
+
+        tasks = self.persistence_interface.create_function_task_batch(uuid,
+                                                                      signing_wallet_obj,
+                                                                      contract_address, abi_type,
+                                                                      function_name, calls,
+                                                                      gas_limit)
+
+        signature(utils.eth_endpoint('_attempt_batch'), args=(uuid,)).delay()
+
+        return [task.uuid for task in tasks]
+
     def send_eth(self,
                  uuid: UUID,
                  amount_wei: int,
@@ -574,6 +917,30 @@ class TransactionProcessor(object):
         # Attempt Create Async Transaction
         signature(utils.eth_endpoint('_attempt_transaction'), args=(task.uuid,)).delay()
 
+    def send_eth_batch(self,
+                       uuid: UUID,
+                       sends: list,
+                       signing_address: Optional[str] = None, encrypted_private_key: Optional[str] = None):
+        """
+        The batch entrypoint for sending eth. Creates a task for every send, all signed by the same wallet,
+        and sends them together in the order given.
+
+        :param uuid: the celery generated uuid for the batch
+        :param sends: list of dicts with the 'uuid' to give the send's task, its 'recipient_address'
+        and 'amount' in WEI
+        :param signing_address: address of the wallet signing the txns
+        :param encrypted_private_key: private key of the wallet making the transactions, encrypted using key from settings
+        :return: list of task uuids
+        """
+
+        signing_wallet_obj = self.get_signing_wallet_object(signing_address, encrypted_private_key)
+
+        tasks = self.persistence_interface.create_send_eth_task_batch(uuid, signing_wallet_obj, sends)
+
+        signature(utils.eth_endpoint('_attempt_batch'), args=(uuid,)).delay()
+
+        return [task.uuid for task in tasks]
+
     def deploy_contract(
             self,
             uuid: UUID,
@@ -1,14 +1,19 @@
 from celery import signature
 from functools import partial
 from toolz import pipe
+from time import time
 import datetime
+import json
+import uuid
 
 import config
 from eth_manager import persistence_interface, utils, w3, red
 from eth_manager.task_interfaces.regular import (
     deploy_contract_task,
     transaction_task,
+    transaction_batch_task,
     send_eth_task,
+    send_eth_batch_task,
     synchronous_call,
     await_task_success,
     get_wallet_balance
@@ -21,24 +26,92 @@ def get_contract_address(task_uuid):
     return pipe(task_uuid, await_tr, lambda r: r.get('contract_address'))
 
 
-def topup_wallets(queue='low-priority'):
-    wallets = persistence_interface.get_all_wallets()
+# Balances read per JSON-RPC batch request when topping up wallets
+TOPUP_BALANCE_BATCH_SIZE = 100
 
+TOPUP_METRICS_KEY = 'TopupWalletsMetrics'
+
+
+def plan_topups(wallets, balances):
+    """
+    Works out every topup required in one pass, by the same rule as topup_if_required
+    :param wallets: wallets to check, in the order their topups should be sent
+    :param balances: dict of address to balance in wei. Wallets missing from it are left for the next run
+    :return: list of (address, amount in wei)
+    """
+    plan = []
     for wallet in wallets:
-        if (wallet.wei_topup_threshold or 0) > 0:
+        balance = balances.get(wallet.address)
+        if balance is None:
+            continue
+
+        wei_target_balance = wallet.wei_target_balance or 0
 
-            last_topup_task_uuid = wallet.last_topup_task_uuid
+        if balance <= wallet.wei_topup_threshold and wei_target_balance > balance:
+            plan.append((wallet.address, wei_target_balance - balance))
 
-            if last_topup_task_uuid:
-                task = persistence_interface.get_task_from_uuid(last_topup_task_uuid)
+    return plan
 
-                if task and task.status in ['PENDING', 'UNSTARTED']:
-                    return
 
-            signature(utils.eth_endpoint('topup_wallet_if_required'),
-                      kwargs={
-                          'address': wallet.address
-                      }).delay()
+def topup_wallets():
+    """
+    Tops up every wallet that's at or under its topup threshold and doesn't already have a topup in flight.
+    Balances are read in batched requests, and the topups are sent from the master wallet as a single batch,
+    so their nonces are claimed together. The run's metrics are kept for get_topup_wallets_metrics.
+    :return: the run's metrics
+    """
+    started = time()
+
+    wallets = []
+    topups_in_flight = 0
+    for wallet, last_topup_status in persistence_interface.get_wallets_with_topup_status():
+        if wallet.address == config.MASTER_WALLET_ADDRESS:
+            continue
+
+        if last_topup_status in ['PENDING', 'UNSTARTED']:
+            topups_in_flight += 1
+            continue
+
+        wallets.append(wallet)
+
+    balances = utils.get_wei_balances([wallet.address for wallet in wallets], TOPUP_BALANCE_BATCH_SIZE)
+
+    plan = plan_topups(wallets, balances)
+
+    batch_uuid = None
+    if plan:
+        sends = [
+            {'uuid': str(uuid.uuid4()), 'recipient_address': address, 'amount': amount_wei}
+            for address, amount_wei in plan
+        ]
+
+        persistence_interface.set_wallets_last_topup_task_uuids(
+            {send['recipient_address']: send['uuid'] for send in sends}
+        )
+
+        batch_uuid = send_eth_batch_task(config.MASTER_WALLET_ADDRESS, sends)
+
+    metrics = {
+        'finished_at': datetime.datetime.utcnow().isoformat(),
+        'duration_seconds': round(time() - started, 3),
+        'wallets_checked': len(wallets),
+        'topups_in_flight': topups_in_flight,
+        'balance_read_failures': len(wallets) - len(balances),
+        'topups_sent': len(plan),
+        'topup_wei_total': sum(amount_wei for _, amount_wei in plan),
+        'batch_uuid': batch_uuid
+    }
+
+    red.set(TOPUP_METRICS_KEY, json.dumps(metrics))
+
+    print(f'topup wallets complete: {metrics}')
+
+    return metrics
+
+
+def get_topup_wallets_metrics():
+    metrics = red.get(TOPUP_METRICS_KEY)
+    return json.loads(metrics) if metrics is not None else None
 
 
 def topup_if_required(address):
@@ -66,6 +139,46 @@ def topup_if_required(address):
     return None
 
 
+# Most wallets generated into the pool by a single replenish, so that one run can't hold the worker for long
+WALLET_POOL_REPLENISH_BATCH_SIZE = 50
+
+
+def replenish_wallet_pool():
+    """
+    Tops the pool of wallets that the app claims from up to WALLET_POOL_SIZE. New wallets are generated and saved
+    together, and their funding is queued before they're added to the pool, so they're usually funded by the time
+    they're claimed.
+    :return: the number of wallets added to the pool
+    """
+    lock = red.lock('WalletPoolReplenishLock', timeout=60)
+    if not lock.acquire(blocking=False):
+        return 0
+
+    try:
+        shortfall = config.WALLET_POOL_SIZE - red.llen(config.WALLET_POOL_KEY)
+        if shortfall <= 0:
+            return 0
+
+        wallets = persistence_interface.create_new_blockchain_wallets(
+            min(shortfall, WALLET_POOL_REPLENISH_BATCH_SIZE),
+            wei_target_balance=config.WALLET_POOL_WEI_TARGET_BALANCE,
+            wei_topup_threshold=config.WALLET_POOL_WEI_TOPUP_THRESHOLD
+        )
+        addresses = [wallet.address for wallet in wallets]
+
+        # New wallets are empty, so there's no need to check balances the way topup_if_required does
+        persistence_interface.set_wallets_last_topup_task_uuids({
+            address: send_eth_task(config.MASTER_WALLET_ADDRESS, config.WALLET_POOL_WEI_TARGET_BALANCE, address)
+            for address in addresses
+        })
+
+        red.rpush(config.WALLET_POOL_KEY, *addresses)
+
+        return len(addresses)
+    finally:
+        lock.release()
+
+
 def deploy_exchange_network(deploying_address):
     gasPrice = int(2.5e11)
 
@@ -281,94 +394,154 @@ def deploy_smart_token(
             'subexchange_address': subexchange_address}
 
 
-def deduplicate(min_task_id, max_task_id):
+# Task ids searched for duplicates per query, and reversals sent to the worker per batch task
+DEDUPLICATE_CHUNK_SIZE = 10000
+REVERSAL_BATCH_SIZE = 50
 
-    lock_timout = 10
+DEDUPE_LOCK_SECONDS = 600
 
-    duplicates = persistence_interface.get_duplicates(min_task_id, max_task_id)
 
-    print(f'search found {len(duplicates)} duplicates')
+def _claim_dupe_locks(task_ids):
+    """
+    Claims the multithread dupe lock of every task that isn't already being reversed. The locks are checked and set
+    together under a single thread lock, rather than taking a lock per task.
+    :return: set of the task ids claimed
+    """
+    if not task_ids:
+        return set()
 
-    skipped = 0
-    new_deduplication_tasks = 0
+    singlethread_lock = red.lock('SingleThreadDupeLock', timeout=10)
+    if not singlethread_lock.acquire(blocking=False):
+        return set()
 
-    for task_id, txns in duplicates:
+    try:
+        multi_locks = red.mget([f'MultithreadDupeLock-{task_id}' for task_id in task_ids])
 
-        task = persistence_interface.get_task_from_id(task_id)
+        current_timestamp = int(datetime.datetime.utcnow().timestamp())
+        claimed = {
+            task_id for task_id, multi_lock in zip(task_ids, multi_locks)
+            if not multi_lock or current_timestamp >= int(multi_lock)
+        }
 
-        if task.function != 'transferFrom':
-            print(f'Skipping de-duplication of {task_id} - task is not of type "transferFrom"')
-            skipped += 1
-            continue
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=DEDUPE_LOCK_SECONDS)
+        lock_pipe = red.pipeline()
+        for task_id in claimed:
+            lock_pipe.set(f'MultithreadDupeLock-{task_id}', int(expires_at.timestamp()))
+        lock_pipe.execute()
 
-        have_lock = False
-        singlethread_lock = red.lock(f'SingleThreadDupeLock-{task_id}', timeout=lock_timout)
-        try:
-            have_lock = singlethread_lock.acquire(blocking=False)
+        return claimed
+    finally:
+        singlethread_lock.release()
 
-            if not have_lock:
-                print(f'Skipping de-duplication of {task_id} - single thread lock not acquired')
-                skipped += 1
-                continue
 
-            multi_lock = red.get(f'MultithreadDupeLock-{task_id}')
+def _queue_reversals(reversals):
+    """
+    Sends reversals to the worker as batch tasks, one set of batches per signing wallet and token
+    :param reversals: list of (task, number of reversals required)
+    """
+    calls_by_wallet_and_token = {}
+    for task, reversals_required in reversals:
+        orginal_sender, orginal_recipient, amount = task.args
+        calls = calls_by_wallet_and_token.setdefault((task.signing_wallet.address, task.contract_address), [])
+        calls.extend([
+            {
+                'uuid': str(uuid.uuid4()),
+                'args': [orginal_recipient, orginal_sender, amount],
+                'reverses_task': task.uuid
+            }
+            for _ in range(reversals_required)
+        ])
+
+    for (signing_address, contract_address), calls in calls_by_wallet_and_token.items():
+        for i in range(0, len(calls), REVERSAL_BATCH_SIZE):
+            transaction_batch_task(
+                signing_address=signing_address,
+                contract_address=contract_address,
+                contract_type='ERC20',
+                func='transferFrom',
+                calls=calls[i:i + REVERSAL_BATCH_SIZE],
+                gas_limit=8000000
+            )
 
-            if multi_lock:
-                current_timestamp = int(datetime.datetime.utcnow().timestamp())
-                multi_lock_expires = int(multi_lock)
-                if current_timestamp < multi_lock_expires:
-                    print(f'Skipping de-duplication of {task_id} - multi thread lock not acquired')
-                    skipped += 1
-                    continue
 
-            expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=600)
-            red.set(f'MultithreadDupeLock-{task_id}', int(expires_at.timestamp()))
+def deduplicate(min_task_id, max_task_id, dry_run=False):
+    """
+    Reverses the extra successful transactions of "transferFrom" tasks that were sent more than once. Duplicates
+    are found a chunk of task ids at a time, and each chunk's tasks, locks and reversals are handled together.
+    :param dry_run: report the reversals that would be made, without claiming locks or creating any tasks
+    """
+    started = time()
+
+    duplicates = 0
+    skipped = 0
+    new_deduplication_tasks = 0
+    reversals_report = []
+
+    for chunk in persistence_interface.find_duplicates(min_task_id, max_task_id, DEDUPLICATE_CHUNK_SIZE):
+        duplicates += len(chunk)
+        txn_counts = dict(chunk)
 
-        finally:
-            if have_lock:
-                singlethread_lock.release()
+        tasks = []
+        for task in persistence_interface.get_tasks_from_ids(list(txn_counts.keys())):
+            if task.function != 'transferFrom':
+                print(f'Skipping de-duplication of {task.id} - task is not of type "transferFrom"')
+                skipped += 1
+                continue
+            tasks.append(task)
 
-        excess_txns = txns - 1
+        if not dry_run:
+            claimed = _claim_dupe_locks([task.id for task in tasks])
+            for task in tasks:
+                if task.id not in claimed:
+                    print(f'Skipping de-duplication of {task.id} - multi thread lock not acquired')
+                    skipped += 1
+            tasks = [task for task in tasks if task.id in claimed]
 
-        number_of_reversals = len(task.reversed_by)
+        # Counted once the locks are held, so that reversals being made elsewhere aren't missed
+        reversal_counts = persistence_interface.get_reversal_counts([task.id for task in tasks])
 
-        reversals_required = excess_txns - number_of_reversals
+        reversals = []
+        unneeded_locks = []
+        for task in tasks:
+            existing_reversals = reversal_counts.get(task.id, 0)
+            reversals_required = txn_counts[task.id] - 1 - existing_reversals
 
-        if reversals_required < 1:
-            print(f'Skipping de-duplication of {task_id} - no further reversals required')
-            red.delete(f'MultithreadDupeLock-{task_id}')
-            skipped += 1
-            continue
+            if reversals_required < 1:
+                print(f'Skipping de-duplication of {task.id} - no further reversals required')
+                unneeded_locks.append(f'MultithreadDupeLock-{task.id}')
+                skipped += 1
+                continue
 
+            reversals.append((task, reversals_required))
 
-        orginal_sender, orginal_recipient, amount = task.args
+            if dry_run:
+                reversals_report.append({
+                    'task_id': task.id,
+                    'task_uuid': task.uuid,
+                    'successful_transactions': txn_counts[task.id],
+                    'existing_reversals': existing_reversals,
+                    'reversals_required': reversals_required
+                })
 
-        print(f'Reversing task ({task_id}) {task.uuid} with {txns} duplicates')
+        new_deduplication_tasks += sum(reversals_required for _, reversals_required in reversals)
 
-        for tx in range(0, reversals_required):
-            new_task = transaction_task(
-                signing_address=task.signing_wallet.address,
-                contract_address=task.contract_address,
-                contract_type='ERC20',
-                func='transferFrom',
-                args=[
-                    orginal_recipient,
-                    orginal_sender,
-                    amount
-                ],
-                gas_limit=8000000,
-                reverses_task=task.uuid
-            )
-            print(f'Task {new_task} Reversing txn {tx}.')
-            new_deduplication_tasks += 1
+        if not dry_run:
+            if unneeded_locks:
+                red.delete(*unneeded_locks)
+
+            _queue_reversals(reversals)
 
     response = {
-        'duplicates': len(duplicates),
+        'duplicates': duplicates,
         'new_deduplication_tasks': new_deduplication_tasks,
-        'skipped': skipped
+        'skipped': skipped,
+        'dry_run': dry_run
     }
 
-    print('deduplication init thread complete')
-    print(response)
+    if dry_run:
+        response['reversals'] = reversals_report
+
+    print(f'deduplication init thread complete in {time() - started:.2f}s')
+    print({k: v for k, v in response.items() if k != 'reversals'})
 
     return response
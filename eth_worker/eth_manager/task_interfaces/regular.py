@@ -45,6 +45,29 @@ def transaction_task(signing_address,
     return utils.execute_task(sig)
 
 
+def transaction_batch_task(signing_address,
+                           contract_address, contract_type,
+                           func, calls,
+                           gas_limit=None):
+
+    kwargs = {
+        'signing_address': signing_address,
+        'contract_address': contract_address,
+        'abi_type': contract_type,
+        'function': func,
+        'calls': calls
+    }
+
+    if gas_limit:
+        kwargs['gas_limit'] = gas_limit
+
+    sig = signature(
+        utils.eth_endpoint('transact_with_contract_function_batch'),
+        kwargs=kwargs)
+
+    return utils.execute_task(sig)
+
+
 def send_eth_task(signing_address, amount_wei, recipient_address):
     sig = signature(
         utils.eth_endpoint('send_eth'),
@@ -57,6 +80,17 @@ def send_eth_task(signing_address, amount_wei, recipient_address):
     return utils.execute_task(sig)
 
 
+def send_eth_batch_task(signing_address, sends):
+    sig = signature(
+        utils.eth_endpoint('send_eth_batch'),
+        kwargs={
+            'signing_address': signing_address,
+            'sends': sends
+        })
+
+    return utils.execute_task(sig)
+
+
 def synchronous_call(contract_address, contract_type, func, args=None):
     call_sig = signature(
         utils.eth_endpoint('call_contract_function'),
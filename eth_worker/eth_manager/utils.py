@@ -1,4 +1,5 @@
 from celery import result
+import requests
 
 eth_worker_name = 'eth_manager'
 celery_tasks_name = 'celery_tasks'
@@ -25,3 +26,30 @@ def execute_synchronous_celery(signature):
 def execute_task(signature):
     ar = signature.delay()
     return ar.id
+
+
+def get_wei_balances(addresses, batch_size=100):
+    """
+    Reads the balance of every address with batched eth_getBalance JSON-RPC requests, rather than a request each.
+    :return: dict of address to balance in wei, for the addresses whose balance could be read
+    """
+    balances = {}
+    for i in range(0, len(addresses), batch_size):
+        batch = addresses[i:i + batch_size]
+
+        response = requests.post(
+            config.ETH_HTTP_PROVIDER,
+            json=[
+                {'jsonrpc': '2.0', 'id': request_id, 'method': 'eth_getBalance', 'params': [address, 'latest']}
+                for request_id, address in enumerate(batch)
+            ],
+            timeout=config.SYNCRONOUS_TASK_TIMEOUT * 5
+        )
+        response.raise_for_status()
+
+        # Batch responses can come back in any order, so they're matched up by id
+        for result_obj in response.json():
+            if 'result' in result_obj:
+                balances[batch[result_obj['id']]] = int(result_obj['result'], 16)
+
+    return balances
@@ -0,0 +1,29 @@
+"""Add nonce watermark to blockchain wallet
+
+Revision ID: 5bf2273a9170
+Revises: a5eac7e0ab4b
+Create Date: 2026-10-18 17:25:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5bf2273a9170'
+down_revision = 'a5eac7e0ab4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('blockchain_wallet', sa.Column('nonce_watermark', sa.Integer(), nullable=True))
+    op.add_column('blockchain_wallet', sa.Column('nonce_holes', sa.JSON(), nullable=True))
+    op.create_index('ix_blockchain_transaction_signing_wallet_id_nonce', 'blockchain_transaction',
+                    ['signing_wallet_id', 'nonce'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_blockchain_transaction_signing_wallet_id_nonce', table_name='blockchain_transaction')
+    op.drop_column('blockchain_wallet', 'nonce_holes')
+    op.drop_column('blockchain_wallet', 'nonce_watermark')
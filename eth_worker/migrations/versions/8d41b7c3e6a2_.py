@@ -0,0 +1,23 @@
+"""Index blockchain transaction hash for the block follower
+
+Revision ID: 8d41b7c3e6a2
+Revises: c2e5a1f0d8b4
+Create Date: 2026-10-18 18:41:07.215330
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b7c3e6a2'
+down_revision = 'c2e5a1f0d8b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_blockchain_transaction_hash'), 'blockchain_transaction', ['hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_blockchain_transaction_hash'), table_name='blockchain_transaction')
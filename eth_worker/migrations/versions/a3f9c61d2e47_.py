@@ -0,0 +1,52 @@
+"""Store blockchain task status, indexed, rather than aggregating it over transactions
+
+Revision ID: a3f9c61d2e47
+Revises: 8d41b7c3e6a2
+Create Date: 2026-10-18 23:12:44.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9c61d2e47'
+down_revision = '8d41b7c3e6a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_blockchain_transaction_blockchain_task_id'), 'blockchain_transaction',
+                    ['blockchain_task_id'], unique=False)
+
+    op.add_column('blockchain_task', sa.Column('_status', sa.String(), nullable=True))
+
+    # The lowest status of each task's transactions, as the status hybrid property used to work out
+    op.execute("""
+        UPDATE blockchain_task SET _status = CASE (
+            SELECT min(CASE blockchain_transaction._status
+                WHEN 'SUCCESS' THEN 1
+                WHEN 'PENDING' THEN 2
+                WHEN 'UNSTARTED' THEN 3
+                WHEN 'FAILED' THEN 4
+                WHEN 'UNKNOWN' THEN 99
+                ELSE 99 END)
+            FROM blockchain_transaction
+            WHERE blockchain_transaction.blockchain_task_id = blockchain_task.id
+        )
+            WHEN 1 THEN 'SUCCESS'
+            WHEN 2 THEN 'PENDING'
+            WHEN 3 THEN 'UNSTARTED'
+            WHEN 4 THEN 'FAILED'
+            WHEN 99 THEN 'UNKNOWN'
+            ELSE 'UNSTARTED' END
+    """)
+
+    op.create_index(op.f('ix_blockchain_task__status'), 'blockchain_task', ['_status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_blockchain_task__status'), table_name='blockchain_task')
+    op.drop_column('blockchain_task', '_status')
+    op.drop_index(op.f('ix_blockchain_transaction_blockchain_task_id'), table_name='blockchain_transaction')
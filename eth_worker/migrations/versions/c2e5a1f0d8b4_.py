@@ -0,0 +1,26 @@
+"""Add batch uuid to blockchain task
+
+Revision ID: c2e5a1f0d8b4
+Revises: 5bf2273a9170
+Create Date: 2026-10-18 17:58:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e5a1f0d8b4'
+down_revision = '5bf2273a9170'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('blockchain_task', sa.Column('batch_uuid', sa.String(), nullable=True))
+    op.create_index(op.f('ix_blockchain_task_batch_uuid'), 'blockchain_task', ['batch_uuid'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_blockchain_task_batch_uuid'), table_name='blockchain_task')
+    op.drop_column('blockchain_task', 'batch_uuid')
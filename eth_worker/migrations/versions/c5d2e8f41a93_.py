@@ -0,0 +1,32 @@
+"""Index transactions by task and status, and tasks by the task they reverse, for finding duplicates
+
+Revision ID: c5d2e8f41a93
+Revises: a3f9c61d2e47
+Create Date: 2026-10-18 23:48:06.271937
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8f41a93'
+down_revision = 'a3f9c61d2e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lookups by task alone are covered by the leading column of the new index
+    op.create_index('ix_blockchain_transaction_blockchain_task_id__status', 'blockchain_transaction',
+                    ['blockchain_task_id', '_status'], unique=False)
+    op.drop_index(op.f('ix_blockchain_transaction_blockchain_task_id'), table_name='blockchain_transaction')
+
+    op.create_index(op.f('ix_blockchain_task_reverses_id'), 'blockchain_task', ['reverses_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_blockchain_task_reverses_id'), table_name='blockchain_task')
+
+    op.create_index(op.f('ix_blockchain_transaction_blockchain_task_id'), 'blockchain_transaction',
+                    ['blockchain_task_id'], unique=False)
+    op.drop_index('ix_blockchain_transaction_blockchain_task_id__status', table_name='blockchain_transaction')
@@ -1,19 +1,23 @@
 import datetime
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import joinedload
 
 from sempo_types import UUID, UUIDList
 
 from sql_persistence.models import (
     BlockchainTransaction,
     BlockchainTask,
-    BlockchainWallet
+    BlockchainWallet,
+    update_task_statuses
 )
 
 from eth_manager.exceptions import (
     WalletExistsError,
     LockedNotAcquired
 )
+from eth_manager.nonce_allocator import NonceAllocator
 from sqlalchemy.orm import scoped_session
+
 class SQLPersistenceInterface(object):
 
     def _fail_expired_transactions(self):
@@ -21,12 +25,38 @@ class SQLPersistenceInterface(object):
             seconds=self.PENDING_TRANSACTION_EXPIRY_SECONDS
         )
 
-        (self.session.query(BlockchainTransaction)
-         .filter(and_(BlockchainTransaction.status == 'PENDING',
-                      BlockchainTransaction.updated < expire_time))
-         .update({BlockchainTransaction.status: 'FAILED',
-                  BlockchainTransaction.error: 'Timeout Error'},
-                 synchronize_session=False))
+        expired = (self.session.query(BlockchainTransaction.id, BlockchainTransaction.blockchain_task_id)
+                   .filter(and_(BlockchainTransaction.status == 'PENDING',
+                                BlockchainTransaction.updated < expire_time))
+                   .all())
+
+        if not expired:
+            return
+
+        # Fixed to the transactions found, so the tasks whose status changes are known
+        expired_query = (self.session.query(BlockchainTransaction)
+                         .filter(BlockchainTransaction.id.in_([transaction_id for transaction_id, _ in expired])))
+
+        # Expired transactions that were never sent give their nonce back
+        unsent = (expired_query
+                  .filter(and_(BlockchainTransaction.nonce_consumed == False,
+                               BlockchainTransaction.nonce != None))
+                  .with_entities(BlockchainTransaction.signing_wallet_id, BlockchainTransaction.nonce)
+                  .all())
+
+        expired_query.update({BlockchainTransaction.status: 'FAILED',
+                              BlockchainTransaction.error: 'Timeout Error'},
+                             synchronize_session=False)
+
+        # Bulk updates skip the session events that keep task statuses up to date
+        update_task_statuses(self.session, {task_id for _, task_id in expired if task_id is not None})
+
+        released_by_wallet = {}
+        for signing_wallet_id, nonce in unsent:
+            released_by_wallet.setdefault(signing_wallet_id, []).append(nonce)
+
+        for signing_wallet_id, nonces in released_by_wallet.items():
+            self._release_nonces(signing_wallet_id, nonces)
 
     def _unconsume_high_failed_nonces(self, signing_wallet_id, stating_nonce):
         expire_time = datetime.datetime.utcnow() - datetime.timedelta(
@@ -46,25 +76,67 @@ class SQLPersistenceInterface(object):
 
         nonce = max(stating_nonce, highest_known_nonce)
 
-        (self.session.query(BlockchainTransaction)
-         .filter(and_(BlockchainTransaction.signing_wallet_id == signing_wallet_id,
-                      BlockchainTransaction.status == 'FAILED',
-                      BlockchainTransaction.nonce > nonce,
-                      BlockchainTransaction.submitted_date < expire_time))
-         .update({BlockchainTransaction.nonce_consumed: False},
+        # Only rows still flagged as consumed, so each failed transaction is processed once
+        unconsume_query = (self.session.query(BlockchainTransaction)
+                           .filter(and_(BlockchainTransaction.signing_wallet_id == signing_wallet_id,
+                                        BlockchainTransaction.status == 'FAILED',
+                                        BlockchainTransaction.nonce_consumed == True,
+                                        BlockchainTransaction.nonce > nonce,
+                                        BlockchainTransaction.submitted_date < expire_time)))
+
+        unconsumed_nonces = [n for (n,) in unconsume_query.with_entities(BlockchainTransaction.nonce).all()]
+
+        unconsume_query.update({BlockchainTransaction.nonce_consumed: False},
+                               synchronize_session=False)
+
+        self._release_nonces(signing_wallet_id, unconsumed_nonces)
+
+    def _advance_nonce_watermark(self, signing_wallet_id, nonce):
+        # A single atomic update rather than a locked read-modify-write, so concurrent claims don't queue on
+        # the wallet's row. Claims don't touch the holes, which are worked out again on reconcile instead.
+        # Wallets without a watermark yet are left for _rebuild_nonce_watermark
+        (self.session.query(BlockchainWallet)
+         .filter(and_(BlockchainWallet.id == signing_wallet_id,
+                      BlockchainWallet.nonce_watermark != None))
+         .update({BlockchainWallet.nonce_watermark: func.greatest(BlockchainWallet.nonce_watermark, nonce + 1)},
                  synchronize_session=False))
 
-    def _calculate_nonce(self, signing_wallet_obj, starting_nonce=0):
+    def _get_wallet_for_nonce_update(self, signing_wallet_id):
+        # Row lock so concurrent releases and reconciles don't clobber each other's holes
+        return (self.session.query(BlockchainWallet)
+                .filter(BlockchainWallet.id == signing_wallet_id)
+                .with_for_update()
+                .populate_existing()
+                .one())
+
+    def _held_nonces(self, signing_wallet_id, nonces):
+        held = (self.session.query(BlockchainTransaction.nonce)
+                .filter(BlockchainTransaction.signing_wallet_id == signing_wallet_id)
+                .filter(BlockchainTransaction.ignore == False)
+                .filter(BlockchainTransaction.first_block_hash == self.first_block_hash)
+                .filter(BlockchainTransaction.nonce.in_(nonces))
+                .filter(or_(BlockchainTransaction.status == 'PENDING',
+                            BlockchainTransaction.nonce_consumed == True))
+                .all())
 
-        self._unconsume_high_failed_nonces(signing_wallet_obj.id, starting_nonce)
-        self._fail_expired_transactions()
+        return set(n for (n,) in held)
 
-        # First find the highest *continuous* nonce that isn't either pending, or consumed
-        # (failed or succeeded on blockchain)
+    def _release_nonces(self, signing_wallet_id, nonces):
+        if not nonces:
+            return
 
+        wallet = self._get_wallet_for_nonce_update(signing_wallet_id)
+
+        # A released nonce may already have been reallocated to another transaction
+        held = self._held_nonces(signing_wallet_id, nonces)
+        for nonce in set(nonces) - held:
+            wallet.mark_nonce_released(nonce)
+
+    def _rebuild_nonce_watermark(self, signing_wallet_obj, starting_nonce=0):
+        # One-off scan for wallets that predate the watermark. Afterwards it's maintained as nonces change hands.
         likely_consumed_nonces = (
-            self.session.query(BlockchainTransaction)
-                .filter(BlockchainTransaction.signing_wallet == signing_wallet_obj)
+            self.session.query(BlockchainTransaction.nonce)
+                .filter(BlockchainTransaction.signing_wallet_id == signing_wallet_obj.id)
                 .filter(BlockchainTransaction.ignore == False)
                 .filter(BlockchainTransaction.first_block_hash == self.first_block_hash)
                 .filter(
@@ -76,44 +148,176 @@ class SQLPersistenceInterface(object):
                 )
                 .all())
 
-        # Use a set to find continous nonces because txns in db may be out of order
-        nonce_set = set()
-        for txn in likely_consumed_nonces:
-            nonce_set.add(txn.nonce)
+        nonce_set = set(n for (n,) in likely_consumed_nonces)
+
+        watermark = max(nonce_set) + 1 if nonce_set else starting_nonce
+
+        signing_wallet_obj.nonce_watermark = watermark
+        signing_wallet_obj.nonce_holes = sorted(set(range(starting_nonce, watermark)) - nonce_set)
 
-        next_nonce = starting_nonce
-        while next_nonce in nonce_set:
-            next_nonce += 1
+    def _calculate_nonce(self, signing_wallet_obj, starting_nonce=0):
+        """
+        :return: a tuple of the free nonces below the watermark, and the first nonce at or above it
+        """
+
+        self._unconsume_high_failed_nonces(signing_wallet_obj.id, starting_nonce)
+        self._fail_expired_transactions()
 
-        return next_nonce
+        wallet = self._get_wallet_for_nonce_update(signing_wallet_obj.id)
 
-    def locked_claim_transaction_nonce(self, signing_wallet_obj, transaction_id):
-        lock = self.red.lock(signing_wallet_obj.address, timeout=600)
-        print(f'Attempting lock for txn: {transaction_id} \n'
-              f'addr:{signing_wallet_obj.address}')
+        if wallet.nonce_watermark is None:
+            self._rebuild_nonce_watermark(wallet, starting_nonce)
+        else:
+            # Claims only move the watermark up, so the holes are worked out again here from the transactions
+            # holding the nonces between the chain's nonce and the watermark. This also frees nonces that were
+            # claimed but never saved
+            in_flight = set(range(starting_nonce, wallet.nonce_watermark))
+            held = self._held_nonces(wallet.id, list(in_flight)) if in_flight else set()
+            wallet.nonce_holes = sorted(in_flight - held)
+
+        first_free = wallet.next_unclaimed_nonce(starting_nonce)
+        holes = list(wallet.nonce_holes or [])
+
+        return holes, max(wallet.nonce_watermark, first_free)
+
+    def reconcile_nonce(self, signing_wallet_obj):
+        """
+        Re-seeds the nonce allocator for a wallet from chain and database state. Only required on startup or
+        once a gap has been detected, so the (comparatively slow) network and table scans stay off the hot path.
+        """
+        lock = self.red.lock(f'NonceReconcile-{signing_wallet_obj.address}', timeout=60)
         # Commits here are because the database would sometimes timeout during a long lock
         # and could not cleanly restart with uncommitted data in the session. Committing before
         # the lock, and then once it's reclaimed lets the session gracefully refresh if it has to.
         self.session.commit()
         with lock:
             self.session.commit()
-            self.session.refresh(signing_wallet_obj)
-            ct = self.claim_transaction_nonce(signing_wallet_obj, transaction_id)
-            return ct
+            if self.nonce_allocator.is_initialised(signing_wallet_obj.address):
+                # Another worker reconciled while we were waiting on the lock
+                return
+
+            network_nonce = self.w3.eth.getTransactionCount(signing_wallet_obj.address, block_identifier='pending')
+            holes, next_nonce = self._calculate_nonce(signing_wallet_obj, network_nonce)
+            self.session.commit()
+
+            print(f'Reconciled nonce for {signing_wallet_obj.address}: next nonce is {next_nonce}, '
+                  f'free below that are {holes}')
+
+            self.nonce_allocator.reset(signing_wallet_obj.address, next_nonce, holes)
+
+    def release_transaction_nonce(self, transaction_id):
+        """
+        Returns the nonce of a transaction that never reached the chain back to the allocator for reuse
+        """
+        blockchain_transaction = self.session.query(BlockchainTransaction).get(transaction_id)
+
+        if blockchain_transaction.nonce is None or blockchain_transaction.nonce_consumed:
+            return
+
+        self._release_nonces(blockchain_transaction.signing_wallet_id, [blockchain_transaction.nonce])
+        self.session.commit()
+
+        address = blockchain_transaction.signing_wallet.address
+        if not self.nonce_allocator.is_initialised(address):
+            # Allocation was invalidated, and the next reconcile will account for this nonce anyway
+            return
+
+        self.nonce_allocator.release(address, blockchain_transaction.nonce)
+
+    def invalidate_nonce_allocation(self, signing_wallet_obj):
+        """
+        Flags that the allocated nonces are out of step with the chain, forcing a reconcile on the next claim
+        """
+        self.nonce_allocator.invalidate(signing_wallet_obj.address)
+
+    def get_lowest_stale_pending_nonces(self, updated_before):
+        """
+        :return: list of (signing wallet, lowest nonce) for each wallet with PENDING transactions holding a nonce
+        that haven't been updated since the given time
+        """
+        rows = (self.session.query(BlockchainTransaction.signing_wallet_id, func.min(BlockchainTransaction.nonce))
+                .filter(and_(BlockchainTransaction.status == 'PENDING',
+                             BlockchainTransaction.nonce != None,
+                             BlockchainTransaction.updated < updated_before))
+                .group_by(BlockchainTransaction.signing_wallet_id)
+                .all())
+
+        if not rows:
+            return []
+
+        wallets_by_id = {
+            wallet.id: wallet for wallet in
+            self.session.query(BlockchainWallet)
+                .filter(BlockchainWallet.id.in_([wallet_id for wallet_id, _ in rows]))
+                .all()
+        }
+
+        return [(wallets_by_id[wallet_id], nonce) for wallet_id, nonce in rows if wallet_id in wallets_by_id]
+
+    def resolve_nonce_gap(self, signing_wallet_obj):
+        """
+        Fails expired PENDING transactions, so that they're retried and any nonces they never used are freed,
+        then forces a reconcile on the wallet's next claim
+        """
+        self._fail_expired_transactions()
+        self.session.commit()
+
+        self.invalidate_nonce_allocation(signing_wallet_obj)
+
+    def invalidate_all_nonce_allocations(self):
+        self.nonce_allocator.invalidate_all()
 
     def claim_transaction_nonce(self, signing_wallet_obj, transaction_id):
-        network_nonce = self.w3.eth.getTransactionCount(signing_wallet_obj.address, block_identifier='pending')
         blockchain_transaction = self.session.query(BlockchainTransaction).get(transaction_id)
 
         if blockchain_transaction.nonce is not None:
             return blockchain_transaction.nonce, blockchain_transaction.id
-        calculated_nonce = self._calculate_nonce(signing_wallet_obj, network_nonce)
+
+        nonce = self.nonce_allocator.claim(signing_wallet_obj.address)
+        while nonce is None:
+            self.reconcile_nonce(signing_wallet_obj)
+            nonce = self.nonce_allocator.claim(signing_wallet_obj.address)
+
         blockchain_transaction.signing_wallet = signing_wallet_obj
-        blockchain_transaction.nonce = calculated_nonce
+        blockchain_transaction.nonce = nonce
         blockchain_transaction.status = 'PENDING'
+
+        self._advance_nonce_watermark(signing_wallet_obj.id, nonce)
+
+        self.session.commit()
+
+        return nonce, blockchain_transaction.id
+
+    def claim_transaction_nonces(self, signing_wallet_obj, transaction_ids):
+        """
+        Claims nonces for a batch of transactions from the same wallet with a single allocator call
+        :return: list of (nonce, transaction_id) tuples
+        """
+        blockchain_transactions = (self.session.query(BlockchainTransaction)
+                                   .filter(BlockchainTransaction.id.in_(transaction_ids))
+                                   .order_by(BlockchainTransaction.id.asc())
+                                   .all())
+
+        unclaimed = [t for t in blockchain_transactions if t.nonce is None]
+
+        nonces = []
+        if unclaimed:
+            nonces = self.nonce_allocator.claim_many(signing_wallet_obj.address, len(unclaimed))
+            while nonces is None:
+                self.reconcile_nonce(signing_wallet_obj)
+                nonces = self.nonce_allocator.claim_many(signing_wallet_obj.address, len(unclaimed))
+
+        for blockchain_transaction, nonce in zip(unclaimed, sorted(nonces)):
+            blockchain_transaction.signing_wallet = signing_wallet_obj
+            blockchain_transaction.nonce = nonce
+            blockchain_transaction.status = 'PENDING'
+
+        if nonces:
+            self._advance_nonce_watermark(signing_wallet_obj.id, max(nonces))
+
         self.session.commit()
 
-        return calculated_nonce, blockchain_transaction.id
+        return [(t.nonce, t.id) for t in blockchain_transactions]
 
     def update_transaction_data(self, transaction_id, transaction_data):
 
@@ -142,9 +346,68 @@ class SQLPersistenceInterface(object):
 
         return blockchain_transaction
 
+    def create_blockchain_transactions(self, tasks):
+
+        blockchain_transactions = []
+        for task in tasks:
+            blockchain_transaction = BlockchainTransaction(
+                signing_wallet=task.signing_wallet,
+                first_block_hash=self.first_block_hash
+            )
+            blockchain_transaction.task = task
+
+            self.session.add(blockchain_transaction)
+            blockchain_transactions.append(blockchain_transaction)
+
+        self.session.commit()
+
+        return blockchain_transactions
+
     def get_transaction(self, transaction_id):
         return self.session.query(BlockchainTransaction).get(transaction_id)
 
+    def get_pending_transactions_by_hash(self, transaction_hashes):
+        if not transaction_hashes:
+            return []
+
+        return (self.session.query(BlockchainTransaction)
+                .filter(BlockchainTransaction.hash.in_(transaction_hashes))
+                .filter(BlockchainTransaction._status == 'PENDING')
+                .all())
+
+    def get_unresolved_pending_transactions(self, submitted_before):
+        """
+        :return: PENDING transactions that were sent before the given time, oldest first
+        """
+        return (self.session.query(BlockchainTransaction)
+                .filter(and_(BlockchainTransaction._status == 'PENDING',
+                             BlockchainTransaction.hash != None,
+                             BlockchainTransaction.submitted_date < submitted_before))
+                .order_by(BlockchainTransaction.id.asc())
+                .all())
+
+    def resolve_transactions(self, transaction_results):
+        """
+        Applies a dict of transaction id to receipt result in one commit,
+        marking the task of each successful transaction as it goes
+        """
+        if not transaction_results:
+            return
+
+        transactions = (self.session.query(BlockchainTransaction)
+                        .filter(BlockchainTransaction.id.in_(transaction_results.keys()))
+                        .all())
+
+        for transaction in transactions:
+            result = transaction_results[transaction.id]
+            for attribute in result:
+                setattr(transaction, attribute, result[attribute])
+
+            if result.get('status') == 'SUCCESS' and transaction.task:
+                transaction.task.status_text = 'SUCCESS'
+
+        self.session.commit()
+
     def get_transaction_signing_wallet(self, transaction_id):
 
         transaction = self.session.query(BlockchainTransaction).get(transaction_id)
@@ -177,6 +440,11 @@ class SQLPersistenceInterface(object):
             if posterior:
                 task.posterior_tasks.append(posterior)
 
+    def get_current_task_status(self, task):
+        # Reloaded rather than read from the session, since other workers may have changed it since it was loaded
+        self.session.refresh(task, ['_status'])
+        return task.status
+
     def set_task_status_text(self, task, text):
         task.status_text = text
         self.session.commit()
@@ -204,6 +472,33 @@ class SQLPersistenceInterface(object):
 
         return task
 
+    def create_send_eth_task_batch(self,
+                                   batch_uuid: UUID,
+                                   signing_wallet_obj,
+                                   sends):
+        """
+        Creates one send eth task per send, committed together and tagged with a shared batch uuid
+
+        :param sends: list of dicts, each with a 'uuid', 'recipient_address' and 'amount'
+        """
+
+        tasks = [
+            BlockchainTask(send['uuid'],
+                           signing_wallet=signing_wallet_obj,
+                           type='SEND_ETH',
+                           is_send_eth=True,
+                           recipient_address=send['recipient_address'],
+                           amount=send['amount'],
+                           batch_uuid=batch_uuid)
+            for send in sends
+        ]
+
+        self.session.add_all(tasks)
+
+        self.session.commit()
+
+        return tasks
+
     def create_function_task(self,
                              uuid: UUID,
                              signing_wallet_obj,
@@ -239,6 +534,69 @@ class SQLPersistenceInterface(object):
 
         return task
 
+    def create_function_task_batch(self,
+                                   batch_uuid: UUID,
+                                   signing_wallet_obj,
+                                   contract_address, abi_type,
+                                   function, calls,
+                                   gas_limit=None):
+        """
+        Creates one function task per call, committed together and tagged with a shared batch uuid
+
+        :param calls: list of dicts, each with a 'uuid', 'args' and optionally 'kwargs', 'prior_tasks'
+        and 'reverses_task'
+        """
+
+        related_task_uuids = set()
+        for call in calls:
+            related_task_uuids.update(call.get('prior_tasks') or [])
+            if call.get('reverses_task'):
+                related_task_uuids.add(call['reverses_task'])
+
+        related_tasks_by_uuid = {}
+        if related_task_uuids:
+            related_tasks_by_uuid = {
+                t.uuid: t for t in
+                self.session.query(BlockchainTask).filter(BlockchainTask.uuid.in_(related_task_uuids)).all()
+            }
+
+        reversed_task_ids = set()
+
+        tasks = []
+        for call in calls:
+            task = BlockchainTask(call['uuid'],
+                                  signing_wallet=signing_wallet_obj,
+                                  type='FUNCTION',
+                                  contract_address=contract_address,
+                                  abi_type=abi_type,
+                                  function=function,
+                                  args=call.get('args'),
+                                  kwargs=call.get('kwargs'),
+                                  gas_limit=gas_limit,
+                                  batch_uuid=batch_uuid)
+
+            self.session.add(task)
+
+            for prior_task_uuid in call.get('prior_tasks') or []:
+                prior_task = related_tasks_by_uuid.get(prior_task_uuid)
+                if prior_task:
+                    task.prior_tasks.append(prior_task)
+
+            reverses_task_obj = related_tasks_by_uuid.get(call.get('reverses_task'))
+            if reverses_task_obj:
+                task.reverses = reverses_task_obj
+                reversed_task_ids.add(reverses_task_obj.id)
+
+            tasks.append(task)
+
+        self.session.commit()
+
+        # Release the multithread locks, now the reversals are saved
+        if reversed_task_ids:
+            self.red.delete(*[f'MultithreadDupeLock-{task_id}' for task_id in reversed_task_ids])
+
+        return tasks
+
     def create_deploy_contract_task(self,
                                     uuid: UUID,
                                     signing_wallet_obj,
@@ -289,33 +647,46 @@ class SQLPersistenceInterface(object):
         else:
             return base_data
 
+    def find_duplicates(self, min_task_id=None, max_task_id=None, chunk_size=10000):
+        """
+        Finds the tasks with more than one successful transaction, with ids strictly between min_task_id and
+        max_task_id. Each chunk of task ids is one aggregate over the (blockchain_task_id, _status) index, so tasks
+        without duplicates never have to be visited.
+
+        :return: generator of lists of (task_id, successful transaction count), one list per chunk of task ids
+        """
+        if min_task_id is None:
+            min_task_id = 0
+
+        if max_task_id is None:
+            max_task_id = (self.session.query(func.max(BlockchainTransaction.blockchain_task_id)).scalar() or 0) + 1
+
+        for chunk_start in range(min_task_id, max_task_id - 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, max_task_id - 1)
+
+            yield (self.session.query(BlockchainTransaction.blockchain_task_id, func.count())
+                   .filter(and_(BlockchainTransaction.blockchain_task_id > chunk_start,
+                                BlockchainTransaction.blockchain_task_id <= chunk_end,
+                                BlockchainTransaction.status == 'SUCCESS'))
+                   .group_by(BlockchainTransaction.blockchain_task_id)
+                   .having(func.count() > 1)
+                   .order_by(BlockchainTransaction.blockchain_task_id)
+                   .all())
+
     def get_duplicates(self, min_task_id, max_task_id):
+        return [duplicate for chunk in self.find_duplicates(min_task_id, max_task_id) for duplicate in chunk]
 
-        from sqlalchemy.sql import text
-
-        query = text(
-            """
-                SELECT blockchain_task.id as task_id,
-                  (SELECT COUNT(*)
-                    FROM blockchain_transaction
-                    WHERE blockchain_task_id = blockchain_task.id AND _status = 'SUCCESS'
-                    ) as txn_count
-                FROM blockchain_task
-                RIGHT JOIN blockchain_transaction
-                ON  blockchain_transaction.blockchain_task_id = blockchain_task.id
-                WHERE blockchain_task.id > :min_task_id and blockchain_task.id < :max_task_id
-                GROUP BY blockchain_task.id
-                HAVING (
-                  SELECT COUNT(*)
-                  FROM blockchain_transaction
-                  WHERE blockchain_task_id = blockchain_task.id AND _status = 'SUCCESS'
-                  ) > 1;
-            """
-        )
-        res = self.session.execute(query, {'min_task_id': min_task_id, 'max_task_id': max_task_id})
+    def get_reversal_counts(self, task_ids):
+        """
+        :return: dict of task id to the number of tasks reversing it, for those of the tasks that have any
+        """
+        if not task_ids:
+            return {}
 
-        duplicated_tasks = [row for row in res]
-        return duplicated_tasks
+        return dict(self.session.query(BlockchainTask.reverses_id, func.count())
+                    .filter(BlockchainTask.reverses_id.in_(task_ids))
+                    .group_by(BlockchainTask.reverses_id)
+                    .all())
 
     def increment_task_invokations(self, task):
         task.previous_invocations = (task.previous_invocations or 0) + 1
@@ -325,9 +696,25 @@ class SQLPersistenceInterface(object):
     def get_task_from_uuid(self, task_uuid):
         return self.session.query(BlockchainTask).filter_by(uuid=task_uuid).first()
 
+    def get_tasks_from_batch_uuid(self, batch_uuid):
+        return (self.session.query(BlockchainTask)
+                .filter(BlockchainTask.batch_uuid == batch_uuid)
+                .order_by(BlockchainTask.id.asc())
+                .all())
+
     def get_task_from_id(self, task_id):
         return self.session.query(BlockchainTask).get(task_id)
 
+    def get_tasks_from_ids(self, task_ids):
+        if not task_ids:
+            return []
+
+        return (self.session.query(BlockchainTask)
+                .options(joinedload(BlockchainTask.signing_wallet))
+                .filter(BlockchainTask.id.in_(task_ids))
+                .order_by(BlockchainTask.id.asc())
+                .all())
+
     def _filter_minmax_task_ids_maybe(self, query, min_task_id, max_task_id):
         if min_task_id:
             query = query.filter(BlockchainTask.id > min_task_id)
@@ -406,10 +793,45 @@ class SQLPersistenceInterface(object):
 
         return wallet
 
+    def create_new_blockchain_wallets(self, count, wei_target_balance=0, wei_topup_threshold=0):
+        # Generated together and committed once, for filling the wallet pool
+        wallets = [
+            BlockchainWallet(wei_target_balance=wei_target_balance, wei_topup_threshold=wei_topup_threshold)
+            for _ in range(count)
+        ]
+
+        self.session.add_all(wallets)
+
+        self.session.commit()
+
+        return wallets
+
+    def set_wallets_last_topup_task_uuids(self, task_uuids_by_address):
+        wallets = self.session.query(BlockchainWallet).filter(
+            BlockchainWallet.address.in_(list(task_uuids_by_address.keys()))
+        ).all()
+
+        for wallet in wallets:
+            wallet.last_topup_task_uuid = task_uuids_by_address[wallet.address]
+
+        self.session.commit()
+
 
     def get_all_wallets(self):
         return self.session.query(BlockchainWallet).all()
 
+    def get_wallets_with_topup_status(self):
+        """
+        :return: list of (wallet, status of its last topup task or None) for every wallet with a topup threshold
+        """
+        rows = (self.session.query(BlockchainWallet, BlockchainTask.id, BlockchainTask.status)
+                .outerjoin(BlockchainTask, BlockchainTask.uuid == BlockchainWallet.last_topup_task_uuid)
+                .filter(BlockchainWallet.wei_topup_threshold > 0)
+                .order_by(BlockchainWallet.id.asc())
+                .all())
+
+        return [(wallet, (status or 'UNSTARTED') if task_id else None) for wallet, task_id, status in rows]
+
     def get_wallet_by_address(self, address):
         return self.session.query(BlockchainWallet).filter(BlockchainWallet.address == address).first()
 
@@ -429,6 +851,8 @@ class SQLPersistenceInterface(object):
 
         self.red = red
 
+        self.nonce_allocator = NonceAllocator(red)
+
         self.session_factory = session_factory
 
         self.session = scoped_session(session_factory)
@@ -2,9 +2,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, backref
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import Table, Column, Integer, String, DateTime, Boolean, ForeignKey, BigInteger, JSON, Numeric
-from sqlalchemy.orm import scoped_session
-from sqlalchemy import select, func, case
+from sqlalchemy import Table, Column, Index, Integer, String, DateTime, Boolean, ForeignKey, BigInteger, JSON, Numeric
+from sqlalchemy.orm import scoped_session, Session
+from sqlalchemy import select, func, case, event, inspect
 import datetime, base64, os
 from cryptography.fernet import Fernet
 from eth_utils import keccak
@@ -38,6 +38,11 @@ class BlockchainWallet(ModelBase):
     wei_topup_threshold   = Column(BigInteger())
     last_topup_task_uuid    = Column(String())
 
+    # Every nonce below the watermark has been claimed by a transaction, except for those listed in nonce_holes.
+    # Claims only move the watermark up, and the holes are worked out again on reconcile
+    nonce_watermark = Column(Integer)
+    nonce_holes = Column(JSON)
+
     tasks = relationship('BlockchainTask',
                          backref='signing_wallet',
                          lazy=True,
@@ -96,6 +101,23 @@ class BlockchainWallet(ModelBase):
             private_key = bytes.fromhex(private_key.replace('0x', ''))
         return keys.PrivateKey(private_key).public_key.to_checksum_address()
 
+    def mark_nonce_released(self, nonce):
+        if self.nonce_watermark is None or nonce >= self.nonce_watermark:
+            return
+
+        self.nonce_holes = sorted(set(self.nonce_holes or []) | {nonce})
+
+    def next_unclaimed_nonce(self, starting_nonce=0):
+        # Anything below the starting (network) nonce is already consumed on chain, so the hole can be dropped
+        holes = [h for h in (self.nonce_holes or []) if h >= starting_nonce]
+        if holes != (self.nonce_holes or []):
+            self.nonce_holes = holes
+
+        if holes:
+            return holes[0]
+
+        return max(self.nonce_watermark or 0, starting_nonce)
+
     def __init__(self, private_key=None, wei_target_balance=None, wei_topup_threshold=None):
 
         if private_key:
@@ -133,11 +155,18 @@ class BlockchainTask(ModelBase):
 
     signing_wallet_id = Column(Integer, ForeignKey(BlockchainWallet.id))
 
-    reverses_id = Column(Integer, ForeignKey('blockchain_task.id'))
+    reverses_id = Column(Integer, ForeignKey('blockchain_task.id'), index=True)
+
+    # Set on tasks that were submitted together, so they can be sent and checked as a single unit
+    batch_uuid = Column(String, index=True)
 
     # Purely for convenience to show status on single db table for debugging - use status hybrid prop in code
     status_text = Column(String)
 
+    # The lowest status of the task's transactions, kept up to date by update_task_statuses whenever a transaction
+    # changes, so that tasks can be looked up by status without aggregating over their transactions
+    _status = Column(String, index=True, default='UNSTARTED')
+
     # How many times the system has previously requested an attempt to complete a transaction for this task
     previous_invocations = Column(Integer)
 
@@ -184,22 +213,11 @@ class BlockchainTask(ModelBase):
 
     @hybrid_property
     def status(self):
-        lowest_status_code = min(set(t.status_code for t in self.transactions) or [3])
-        return STATUS_INT_TO_STRING.get(lowest_status_code, 'UNSTARTED')
+        return self._status or 'UNSTARTED'
 
     @status.expression
     def status(cls):
-        return (
-            case(
-                STATUS_INT_TO_STRING,
-                value=(
-                    select([func.min(BlockchainTransaction.status_code)])
-                        .where(BlockchainTransaction.blockchain_task_id == cls.id)
-                        .label('lowest_status')
-                ),
-                else_='UNSTARTED'
-            )
-        )
+        return cls._status
 
     def __init__(self, uuid: UUID, **kwargs):
         super(BlockchainTask, self).__init__(**kwargs)
@@ -217,7 +235,7 @@ class BlockchainTransaction(ModelBase):
     block = Column(Integer)
     submitted_date = Column(DateTime)
     mined_date = Column(DateTime)
-    hash = Column(String)
+    hash = Column(String, index=True)
     contract_address = Column(String)
     nonce = Column(Integer)
     nonce_consumed = Column(Boolean, default=False)
@@ -230,6 +248,9 @@ class BlockchainTransaction(ModelBase):
 
     blockchain_task_id = Column(Integer, ForeignKey(BlockchainTask.id))
 
+    __table_args__ = (Index('ix_blockchain_transaction_signing_wallet_id_nonce', 'signing_wallet_id', 'nonce'),
+                      Index('ix_blockchain_transaction_blockchain_task_id__status', 'blockchain_task_id', '_status'))
+
     @hybrid_property
     def status(self):
         return self._status
@@ -258,4 +279,63 @@ class BlockchainTransaction(ModelBase):
 
     def __repr__(self):
         return ('<BlockchainTransaction ID:{} Nonce:{} Status: {}>'
-                .format(self.id, self.nonce, self.status))
\ No newline at end of file
+                .format(self.id, self.nonce, self.status))
+
+
+def update_task_statuses(session, task_ids):
+    """
+    Sets the status of each task to the lowest status of its transactions, or UNSTARTED if it has none
+    """
+    if not task_ids:
+        return
+
+    task_table = BlockchainTask.__table__
+
+    lowest_status_code = (
+        select([func.min(BlockchainTransaction.status_code)])
+            .where(BlockchainTransaction.blockchain_task_id == task_table.c.id)
+            .as_scalar()
+    )
+
+    session.execute(
+        task_table.update()
+            .where(task_table.c.id.in_(task_ids))
+            .values(_status=case(STATUS_INT_TO_STRING, value=lowest_status_code, else_='UNSTARTED'))
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changed_task_statuses(session, flush_context):
+    # History is still available here, and is reset before after_flush_postexec
+    task_ids = session.info.setdefault('changed_status_task_ids', set())
+
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(instance, BlockchainTransaction):
+            continue
+
+        state = inspect(instance)
+        task_id_history = state.attrs.blockchain_task_id.history
+
+        if (
+                instance in session.new
+                or instance in session.deleted
+                or state.attrs._status.history.has_changes()
+                or task_id_history.has_changes()
+        ):
+            # Both the task a transaction has moved from, and the one it's now on, which relationship syncing may
+            # have set without history
+            task_ids.update(task_id_history.sum())
+            task_ids.add(state.dict.get('blockchain_task_id'))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def apply_changed_task_statuses(session, flush_context):
+    task_ids = {task_id for task_id in session.info.pop('changed_status_task_ids', set()) if task_id is not None}
+    if not task_ids:
+        return
+
+    update_task_statuses(session, task_ids)
+
+    for instance in session.identity_map.values():
+        if isinstance(instance, BlockchainTask) and instance.id in task_ids:
+            session.expire(instance, ['_status'])
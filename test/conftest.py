@@ -448,14 +448,13 @@ def init_database():
     yield db  # this is where the testing happens!
 
     with current_app.app_context():
-        try:
-            db.session.execute('DROP MATERIALIZED VIEW IF EXISTS search_view;')
-            db.session.commit()
-        except:
-            pass
         db.session.remove()  # DO NOT DELETE THIS LINE. We need to close sessions before dropping tables.
         db.drop_all()
 
+    # Sessions are kept outside the database, so are cleared along with it
+    from server.utils.ussd.session_store import ussd_session_store
+    ussd_session_store.clear()
+
 
 @pytest.fixture(autouse=True)
 def mock_sms_apis(mocker):
@@ -480,6 +479,19 @@ def mock_pusher(mocker):
 def mock_amazon_ses(mocker):
     mocker.patch('server.utils.amazon_ses.ses_email_handler')
 
+
+@pytest.fixture(scope='function')
+def count_sql_statements(test_client):
+    """
+    Counts the SQL statements run inside a block:
+        with count_sql_statements() as counter:
+            ...
+        assert counter.count == 3
+    """
+    from server.utils.statement_counter import count_sql_statements
+
+    return partial(count_sql_statements, db.engine)
+
 @pytest.fixture(scope="module")
 def monkeymodule(request):
     from _pytest.monkeypatch import MonkeyPatch
@@ -1,4 +1,5 @@
-import pytest, json
+import pytest, json, time
+from server import red
 from server.utils.auth import get_complete_auth_token
 
 
@@ -88,6 +89,96 @@ def test_create_credit_transfer(test_client, authed_sempo_admin_user, create_tra
             assert isinstance(data['credit_transfer'], object)
 
 
+def test_bulk_transfer_job(test_client, authed_sempo_admin_user, create_transfer_account_user, mocker):
+    from server.models.credit_transfer import CreditTransfer
+    from server.utils import bulk_transfer
+    from server.utils.bulk_transfer import BulkTransferJob
+
+    authed_sempo_admin_user.set_held_role('ADMIN', 'admin')
+    auth = get_complete_auth_token(authed_sempo_admin_user)
+
+    # Run the job after the request instead of in the background, so that it can be checked
+    submit = mocker.patch.object(bulk_transfer.run_bulk_transfer_job, 'submit')
+
+    response = test_client.post(
+        '/api/v1/credit_transfer/bulk/',
+        headers=dict(Authorization=auth, Accept='application/json'),
+        data=json.dumps(dict(
+            transfer_amount=10,
+            recipient_transfer_accounts_ids=[create_transfer_account_user.transfer_account.id, 1222103],
+            transfer_type='DISBURSEMENT'
+        )),
+        content_type='application/json', follow_redirects=True)
+
+    assert response.status_code == 202
+    job_id = response.json['data']['bulk_transfer_job']['job_id']
+    assert response.json['data']['bulk_transfer_job']['status'] == 'PENDING'
+    assert response.json['data']['bulk_transfer_job']['total'] == 2
+
+    args, kwargs = submit.call_args
+    bulk_transfer.run_bulk_transfer_job(*args, **kwargs)
+
+    response = test_client.get(
+        f'/api/v1/credit_transfer/bulk/{job_id}/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 200
+    job = response.json['data']['bulk_transfer_job']
+    assert job['status'] == 'COMPLETE'
+    assert job['processed'] == 2
+    assert job['succeeded'] == 1
+    assert job['failed'] == 1
+    assert job['errors'][0]['transfer_account_id'] == 1222103
+
+    # Only stopped jobs can be resumed
+    response = test_client.put(
+        f'/api/v1/credit_transfer/bulk/{job_id}/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 400
+
+    # A job that stopped after committing its chunk, but before recording progress, as when its worker is recycled
+    red.hmset(f'BulkTransferJob-{job_id}', dict(
+        status='PROCESSING', last_updated=int(time.time()) - 60 * 60, processed=0, succeeded=0, failed=0
+    ))
+    red.delete(f'BulkTransferJob-{job_id}-Results')
+
+    # Can't be resumed while a runner still holds its lock
+    red.set(f'BulkTransferJob-{job_id}-Lock', 'runner')
+
+    response = test_client.put(
+        f'/api/v1/credit_transfer/bulk/{job_id}/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 400
+
+    red.delete(f'BulkTransferJob-{job_id}-Lock')
+
+    response = test_client.put(
+        f'/api/v1/credit_transfer/bulk/{job_id}/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 202
+    assert response.json['data']['bulk_transfer_job']['status'] == 'PENDING'
+    assert submit.call_args == ((job_id,), dict(authorising_user_id=authed_sempo_admin_user.id))
+
+    # The recipient already transferred to isn't paid again
+    args, kwargs = submit.call_args
+    bulk_transfer.run_bulk_transfer_job(*args, **kwargs)
+
+    job = BulkTransferJob(job_id).get_status()
+    assert job['status'] == 'COMPLETE'
+    assert job['succeeded'] == 1
+    assert job['failed'] == 1
+    assert CreditTransfer.query.filter(CreditTransfer.uuid.like(f'{job_id}-%')).count() == 1
+
+    response = test_client.get(
+        '/api/v1/credit_transfer/bulk/not-a-job/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 404
+
+
 @pytest.mark.parametrize("credit_transfer_selector_func, status_code", [
     (lambda o: o.id, 200),
     (lambda o: 1222103, 404),
@@ -111,3 +202,92 @@ def test_get_credit_transfer(test_client, complete_admin_auth_token, create_cred
     if not credit_transfer_selector_func(create_credit_transfer):
         assert isinstance(response.json['data']['credit_transfers'], list)
 
+
+
+def test_get_credit_transfers_by_cursor(test_client, complete_admin_auth_token, create_credit_transfer):
+    def get_transfers(query_string):
+        response = test_client.get(
+            f'/api/v1/credit_transfer/?{query_string}',
+            headers=dict(
+                Authorization=complete_admin_auth_token,
+                Accept='application/json'
+            ))
+        return response
+
+    all_ids = [t['id'] for t in get_transfers('').json['data']['credit_transfers']]
+    assert len(all_ids) > 1
+
+    # Walking the cursors a page at a time returns every transfer once, most recent first
+    paged_ids = []
+    response = get_transfers(f'per_page=1&after_id={all_ids[0] + 1}')
+    while True:
+        assert response.status_code == 200
+        paged_ids.extend(t['id'] for t in response.json['data']['credit_transfers'])
+        next_cursor = response.json['next_cursor']
+        if next_cursor is None:
+            break
+        response = get_transfers(f'per_page=1&cursor={next_cursor}')
+
+    assert paged_ids == all_ids
+
+    response = get_transfers(f'per_page=1&before_id={all_ids[-1]}')
+    assert [t['id'] for t in response.json['data']['credit_transfers']] == [all_ids[-2]]
+    assert response.json['next_cursor'] is not None
+
+    response = get_transfers('cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.json['message'] == 'Invalid cursor'
+
+    response = get_transfers('after_id=abc')
+    assert response.status_code == 400
+    assert response.json['message'] == 'Invalid after_id: must be an integer'
+
+
+def test_get_credit_transfers_default_page_size(test_client, complete_admin_auth_token, create_credit_transfer,
+                                                mocker):
+    """
+    When credit transfers are requested without a page size
+    check at most MAX_PAGE_SIZE of them are returned, rather than every transfer
+    """
+    import config
+    mocker.patch.object(config, 'MAX_PAGE_SIZE', 1)
+
+    response = test_client.get(
+        '/api/v1/credit_transfer/',
+        headers=dict(
+            Authorization=complete_admin_auth_token,
+            Accept='application/json'
+        ))
+
+    assert response.status_code == 200
+    assert len(response.json['data']['credit_transfers']) == 1
+    assert response.json['pages'] > 1
+
+
+def test_get_credit_transfers_statement_count(test_client, complete_admin_auth_token, create_credit_transfer,
+                                              count_sql_statements):
+    """
+    When a page of credit transfers is requested
+    check the number of SQL statements doesn't grow with the page size
+    """
+    def get_transfers(per_page):
+        response = test_client.get(
+            f'/api/v1/credit_transfer/?per_page={per_page}',
+            headers=dict(
+                Authorization=complete_admin_auth_token,
+                Accept='application/json'
+            ))
+        assert response.status_code == 200
+        return response.json['data']['credit_transfers']
+
+    page_size = len(get_transfers(50))
+    assert page_size > 1
+
+    with count_sql_statements() as single_page:
+        assert len(get_transfers(1)) == 1
+
+    with count_sql_statements() as full_page:
+        assert len(get_transfers(page_size)) == page_size
+
+    # The authorising user preload is skipped when no transfer on the page has one, so allow for it
+    assert single_page.count <= full_page.count <= single_page.count + 1
@@ -0,0 +1,106 @@
+import json
+
+from server.models.user import User
+from server.utils.auth import get_complete_auth_token
+
+
+def test_user_import_job(test_client, authed_sempo_admin_user, create_transfer_account_user, mocker):
+    from server.utils import user_import
+
+    authed_sempo_admin_user.set_held_role('ADMIN', 'admin')
+    auth = get_complete_auth_token(authed_sempo_admin_user)
+
+    # Run the job after the request instead of in the background, so that it can be checked
+    submit = mocker.patch.object(user_import.run_user_import_job, 'submit')
+
+    response = test_client.post(
+        '/api/v1/dataset/import/',
+        headers=dict(Authorization=auth, Accept='application/json'),
+        data=json.dumps(dict(
+            headerPositions={'0': 'first_name', '1': 'phone', '2': 'Shoe_Size'},
+            data=[
+                {'0': 'Imported', '1': '+61 400 000 222', '2': '42'},
+                {'0': 'Renamed', '1': create_transfer_account_user.phone},
+                {'0': 'No Identifier'},
+                {},
+                # A second row for the same phone updates the user created by the first
+                {'0': 'Imported Again', '1': '+61 400 000 222'},
+            ]
+        )),
+        content_type='application/json', follow_redirects=True)
+
+    assert response.status_code == 202
+    job_id = response.json['data']['user_import_job']['job_id']
+    assert response.json['data']['user_import_job']['status'] == 'PENDING'
+    assert response.json['data']['user_import_job']['total'] == 4
+
+    args, kwargs = submit.call_args
+    user_import.run_user_import_job(*args, **kwargs)
+
+    response = test_client.get(
+        f'/api/v1/dataset/import/{job_id}/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 200
+    job = response.json['data']['user_import_job']
+    assert job['status'] == 'COMPLETE'
+    assert job['processed'] == 4
+    assert job['created'] == 1
+    assert job['updated'] == 2
+    assert job['failed'] == 1
+    assert job['diagnostics'] == [{'row': 2, 'message': 'Must provide a unique identifier', 'status': 400}]
+
+    imported = User.query.execution_options(show_all=True).filter_by(phone='+61400000222').one()
+    assert imported.first_name == 'Imported Again'
+    assert imported.default_transfer_account is not None
+    assert {a.name: a.value for a in imported.custom_attributes} == {'shoe_size': '42'}
+    assert create_transfer_account_user.first_name == 'Renamed'
+
+    # Only stopped jobs can be resumed
+    response = test_client.put(
+        f'/api/v1/dataset/import/{job_id}/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 400
+
+    response = test_client.get(
+        '/api/v1/dataset/import/not-a-job/',
+        headers=dict(Authorization=auth, Accept='application/json'))
+
+    assert response.status_code == 404
+
+
+def test_dataset_import_reports_every_row(test_client, authed_sempo_admin_user, create_transfer_account_user):
+    authed_sempo_admin_user.set_held_role('ADMIN', 'admin')
+    auth = get_complete_auth_token(authed_sempo_admin_user)
+
+    response = test_client.post(
+        '/api/v1/dataset/',
+        headers=dict(Authorization=auth, Accept='application/json'),
+        data=json.dumps(dict(
+            headerPositions={
+                '0': 'first_name', '1': 'phone', '2': 'public_serial_number', '3': 'use_precreated_pin',
+                '4': 'referred_by', '5': 'registration_method'
+            },
+            data=[
+                {'0': 'Created', '1': '+61 400 000 333'},
+                {'0': 'No Card', '1': '+61 400 000 334', '2': 'NOTACARD', '3': True},
+                # Can't be written, so the chunk is retried row by row without it
+                {'0': 'Bad Method', '1': '+61 400 000 335', '5': 'NOT_A_METHOD'},
+                {'0': 'Referred', '1': '+61 400 000 336', '4': create_transfer_account_user.phone},
+            ]
+        )),
+        content_type='application/json', follow_redirects=True)
+
+    assert response.status_code == 201
+    diagnostics = [tuple(diagnostic) for diagnostic in response.json['diagnostics']]
+    assert diagnostics[0] == ('User Created', 200)
+    assert diagnostics[1] == ('Transfer card not found', 400)
+    assert diagnostics[2][1] == 400
+    assert diagnostics[3] == ('User Created', 200)
+
+    users = User.query.execution_options(show_all=True)
+    assert users.filter_by(phone='+61400000333').one().first_name == 'Created'
+    assert users.filter_by(phone='+61400000334').first() is None
+    assert users.filter_by(phone='+61400000335').first() is None
+    assert users.filter_by(phone='+61400000336').one().referred_by == [create_transfer_account_user]
@@ -8,33 +8,6 @@ from server.utils.user import create_transfer_account_user, set_custom_attribute
 from server import db
 
 def prep_search_api(test_client, complete_admin_auth_token, create_organisation):
-    # This is a hack because the test DB isn't being built with migrations (and thus doesn't have tsvectors)
-    db.session.execute("drop table search_view;")
-    db.session.commit()
-    db.session.execute('''
-        CREATE MATERIALIZED VIEW search_view AS (
-            SELECT
-                u.id,
-                u.email,
-                u._phone,
-                u.first_name,
-                u.last_name,
-                u._public_serial_number,
-                u._location,
-                u.primary_blockchain_address,
-                u.default_transfer_account_id,
-                to_tsvector(u.email) AS tsv_email,
-                to_tsvector(u._phone) AS tsv_phone,
-                to_tsvector(u.first_name) AS tsv_first_name,
-                to_tsvector(u.last_name) AS tsv_last_name,
-                to_tsvector(u._public_serial_number) AS tsv_public_serial_number,
-                to_tsvector(u._location) AS tsv_location,
-                to_tsvector(u.primary_blockchain_address) AS tsv_primary_blockchain_address,
-                to_tsvector(CAST (u.default_transfer_account_id AS VARCHAR(10))) AS tsv_default_transfer_account_id
-            FROM "user" u
-        );
-    ''')
-
     # Adds users we're searching for
     create_transfer_account_user(first_name='Michiel',
                                     last_name='deRoos',
@@ -55,9 +28,8 @@ def prep_search_api(test_client, complete_admin_auth_token, create_organisation)
                                     organisation=create_organisation,
                                     initial_disbursement = 200)
 
+    # The search index is kept up to date as users are flushed, so no refresh is needed
     db.session.commit()
-    # Manually refresh tsvectors because the test DB has no triggers either
-    db.session.execute("REFRESH MATERIALIZED VIEW search_view;")
 
 @pytest.mark.parametrize("search_term, results", [
     ('', ['Roy', 'Francine', 'Michiel']), # Empty string should return everyone
@@ -105,7 +77,7 @@ def filtered_search(search_term, filters, results, test_client, complete_admin_a
     assert results == user_names
 
 def tear_down():
-    db.session.execute('DROP MATERIALIZED VIEW search_view CASCADE;')
+    db.session.execute('DELETE FROM search_index;')
     db.session.flush()
     db.session.commit()
 
@@ -10,7 +10,7 @@ from helpers.factories import UserFactory, TransferUsageFactory, OrganisationFac
 from server.models.token import Token
 from server.models.transfer_usage import TransferUsage
 from server.models.user import User, RegistrationMethodEnum
-from server.models.ussd import UssdSession
+from server.utils.ussd.session_store import ussd_session_store
 from server.utils.credit_transfer import make_payment_transfer
 from server.utils.user import default_transfer_account, create_user_without_transfer_account
 from server.utils.auth import get_complete_auth_token
@@ -53,7 +53,7 @@ def req(text,
 
 
 def get_session():
-    return UssdSession.query.filter_by(session_id=session_id).first()
+    return ussd_session_store.get(session_id)
 
 
 def test_golden_path_send_token(mocker, test_client, init_database, initialised_blockchain_network, init_seed):
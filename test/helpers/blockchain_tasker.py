@@ -47,6 +47,10 @@ class MockBlockchainTasker(object):
     def make_token_transfer(*args, **kwargs):
         return MockBlockchainTasker._generic_task()
 
+    @staticmethod
+    def make_token_transfers_batch(signing_address, token, transfers, *args, **kwargs):
+        return [MockBlockchainTasker._generic_task() for _ in transfers]
+
     @staticmethod
     def make_approval(*args, **kwargs):
         return MockBlockchainTasker._generic_task()
@@ -59,6 +63,14 @@ class MockBlockchainTasker(object):
     def get_conversion_amount(from_amount, *args, **kwargs):
         return random.random() * from_amount
 
+    @staticmethod
+    def call_contract_functions(calls, *args, **kwargs):
+        return [int(10e18) for _ in calls]
+
+    @staticmethod
+    def get_exchange_curve_states(exchange_contract, tokens, *args, **kwargs):
+        return [(int(1e24), int(1e23), 250000) for _ in tokens]
+
     @staticmethod
     def get_token_decimals(*args, **kwargs):
         return 18
@@ -19,6 +19,33 @@ def test_new_credit_transfer_complete(create_credit_transfer):
     assert create_credit_transfer.transfer_status is TransferStatusEnum.COMPLETE
 
 
+def test_batched_credit_transfer_payloads(create_credit_transfer, other_new_credit_transfer):
+    """
+    GIVEN CreditTransfer models
+    WHEN they are resolved with their blockchain payloads batched
+    THEN check no payload is sent on resolve, and each transfer gets its own task uuid once the batch is sent
+    """
+    from server.models.credit_transfer import CreditTransfer
+    from server.utils.transfer_enums import TransferStatusEnum
+
+    # Limits aren't under test here
+    create_credit_transfer.sender_user.set_held_role('ADMIN', 'sempoadmin')
+
+    transfers = [create_credit_transfer, other_new_credit_transfer]
+    for transfer in transfers:
+        transfer.transfer_status = TransferStatusEnum.PENDING
+        transfer.blockchain_task_uuid = None
+        transfer.resolve_as_completed(batch_blockchain_payload=True)
+        assert transfer.blockchain_task_uuid is None
+
+    CreditTransfer.send_blockchain_payloads_to_worker_in_batches(transfers)
+
+    assert all(t.blockchain_task_uuid is not None for t in transfers)
+    assert create_credit_transfer.blockchain_task_uuid != other_new_credit_transfer.blockchain_task_uuid
+
+    create_credit_transfer.sender_user.set_held_role('ADMIN', None)
+
+
 def test_new_credit_transfer_rejected(create_credit_transfer):
     """
     GIVEN a CreditTransfer model
@@ -116,6 +143,84 @@ def test_new_credit_transfer_check_sender_transfer_limits(create_credit_transfer
     ]
 
 
+def test_transfer_limit_rolling_totals(create_credit_transfer):
+    """
+    GIVEN a CreditTransfer model
+    WHEN its sender's rolling limit totals are read from the daily rollups
+    THEN check they match aggregating the sender's transfers directly, including after the transfer is rejected
+    """
+    from sqlalchemy.sql import func
+    from server import db
+    from server.models.credit_transfer import CreditTransfer
+    from server.utils.transfer_limits import LIMITS
+
+    def direct_totals(limit):
+        return limit.apply_all_filters(
+            create_credit_transfer,
+            db.session.query(func.sum(CreditTransfer.transfer_amount), func.count(CreditTransfer.id))
+        ).execution_options(show_all=True).first()
+
+    for limit in LIMITS:
+        total, count = direct_totals(limit)
+        assert limit.rolling_totals(create_credit_transfer) == (pytest.approx(float(total or 0)), count)
+
+    create_credit_transfer.resolve_as_rejected()
+
+    for limit in LIMITS:
+        total, count = direct_totals(limit)
+        assert limit.rolling_totals(create_credit_transfer) == (pytest.approx(float(total or 0)), count)
+
+
+def test_transfer_stats_rollups(create_credit_transfer):
+    """
+    GIVEN a CreditTransfer model
+    WHEN the transfer is resolved
+    THEN check it's added to the daily stats rollup and the sender's daily stats rollup of each of its organisations,
+         with its transfer use encoded the same way as the rollups were backfilled
+    """
+    from sqlalchemy.sql import func
+    from server import db
+    from server.models.transfer_stats_rollup import TransferStatsRollup, SenderTransferStatsRollup
+
+    # Postgres orders JSON keys by length before name, where json.dumps(sort_keys=True) would put 'bb' first
+    create_credit_transfer.transfer_use = {'bb': 1, 'c': 2}
+    transfer_use = '{"c": 2, "bb": 1}'
+
+    def rollup_totals(organisation):
+        daily = db.session.query(
+            func.coalesce(func.sum(TransferStatsRollup.total_amount_wei), 0),
+            func.coalesce(func.sum(TransferStatsRollup.transfer_count), 0)
+        ).filter(
+            TransferStatsRollup.organisation_id == organisation.id,
+            TransferStatsRollup.transfer_status == 'COMPLETE',
+            TransferStatsRollup.transfer_use == transfer_use
+        ).first()
+
+        sender = db.session.query(
+            func.coalesce(func.sum(SenderTransferStatsRollup.total_amount_wei), 0),
+            func.coalesce(func.sum(SenderTransferStatsRollup.transfer_count), 0)
+        ).filter(
+            SenderTransferStatsRollup.organisation_id == organisation.id,
+            SenderTransferStatsRollup.sender_user_id == create_credit_transfer.sender_user_id,
+            SenderTransferStatsRollup.transfer_use == transfer_use
+        ).first()
+
+        return tuple(daily), tuple(sender)
+
+    organisations = create_credit_transfer.organisations
+    assert organisations
+
+    before = {o.id: rollup_totals(o) for o in organisations}
+
+    create_credit_transfer.resolve_as_completed()
+    db.session.flush()
+
+    for organisation in organisations:
+        for (total, count), (total_before, count_before) in zip(rollup_totals(organisation), before[organisation.id]):
+            assert count == count_before + 1
+            assert total == total_before + create_credit_transfer._transfer_amount_wei
+
+
 def test_new_credit_transfer_check_sender_transfer_limits_for_exchange(create_credit_transfer):
     # Check Limits skipped if no sender user (exchange)
     create_credit_transfer.sender_user = None
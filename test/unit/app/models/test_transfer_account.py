@@ -95,4 +95,24 @@ def test_decrement_balance(test_client, init_database, create_master_organisatio
 
     ta_queried.decrement_balance(decrement_amount)
 
-    assert ta_queried.balance == expected_final_bal
\ No newline at end of file
+    assert ta_queried.balance == expected_final_bal
+
+def test_transfer_account_summary_query_options(create_transfer_account_user):
+    """
+    GIVEN A transfer account model
+    WHEN transfer accounts are listed with the summary loader options
+    THEN check they dump the same as with the default loading
+    """
+    from server.models.transfer_account import TransferAccount
+    from server.schemas import transfer_accounts_schema
+
+    transfer_account_id = create_transfer_account_user.transfer_account.id
+
+    default = TransferAccount.query.execution_options(show_all=True)\
+        .filter(TransferAccount.id == transfer_account_id).all()
+    summary = TransferAccount.query.execution_options(show_all=True)\
+        .options(*TransferAccount.summary_query_options())\
+        .filter(TransferAccount.id == transfer_account_id).all()
+
+    assert transfer_accounts_schema.dump(summary).data == transfer_accounts_schema.dump(default).data
+    assert transfer_accounts_schema.dump(summary).data[0]['users']
@@ -130,6 +130,39 @@ def test_valid_tfa_token(authed_sempo_admin_user):
             is not None)
 
 
+def test_organisation_query_filter(create_transfer_account_user, create_organisation, external_reserve_token):
+    """
+    GIVEN a User in an organisation
+    WHEN users are queried with different active organisations
+    THEN check the user is only visible from their own organisation, including through an alias
+    """
+    from flask import g
+    from sqlalchemy.orm import aliased
+    from server import db
+    from server.models.organisation import Organisation
+    from server.models.user import User
+
+    user = create_transfer_account_user
+    other_organisation = Organisation(name='Other', token=external_reserve_token, country_code='US')
+    db.session.add(other_organisation)
+    db.session.commit()
+
+    previous_active_organisation = getattr(g, 'active_organisation', None)
+    try:
+        g.active_organisation = create_organisation
+        assert User.query.filter_by(id=user.id).first() is user
+        assert db.session.query(aliased(User)).filter_by(id=user.id).first() is user
+
+        g.active_organisation = other_organisation
+        assert User.query.filter_by(id=user.id).first() is None
+
+        g.active_organisation = None
+        assert User.query.filter_by(id=user.id).first() is None
+        assert User.query.execution_options(show_all=True).filter_by(id=user.id).first() is user
+    finally:
+        g.active_organisation = previous_active_organisation
+
+
 def test_delete_user_and_transfer_account(create_transfer_account_user):
     """
     GIVEN a User Model
@@ -8,3 +8,50 @@ def test_data(test_client, init_database):
     session.set_data('fizz', 'buzz')
     assert session.get_data('fizz') == 'buzz'
     assert session.get_data('foo') == 'bar'
+
+
+def test_ussd_menu_cache(test_client, init_database):
+    from server import db
+    from server.models.ussd import UssdMenu
+
+    parent = UssdMenu(name='cached_parent', display_key='cached_parent')
+    db.session.add(parent)
+    db.session.commit()
+
+    child = UssdMenu(name='cached_child', display_key='cached_child', parent_id=parent.id)
+    db.session.add(child)
+    db.session.commit()
+
+    # Menus are merged into the current session, rather than being loaded by each hop
+    assert UssdMenu.find_by_name('cached_child') is child
+    assert UssdMenu.find_by_name('cached_child').parent() is parent
+
+    db.session.expunge(child)
+    menu = UssdMenu.find_by_name('cached_child')
+    assert menu is not child
+    assert menu.id == child.id
+    assert menu.display_key == 'cached_child'
+
+    # Changes are picked up once committed
+    menu.display_key = 'changed'
+    db.session.commit()
+    db.session.expunge(menu)
+    assert UssdMenu.find_by_name('cached_child').display_key == 'changed'
+
+
+def test_ussd_menu_cache_miss(test_client, init_database, mocker):
+    from server.models.ussd import MENU_MISS_RELOAD_INTERVAL, ussd_menu_cache
+
+    ussd_menu_cache.clear()
+    assert ussd_menu_cache.get(name='not_a_menu') is None
+
+    # Unknown names don't each reload the cache
+    load = mocker.spy(ussd_menu_cache, '_load')
+    assert ussd_menu_cache.get(name='not_a_menu') is None
+    assert ussd_menu_cache.get(name='not_a_menu') is None
+    assert load.call_count == 0
+
+    ussd_menu_cache.loaded_at -= MENU_MISS_RELOAD_INTERVAL + 1
+    assert ussd_menu_cache.get(name='not_a_menu') is None
+    assert ussd_menu_cache.get(name='not_a_menu') is None
+    assert load.call_count == 1
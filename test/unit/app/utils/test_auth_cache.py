@@ -0,0 +1,37 @@
+"""
+This file (test_auth_cache.py) contains the unit tests for the auth_cache.py file in utils dir.
+"""
+
+
+def test_auth_snapshot_cache(create_transfer_account_user):
+    """
+    GIVEN an AuthSnapshotCache
+    WHEN a user's snapshot is cached, and then the user or any organisation changes
+    THEN check the snapshot matches the user, and is dropped by each change
+    """
+    from server import db
+    from server.utils.auth_cache import auth_snapshot_cache
+
+    user = create_transfer_account_user
+
+    snapshot = auth_snapshot_cache.get_or_build(user)
+    assert snapshot['is_disabled'] is False
+    assert snapshot['member_organisation_ids'] == [org.id for org in user.organisations]
+    assert auth_snapshot_cache.get(user.id) == snapshot
+
+    # Changes that auth doesn't depend on keep the snapshot
+    user.first_name = user.first_name + 'x'
+    db.session.commit()
+    assert auth_snapshot_cache.get(user.id) == snapshot
+
+    user.is_disabled = True
+    db.session.commit()
+    assert auth_snapshot_cache.get(user.id) is None
+    assert auth_snapshot_cache.get_or_build(user)['is_disabled'] is True
+
+    user.is_disabled = False
+    db.session.commit()
+    assert auth_snapshot_cache.get_or_build(user)['is_disabled'] is False
+
+    auth_snapshot_cache.invalidate_organisations()
+    assert auth_snapshot_cache.get(user.id) is None
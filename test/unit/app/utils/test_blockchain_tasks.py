@@ -0,0 +1,59 @@
+"""
+This file (test_blockchain_tasks.py) contains the unit tests for the blockchain_tasks.py file in utils dir.
+"""
+import config
+
+
+def test_create_blockchain_wallet_from_pool(test_client, mocker):
+    """
+    GIVEN a BlockchainTasker
+    WHEN wallets are created while the worker has filled the wallet pool
+    THEN check pooled wallets are claimed once each, and the worker is only asked for one when the pool is empty,
+    or other settings are wanted
+    """
+    from server import red
+    from server.utils.blockchain_tasks import BlockchainTasker
+
+    mocker.patch.object(config, 'WALLET_POOL_SIZE', 2)
+
+    tasker = BlockchainTasker()
+    create = mocker.patch.object(tasker, '_execute_synchronous_celery', return_value='0xNew')
+    mocker.patch.object(tasker, 'topup_wallet_if_required')
+
+    red.delete(config.WALLET_POOL_KEY)
+    red.rpush(config.WALLET_POOL_KEY, '0xPooled1', '0xPooled2')
+
+    assert tasker.create_blockchain_wallet() == '0xPooled1'
+    assert tasker.create_blockchain_wallet(wei_target_balance=0, wei_topup_threshold=0) == '0xNew'
+    assert tasker.create_blockchain_wallet(private_key='0xKey') == '0xNew'
+    assert tasker.create_blockchain_wallet() == '0xPooled2'
+    assert create.call_count == 2
+
+    # An empty pool falls back to creating a wallet on the worker
+    assert tasker.create_blockchain_wallet() == '0xNew'
+    assert create.call_count == 3
+
+
+def test_create_blockchain_wallet_pool_disabled(test_client, mocker):
+    """
+    GIVEN a BlockchainTasker
+    WHEN a wallet is created with the wallet pool turned off
+    THEN check the worker is asked for the wallet, and the pool isn't touched
+    """
+    from server import red
+    from server.utils.blockchain_tasks import BlockchainTasker
+
+    mocker.patch.object(config, 'WALLET_POOL_SIZE', 0)
+
+    tasker = BlockchainTasker()
+    create = mocker.patch.object(tasker, '_execute_synchronous_celery', return_value='0xNew')
+    mocker.patch.object(tasker, 'topup_wallet_if_required')
+
+    red.delete(config.WALLET_POOL_KEY)
+    red.rpush(config.WALLET_POOL_KEY, '0xPooled1')
+
+    assert tasker.create_blockchain_wallet() == '0xNew'
+    assert create.call_count == 1
+    assert red.llen(config.WALLET_POOL_KEY) == 1
+
+    red.delete(config.WALLET_POOL_KEY)
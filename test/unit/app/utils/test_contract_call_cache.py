@@ -0,0 +1,59 @@
+"""
+This file (test_contract_call_cache.py) contains the unit tests for the contract_call_cache.py file in utils dir.
+"""
+import os
+
+
+def test_contract_call_cache(test_client):
+    """
+    GIVEN a ContractCallCache
+    WHEN read only calls are cached, and a contract is invalidated
+    THEN check mutable results are dropped, immutable results are kept, and hits and misses are counted
+    """
+    from server import red
+    from server.utils.contract_call_cache import ContractCallCache
+
+    cache = ContractCallCache(red)
+    cache.reset_stats()
+
+    # Immutable results outlive the test, so use a fresh contract each run
+    contract_address = '0x' + os.urandom(20).hex()
+
+    calls = []
+
+    def call(result):
+        def _call():
+            calls.append(result)
+            return result
+        return _call
+
+    assert cache.get_or_call(contract_address, 'decimals', None, call(18)) == 18
+    assert cache.get_or_call(contract_address, 'decimals', None, call(18)) == 18
+    assert cache.get_or_call(contract_address, 'balanceOf', ['0xA'], call(100)) == 100
+    assert cache.get_or_call(contract_address, 'balanceOf', ['0xA'], call(100)) == 100
+    assert cache.get_or_call(contract_address, 'balanceOf', ['0xB'], call(5)) == 5
+    assert calls == [18, 100, 5]
+
+    # Functions that aren't known to be read only are never cached
+    assert cache.get_or_call(contract_address, 'allowance', ['0xA', '0xB'], call(1)) == 1
+    assert cache.get_or_call(contract_address, 'allowance', ['0xA', '0xB'], call(1)) == 1
+    assert calls == [18, 100, 5, 1, 1]
+
+    cache.invalidate_contract(contract_address)
+
+    assert cache.get_or_call(contract_address, 'decimals', None, call(18)) == 18
+    assert cache.get_or_call(contract_address, 'balanceOf', ['0xA'], call(200)) == 200
+    assert calls == [18, 100, 5, 1, 1, 200]
+
+    assert cache.stats() == {
+        'decimals': {'hits': 2, 'misses': 1},
+        'balanceOf': {'hits': 1, 'misses': 3}
+    }
+
+    # A result fetched while its contract is invalidated isn't served for the contract's new version
+    def invalidating_call():
+        cache.invalidate_contract(contract_address)
+        return 300
+
+    assert cache.get_or_call(contract_address, 'balanceOf', ['0xA'], invalidating_call) == 300
+    assert cache.get_or_call(contract_address, 'balanceOf', ['0xA'], call(400)) == 400
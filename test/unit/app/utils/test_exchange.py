@@ -0,0 +1,94 @@
+import pytest
+
+from server.utils.exchange import (
+    CurveSnapshot,
+    bonding_curve_reserve_to_tokens,
+    bonding_curve_tokens_to_reserve,
+    bonding_curve_token1_to_token2,
+    bonding_curve_reserve_required_for_tokens,
+    bonding_curve_tokens_required_for_reserve,
+    bonding_curve_token1_required_for_token2
+)
+
+
+@pytest.mark.parametrize("supply, reserve, reserve_ratio_ppm, amount", [
+    (1e24, 1e23, 250000, 1e18),
+    (1e24, 1e23, 250000, 5e22),
+    (2e21, 7e20, 500000, 3e19),
+    (1e24, 1e23, 1000000, 1e18),
+])
+def test_bonding_curve_inverses(supply, reserve, reserve_ratio_ppm, amount):
+    required_reserve = bonding_curve_reserve_required_for_tokens(supply, reserve, reserve_ratio_ppm, amount)
+    assert bonding_curve_reserve_to_tokens(supply, reserve, reserve_ratio_ppm, required_reserve) == pytest.approx(amount)
+
+    required_tokens = bonding_curve_tokens_required_for_reserve(supply, reserve, reserve_ratio_ppm, amount)
+    assert bonding_curve_tokens_to_reserve(supply, reserve, reserve_ratio_ppm, required_tokens) == pytest.approx(amount)
+
+
+def test_bonding_curve_token1_required_for_token2():
+    state = (1e24, 3e23, 1e23, 4e22, 250000, 400000)
+
+    required_token1 = bonding_curve_token1_required_for_token2(*state, 1e20)
+
+    assert bonding_curve_token1_to_token2(*state, required_token1) == pytest.approx(1e20)
+
+
+CURVE_STATES = [
+    # supply, reserve, reserve_ratio_ppm
+    (1e24, 1e23, 250000),
+    (3e23, 4e22, 400000),
+    (2e21, 7e20, 500000),
+    (1e24, 1e23, 1000000),
+]
+
+
+def _snapshot():
+    # The reserve token is index 0
+    return CurveSnapshot(
+        supplies=[None] + [state[0] for state in CURVE_STATES],
+        reserves=[None] + [state[1] for state in CURVE_STATES],
+        reserve_ratios_ppm=[None] + [state[2] for state in CURVE_STATES],
+        is_reserve=[True] + [False] * len(CURVE_STATES)
+    )
+
+
+def _scalar_quote(from_index, to_index, amount):
+    if from_index == 0:
+        return bonding_curve_reserve_to_tokens(*CURVE_STATES[to_index - 1], amount)
+    if to_index == 0:
+        return bonding_curve_tokens_to_reserve(*CURVE_STATES[from_index - 1], amount)
+    return bonding_curve_token1_to_token2(
+        CURVE_STATES[from_index - 1][0], CURVE_STATES[to_index - 1][0],
+        CURVE_STATES[from_index - 1][1], CURVE_STATES[to_index - 1][1],
+        CURVE_STATES[from_index - 1][2], CURVE_STATES[to_index - 1][2],
+        amount
+    )
+
+
+def test_curve_snapshot_quote():
+    snapshot = _snapshot()
+
+    pairs = [(i, j) for i in range(len(CURVE_STATES) + 1) for j in range(len(CURVE_STATES) + 1) if i != j]
+    amounts = [1e18 * (k + 1) for k in range(len(pairs))]
+
+    quotes = snapshot.quote([i for i, _ in pairs], [j for _, j in pairs], amounts)
+
+    for (i, j), amount, quote in zip(pairs, amounts, quotes):
+        assert quote == pytest.approx(_scalar_quote(i, j, amount), rel=1e-12)
+
+
+def test_curve_snapshot_quote_matrix():
+    snapshot = _snapshot()
+    n = len(CURVE_STATES) + 1
+    amounts = [1e18] * n
+
+    matrix = snapshot.quote_matrix(amounts)
+
+    assert matrix.shape == (n, n)
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                # Converting to the same token, through the reserve and back, gives the same amount
+                assert matrix[i, j] == pytest.approx(amounts[i], rel=1e-9)
+            else:
+                assert matrix[i, j] == pytest.approx(_scalar_quote(i, j, amounts[i]), rel=1e-12)
@@ -0,0 +1,38 @@
+"""
+This file (test_user_activity.py) contains the unit tests for the user_activity.py file in utils dir.
+"""
+
+
+def test_flush_user_activity(create_transfer_account_user):
+    """
+    GIVEN a user seen by several requests
+    WHEN their buffered activity is flushed
+    THEN check their last seen time is updated, and each new ip address is saved once
+    """
+    from server import db
+    from server.models.ip_address import IpAddress
+    from server.utils.user_activity import record_user_activity, flush_user_activity, get_real_ip
+
+    user = create_transfer_account_user
+    user._last_seen = None
+    db.session.commit()
+
+    assert get_real_ip(['1.2.3.4', '10.0.0.1'], num_proxy=1) == '1.2.3.4'
+    assert get_real_ip([], num_proxy=1) is None
+
+    record_user_activity(user, '203.0.113.7')
+    record_user_activity(user, '203.0.113.7')
+    record_user_activity(user, '203.0.113.8')
+    record_user_activity(user)
+
+    assert flush_user_activity() == (1, 2)
+
+    db.session.refresh(user)
+    assert user._last_seen is not None
+    ips = sorted(str(ip.ip) for ip in IpAddress.query.filter_by(user_id=user.id))
+    assert '203.0.113.7' in ips and '203.0.113.8' in ips
+
+    # Buffers are cleared by a flush, and addresses already saved aren't added again
+    assert flush_user_activity() == (0, 0)
+    record_user_activity(user, '203.0.113.7')
+    assert flush_user_activity() == (1, 0)
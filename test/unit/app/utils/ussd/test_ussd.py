@@ -1,10 +1,17 @@
 import pytest
+import time
 from functools import partial
 
-from server import db
+from server import db, red
 from helpers.factories import UserFactory, OrganisationFactory
 from server.models.ussd import UssdMenu, UssdSession
 from server.utils.ussd.ussd import menu_display_text_in_lang, create_or_update_session
+from server.utils.ussd.session_store import (
+    InMemoryUssdSessionStore,
+    RedisUssdSessionStore,
+    UssdSessionState,
+    persist_ussd_sessions,
+    ussd_session_store)
 
 
 @pytest.mark.parametrize("user_factory,expected", [
@@ -28,33 +35,94 @@ def test_create_or_update_session(test_client, init_database):
 
     user = UserFactory(phone="123")
 
-    # create a session in db
+    # create a session in the store
 
-    menu3 = UssdMenu(id=3, name='foo', display_key='foo')
-    db.session.add(menu3)
-
-    session = UssdSession(
-        session_id="1", user_id=user.id, msisdn="123", ussd_menu=menu3, state="foo", service_code="*123#"
+    session = UssdSessionState(
+        session_id="1", user_id=user.id, msisdn="123", ussd_menu_id=3, state="foo", service_code="*123#"
     )
-    db.session.add(session)
-    db.session.commit()
+    ussd_session_store.save(session)
 
     # test updating existing
-    create_or_update_session("1", user, UssdMenu(id=4, name="bar", display_key='bar'), "input", "*123#")
-    sessions = UssdSession.query.filter_by(session_id="1")
-    assert sessions.count() == 1
-    session = sessions.first()
+    session = create_or_update_session("1", user, UssdMenu(id=4, name="bar", display_key='bar'), "input", "*123#")
+    ussd_session_store.save(session)
+    session = ussd_session_store.get("1")
     assert session.state == "bar"
     assert session.user_input == "input"
     assert session.ussd_menu_id == 4
+    assert session.user == user
 
     # test creating a new one
-    sessions = UssdSession.query.filter_by(session_id="2")
-    assert sessions.count() == 0
-    create_or_update_session("2", user, UssdMenu(id=5, name="bat", display_key='bat'), "", "*123#")
-    sessions = UssdSession.query.filter_by(session_id="2")
-    assert sessions.count() == 1
-    session = sessions.first()
+    assert ussd_session_store.get("2") is None
+    session = create_or_update_session("2", user, UssdMenu(id=5, name="bat", display_key='bat'), "", "*123#")
+    ussd_session_store.save(session)
+    session = ussd_session_store.get("2")
     assert session.state == "bat"
     assert session.user_input == ""
-    assert session.ussd_menu_id == 5
\ No newline at end of file
+    assert session.ussd_menu_id == 5
+    assert session.user_id == user.id
+
+
+def test_persist_ussd_sessions(test_client, init_database):
+    user = UserFactory(phone="456")
+    menu = UssdMenu(name='persist_menu', display_key='persist_menu')
+    db.session.add(menu)
+    db.session.commit()
+
+    store = InMemoryUssdSessionStore()
+
+    complete = UssdSessionState(session_id="complete", msisdn="456", service_code="*123#", state="persist_menu",
+                                ussd_menu_id=menu.id, user_id=user.id)
+    complete.set_data('foo', 'bar')
+    store.save(complete, completed=True)
+
+    ongoing = UssdSessionState(session_id="ongoing", msisdn="456", service_code="*123#", state="persist_menu",
+                               ussd_menu_id=menu.id, user_id=user.id)
+    store.save(ongoing)
+
+    # Only the completed session is written while the other is still in use
+    assert persist_ussd_sessions(store) == 1
+    persisted = UssdSession.query.filter_by(session_id="complete").one()
+    assert persisted.get_data('foo') == 'bar'
+    assert persisted.user == user
+    assert UssdSession.query.filter_by(session_id="ongoing").first() is None
+
+    # Once idle it's written too, and sessions are updated in place if they change again
+    complete.state = 'changed'
+    store.save(complete, completed=True)
+    assert persist_ussd_sessions(store, idle_before_persist=0) == 2
+    assert UssdSession.query.filter_by(session_id="complete").one().state == 'changed'
+    assert UssdSession.query.filter_by(session_id="ongoing").one().state == 'persist_menu'
+
+    assert persist_ussd_sessions(store, idle_before_persist=0) == 0
+
+
+@pytest.mark.parametrize("store_factory", [
+    InMemoryUssdSessionStore,
+    lambda: RedisUssdSessionStore(red, 60)
+])
+def test_mark_persisted_keeps_sessions_saved_again(test_client, store_factory):
+    """
+    GIVEN a session store
+    WHEN a session is saved again after being taken to persist, but before being marked as persisted
+    THEN check it stays queued with its latest data, while unchanged sessions are removed
+    """
+    store = store_factory()
+    red.delete(RedisUssdSessionStore.UNPERSISTED_KEY)
+
+    hopping = UssdSessionState(session_id="hopping", msisdn="456", service_code="*123#", state="start")
+    idle = UssdSessionState(session_id="idle", msisdn="456", service_code="*123#", state="start")
+    store.save(hopping)
+    store.save(idle)
+
+    taken = store.take_unpersisted(before=time.time(), limit=10)
+    assert {session_id for session_id, _, _ in taken} == {"hopping", "idle"}
+
+    hopping.state = 'end'
+    store.save(hopping, completed=True)
+
+    store.mark_persisted([(session_id, score) for session_id, _, score in taken])
+
+    taken = store.take_unpersisted(before=time.time(), limit=10)
+    assert [(session_id, data['state']) for session_id, data, _ in taken] == [("hopping", "end")]
+
+    red.delete(RedisUssdSessionStore.UNPERSISTED_KEY, 'UssdSession-hopping', 'UssdSession-idle')
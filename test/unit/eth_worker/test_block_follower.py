@@ -0,0 +1,106 @@
+"""
+This file (test_block_follower.py) contains the unit tests for the block_follower.py file in the eth_worker's
+eth_manager dir. They run against the local ganache chain, and are skipped when it isn't reachable.
+"""
+import importlib.util
+import os
+
+import pytest
+from web3 import Web3, HTTPProvider
+
+import config
+
+BLOCK_FOLLOWER_PATH = os.path.join(os.getcwd(), 'eth_worker', 'eth_manager', 'block_follower.py')
+
+# The app's test image doesn't include the eth_worker
+if not os.path.exists(BLOCK_FOLLOWER_PATH):
+    pytest.skip('eth_worker source not available', allow_module_level=True)
+
+# Loaded from its file, since importing the eth_manager package starts up the whole worker
+_spec = importlib.util.spec_from_file_location('block_follower', BLOCK_FOLLOWER_PATH)
+block_follower = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(block_follower)
+
+
+class FakeRedis(object):
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = str(value).encode()
+
+    def __init__(self):
+        self.values = {}
+
+
+class FakeTransaction(object):
+
+    def __init__(self, hash):
+        self.hash = hash
+
+
+class FakePersistence(object):
+    """
+    Holds the PENDING transactions by hash, the way the worker's database does
+    """
+
+    class session(object):
+        @staticmethod
+        def remove():
+            pass
+
+    def get_pending_transactions_by_hash(self, transaction_hashes):
+        return [self.pending[h] for h in transaction_hashes if h in self.pending]
+
+    def __init__(self):
+        self.pending = {}
+
+
+class FakeProcessor(object):
+
+    def resolve_transaction_receipts(self, transactions):
+        for transaction in transactions:
+            self.persistence.pending.pop(transaction.hash)
+            self.resolved.append(transaction.hash)
+
+    def __init__(self, persistence):
+        self.persistence = persistence
+        self.resolved = []
+
+
+@pytest.fixture(scope='module')
+def ganache_w3():
+    w3 = Web3(HTTPProvider(config.ETH_HTTP_PROVIDER))
+    if not w3.isConnected():
+        pytest.skip('ganache not reachable')
+    return w3
+
+
+def test_block_follower_resolves_transactions_mined_before_hash_saved(ganache_w3):
+    """
+    GIVEN a BlockFollower following a ganache chain that mines each transaction as it's sent
+    WHEN a transaction is mined before its hash is saved as PENDING
+    THEN check the follower still resolves it on a later poll, from the recent blocks it reads again
+    """
+    persistence = FakePersistence()
+    processor = FakeProcessor(persistence)
+    follower = block_follower.BlockFollower(ganache_w3, FakeRedis(), persistence, processor)
+
+    follower.process_new_blocks()
+
+    sender, recipient = ganache_w3.eth.accounts[0], ganache_w3.eth.accounts[1]
+    transaction_hash = ganache_w3.eth.sendTransaction({'from': sender, 'to': recipient, 'value': 1}).hex()
+
+    # Mined, but nothing's waiting on it yet
+    assert follower.process_new_blocks() == 1
+    assert processor.resolved == []
+
+    persistence.pending[transaction_hash] = FakeTransaction(transaction_hash)
+
+    assert follower.process_new_blocks() == 0
+    assert processor.resolved == [transaction_hash]
+
+    # Resolved transactions aren't picked up again
+    follower.process_new_blocks()
+    assert processor.resolved == [transaction_hash]